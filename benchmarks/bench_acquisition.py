@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+###
+#
+#
+#
+# Program Description : Acquisition-loop benchmark.  Runs the Radiometer against the simulated
+#                           ADC backend on a plain Linux machine and reports scheduler wakeups per
+#                           second, sample jitter, sample_data latency and CPU use.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : bench_acquisition.py
+#
+###
+
+# System imports
+import os, sys
+import json
+import time
+import tempfile
+import threading
+import argparse
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project imports
+from src.radiometer import Radiometer
+from src.filemanager import Filemanager
+
+
+# A modem that never connects, the benchmark only measures acquisition
+class OfflineModem:
+
+    def __init__(self, args):
+
+        self.args = args
+        self.power_status = 'offline'
+        self.connected = False
+
+
+    def hard_power_off(self):
+
+        self.power_status = 'offline'
+
+
+    def power_on(self):
+
+        self.power_status = 'online'
+
+
+    def power_off(self):
+
+        self.power_status = 'offline'
+
+
+    def connect(self):
+
+        self.connected = False
+
+
+    def disconnect(self):
+
+        self.connected = False
+
+
+    def get_position(self):
+
+        return self.args['preferences']['coordinates']
+
+
+    # No stored fix, so the first heading waits for the power cycle like a unit without one
+    def stored_position(self):
+
+        return None
+
+
+# Records the time of every sample taken by the radiometer
+class BenchmarkRadiometer(Radiometer):
+
+    def sample_data(self):
+
+        self.sample_times.append(time.monotonic())
+        self.sample_offsets.append(time.time() % self.sample_period)
+
+        start = time.perf_counter()
+
+        super().sample_data()
+
+        self.sample_latencies.append(time.perf_counter() - start)
+
+
+# Build the arguments for a radiometer that stores its data in a temporary directory
+def build_args(config, save_path, latency):
+
+    with open(config) as json_file:
+        preferences = json.load(json_file)
+
+    preferences['savePath'] = save_path
+    preferences['toUploadPath'] = os.path.join(save_path, 'toUpload')
+    preferences['uploadedPath'] = os.path.join(save_path, 'uploaded')
+
+    preferences.setdefault('adc', {})['backend'] = 'simulated'
+    preferences['adc'].setdefault('simulated', {})['latency'] = latency
+
+    for directory in (preferences['toUploadPath'], preferences['uploadedPath']):
+        os.makedirs(directory, exist_ok = True)
+
+    return {
+        'project_root': os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'preferences': preferences
+    }
+
+
+# Scheduler wakeups per second, sample jitter and CPU use of the acquisition loop
+def bench_scheduler(radiometer, duration):
+
+    timer = threading.Timer(duration, radiometer.scheduler.stop)
+
+    wall_start = time.monotonic()
+    cpu_start = time.process_time()
+
+    timer.start()
+    radiometer.run()
+
+    wall = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    intervals = [b - a for a, b in zip(radiometer.sample_times, radiometer.sample_times[1:])]
+
+    return {
+        'wakeups': radiometer.scheduler.wakeups,
+        'wall': wall,
+        'cpu': cpu,
+        'samples': len(radiometer.sample_times),
+        'intervals': intervals,
+        'offsets': list(radiometer.sample_offsets)
+    }
+
+
+# Latency of sample_data when it is called back to back
+def bench_sample_data(radiometer, count):
+
+    radiometer.sample_latencies = []
+
+    # The sample writer is stopped when the scheduler stops
+    radiometer.sample_writer.start()
+
+    for i in range(count):
+        radiometer.sample_data()
+
+    radiometer.sample_writer.stop()
+
+    return sorted(radiometer.sample_latencies)
+
+
+def percentile(values, fraction):
+
+    if not values:
+        return 0.0
+
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description = "Benchmark of the acquisition loop on the simulated ADC backend")
+    parser.add_argument('-d', '--duration', type = float, default = 10, help = "seconds to run the program loop")
+    parser.add_argument('-n', '--samples', type = int, default = 200, help = "back to back sample_data calls")
+    parser.add_argument('-l', '--latency', type = float, default = 0.0015, help = "simulated SPI latency per call")
+    parser.add_argument('-c', '--config', default = os.path.join(project_root, 'etc', 'radiometer.json'))
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as save_path:
+        args = build_args(options.config, save_path, options.latency)
+
+        filemanager = Filemanager(args)
+        filemanager.preferences = args['preferences']
+
+        # The data rows are printed by the radiometer, keep them out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            radiometer = BenchmarkRadiometer(OfflineModem(args), filemanager, args)
+            radiometer.delete_cron_log = False
+            radiometer.sample_size = -1
+            radiometer.sample_times = []
+            radiometer.sample_offsets = []
+            radiometer.sample_latencies = []
+
+            loop = bench_scheduler(radiometer, options.duration)
+            latencies = bench_sample_data(radiometer, options.samples)
+
+            radiometer.weather_sensors.stop()
+            filemanager.close_data_writer()
+
+    intervals = loop['intervals']
+
+    print("Acquisition loop")
+    print("  Duration               : {:10.2f} s".format(loop['wall']))
+    print("  Scheduler wakeups      : {:10.1f} /s".format(loop['wakeups'] / loop['wall']))
+    print("  Samples                : {:10d}".format(loop['samples']))
+    print("  CPU use                : {:10.1f} %".format(loop['cpu'] / loop['wall'] * 100))
+
+    if len(intervals) > 1:
+        print("  Sample interval mean   : {:10.3f} ms".format(statistics.mean(intervals) * 1000))
+        print("  Sample jitter (stdev)  : {:10.3f} ms".format(statistics.stdev(intervals) * 1000))
+        print("  Sample jitter (max)    : {:10.3f} ms".format(max(abs(i - radiometer.sample_period) for i in intervals) * 1000))
+        print("  Offset from boundary   : {:10.3f} ms mean".format(statistics.mean(loop['offsets']) * 1000))
+
+    for task in radiometer.scheduler.tasks.values():
+        print("  Task {:18}: {:10d} runs {:6d} late {:6d} skipped".format(task.name, task.runs, task.late, task.skipped))
+
+    print("Sample writer")
+    print("  Written                : {:10d}".format(radiometer.sample_writer.written))
+    print("  Dropped                : {:10d}".format(radiometer.sample_writer.dropped))
+    print("  Maximum queue depth    : {:10d}".format(radiometer.sample_writer.max_depth))
+
+    print("sample_data")
+    print("  Calls                  : {:10d}".format(len(latencies)))
+    print("  Latency mean           : {:10.3f} ms".format(statistics.mean(latencies) * 1000))
+    print("  Latency p50            : {:10.3f} ms".format(percentile(latencies, 0.50) * 1000))
+    print("  Latency p99            : {:10.3f} ms".format(percentile(latencies, 0.99) * 1000))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+###
+#
+#
+#
+# Program Description : Per-sample acquisition latency of the ADC reads.  Compares reading one
+#                           pin at a time in heading order, one pin at a time grouped by plate,
+#                           and one bulk read per plate.  Runs on the DAQC2plates or the simulator.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : bench_bulk_read.py
+#
+###
+
+# System imports
+import os, sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project imports
+from src.adc_backend import create_backend
+from src.channel_plan import ChannelPlan, KIND_ADC, KIND_HUMIDITY
+
+
+# Read the ADC channels one pin at a time in heading order, as sample_data originally did
+def heading_order_read(adc, channel_plan):
+
+    values = []
+
+    for i, kind in enumerate(channel_plan.kinds):
+        if kind == KIND_ADC or kind == KIND_HUMIDITY:
+            values.append(adc.get_adc(channel_plan.boards[i], channel_plan.pins[i]))
+
+    return values
+
+
+# Latency of each call in milliseconds, sorted
+def measure(function, samples):
+
+    latencies = []
+
+    for i in range(samples):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return sorted(latencies)
+
+
+def report(name, latencies):
+
+    print("{:28} mean {:8.3f} ms   p50 {:8.3f} ms   p99 {:8.3f} ms   max {:8.3f} ms".format(
+        name,
+        statistics.mean(latencies),
+        latencies[len(latencies) // 2],
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        latencies[-1]
+    ))
+
+
+def main():
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description = "Per-sample ADC acquisition latency")
+    parser.add_argument('-n', '--samples', type = int, default = 200)
+    parser.add_argument('-b', '--backend', choices = ['daqc2', 'simulated'], default = None,
+                        help = "overrides the backend in radiometer.json")
+    parser.add_argument('-c', '--config', default = os.path.join(project_root, 'etc', 'radiometer.json'))
+    options = parser.parse_args()
+
+    with open(options.config) as json_file:
+        preferences = json.load(json_file)
+
+    if options.backend is not None:
+        preferences.setdefault('adc', {})['backend'] = options.backend
+
+    adc = create_backend(preferences)
+
+    per_pin_plan = ChannelPlan(preferences, bulk_read = False)
+    bulk_plan = ChannelPlan(preferences, bulk_read = True)
+
+    args = {'anemometer': 0, 'rainGauge': 0}
+
+    print("Backend : {}, {} channels on {} plates\n".format(
+        preferences.get('adc', {}).get('backend', 'daqc2'),
+        len(bulk_plan),
+        len(bulk_plan.board_groups)
+    ))
+
+    report("Per pin, heading order", measure(lambda: heading_order_read(adc, per_pin_plan), options.samples))
+    report("Per pin, grouped by plate", measure(lambda: per_pin_plan.read(adc, args), options.samples))
+    report("Bulk read per plate", measure(lambda: bulk_plan.read(adc, args), options.samples))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
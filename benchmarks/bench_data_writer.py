@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+###
+#
+#
+#
+# Program Description : Benchmark of rows per second and system calls per row for the
+#                           original open/append/close save_to_file and the buffered DataWriter.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : bench_data_writer.py
+#
+###
+
+# System imports
+import os, sys
+import time
+import builtins
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project imports
+from src import data_writer
+from src.data_writer import DataWriter, FSYNC_POLICIES
+
+ROW = "2.50312,2.50144,2.49876,2.50011,2.50732,2.49921,2.50003,2.50118,2.50201,2.49987,2.50044,0.0000,4.8,42.1377,2.50019,2.49966,2020,09,24,13,45,07\n"
+
+
+# Counts open and fsync calls, and reads the kernel's count of write system calls
+class SyscallCounter:
+
+    def __init__(self):
+
+        self.opens = 0
+        self.fsyncs = 0
+
+        self.builtin_open = builtins.open
+        self.os_fsync = os.fsync
+
+
+    def __enter__(self):
+
+        def counting_open(*args, **kwargs):
+            self.opens += 1
+            return self.builtin_open(*args, **kwargs)
+
+        def counting_fsync(fd):
+            self.fsyncs += 1
+            return self.os_fsync(fd)
+
+        builtins.open = counting_open
+        os.fsync = counting_fsync
+        data_writer.os.fsync = counting_fsync
+
+        self.writes_before = self.write_syscalls()
+
+        return self
+
+
+    def __exit__(self, *exc):
+
+        self.writes = self.write_syscalls() - self.writes_before
+
+        builtins.open = self.builtin_open
+        os.fsync = self.os_fsync
+        data_writer.os.fsync = self.os_fsync
+
+
+    # Number of write system calls made by this process, only available on Linux
+    def write_syscalls(self):
+
+        try:
+            with self.builtin_open('/proc/self/io') as io_file:
+                for line in io_file:
+                    if line.startswith('syscw:'):
+                        return int(line.split()[1])
+        except IOError:
+            pass
+
+        return 0
+
+
+    # Every open is paired with a close
+    def total(self):
+
+        return self.opens * 2 + self.fsyncs + self.writes
+
+
+# The original Filemanager.save_to_file
+def legacy_save_to_file(path, filename, data_string):
+
+    save_location = os.path.join(path, filename)
+
+    filehandle = open(save_location, 'a+')
+    filehandle.writelines(data_string)
+    filehandle.close()
+
+
+def report(name, rows, elapsed, counter):
+
+    print("{:26} {:12.0f} rows/s {:8.3f} syscalls/row  (open {}, write {}, fsync {})".format(
+        name,
+        rows / elapsed,
+        counter.total() / rows,
+        counter.opens,
+        counter.writes,
+        counter.fsyncs
+    ))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Rows per second and syscalls per row of the day file writers")
+    parser.add_argument('-n', '--rows', type = int, default = 5000)
+    parser.add_argument('-p', '--path', default = None, help = "directory to write to, e.g. /mnt/storage")
+    parser.add_argument('--flush-bytes', type = int, default = 4096)
+    parser.add_argument('--flush-interval', type = float, default = 10)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir = options.path) as path:
+
+        with SyscallCounter() as counter:
+            start = time.perf_counter()
+
+            for i in range(options.rows):
+                legacy_save_to_file(path, 'legacy.csv', ROW)
+
+            elapsed = time.perf_counter() - start
+
+        report("save_to_file (a+/close)", options.rows, elapsed, counter)
+
+        for policy in FSYNC_POLICIES:
+            filename = 'writer_{}.csv'.format(policy)
+
+            with SyscallCounter() as counter:
+                start = time.perf_counter()
+
+                writer = DataWriter(options.flush_bytes, options.flush_interval, policy)
+                writer.open(path, filename)
+
+                for i in range(options.rows):
+                    writer.write(ROW)
+
+                writer.close()
+
+                elapsed = time.perf_counter() - start
+
+            report("DataWriter fsync={}".format(policy), options.rows, elapsed, counter)
+
+            if os.path.getsize(os.path.join(path, filename)) != os.path.getsize(os.path.join(path, 'legacy.csv')):
+                print("DataWriter output size does not match save_to_file")
+                return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+###
+#
+#
+#
+# Program Description : Cost of durability for each fsync policy of the day file and each group
+#                           commit size of the sample journal.  Reports rows per second, fsyncs
+#                           per row, the write latency seen by the sample writer and the rows that
+#                           can be lost on a power failure, then checks that a torn day file is
+#                           recovered from the journal.  Run it with --path on the storage stick.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : bench_journal.py
+#
+###
+
+# System imports
+import os, sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project imports
+from src import journal
+from src import data_writer
+from src.data_writer import DataWriter
+from src.journal import SampleJournal
+
+ROW = "2.50312,2.50144,2.49876,2.50011,2.50732,2.49921,2.50003,2.50118,2.50201,2.49987,2.50044,0.0000,4.8,42.1377,2.50019,2.49966,2020,09,24,13,45,07\n"
+
+
+# Counts the fsync calls of the writer and the journal
+class FsyncCounter:
+
+    def __init__(self):
+
+        self.fsyncs = 0
+        self.os_fsync = os.fsync
+
+
+    def __enter__(self):
+
+        def counting_fsync(fd):
+            self.fsyncs += 1
+            return self.os_fsync(fd)
+
+        data_writer.os.fsync = counting_fsync
+        journal.os.fsync = counting_fsync
+
+        return self
+
+
+    def __exit__(self, *exc):
+
+        data_writer.os.fsync = self.os_fsync
+        journal.os.fsync = self.os_fsync
+
+
+def percentile(values, fraction):
+
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+# Write the rows and time every write
+def run_policy(path, name, fsync_policy, commit_records, rows, flush_bytes, flush_interval):
+
+    sample_journal = None
+
+    if commit_records is not None:
+        sample_journal = SampleJournal(os.path.join(path, 'journal'), commit_records, commit_interval=3600)
+
+    writer = DataWriter(flush_bytes, flush_interval, fsync_policy, sample_journal)
+    writer.open(path, name + '.csv')
+
+    latencies = []
+
+    with FsyncCounter() as counter:
+        start = time.perf_counter()
+
+        for i in range(rows):
+            write_start = time.perf_counter()
+            writer.write(ROW)
+            latencies.append(time.perf_counter() - write_start)
+
+        writer.close()
+
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    # Rows that are only in memory or in the page cache in the worst case
+    if fsync_policy == 'always' or commit_records == 1:
+        at_risk = "0"
+    elif commit_records is not None:
+        at_risk = str(commit_records - 1)
+    elif fsync_policy == 'flush':
+        at_risk = str(flush_bytes // len(ROW))
+    else:
+        at_risk = "all"
+
+    return {
+        'rate': rows / elapsed,
+        'fsyncs': counter.fsyncs / rows,
+        'p50': percentile(latencies, 0.50),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1],
+        'atRisk': at_risk
+    }
+
+
+# Write rows with the journal, cut the day file in the middle of a row as a power failure would,
+# and check that recovery restores every committed row
+def check_recovery(path, rows, commit_records):
+
+    save_path = os.path.join(path, 'recovery')
+    os.makedirs(save_path)
+
+    sample_journal = SampleJournal(os.path.join(save_path, 'journal'), commit_records, commit_interval=3600)
+
+    # The day file is never flushed by the writer, so every row has to come from the journal
+    writer = DataWriter(1 << 30, 3600, 'never', sample_journal)
+    writer.open(save_path, 'day.csv')
+    writer.write("Site Name : Benchmark\n")
+    writer.flush()
+
+    for i in range(rows):
+        writer.write(ROW)
+
+    # Rows in committed journal records, the heading is the first record
+    committed = sample_journal.records - sample_journal.pending_records - 1
+
+    # Half of the buffered rows reached the file, and the last of them only partly
+    writer.buffer = writer.buffer[:rows // 2]
+    writer.buffer[-1] = writer.buffer[-1][:len(ROW) // 2]
+    writer.flush()
+
+    sample_journal.filehandle.close()
+    writer.filehandle.close()
+
+    # The journal also ends in a torn record
+    with open(os.path.join(save_path, 'journal', 'day.csv' + journal.EXTENSION), 'ab') as journal_file:
+        journal_file.write(b'\x10\x00\x00')
+
+    start = time.perf_counter()
+    journal.recover(os.path.join(save_path, 'journal'), save_path)
+    elapsed = time.perf_counter() - start
+
+    with open(os.path.join(save_path, 'day.csv')) as day_file:
+        lines = day_file.read().split('\n')
+
+    recovered = len(lines) - 2
+    intact = lines[-1] == "" and all(line == ROW[:-1] for line in lines[1:-1])
+
+    return committed, recovered, intact, elapsed
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Durability cost of the fsync policies and the sample journal")
+    parser.add_argument('-n', '--rows', type = int, default = 2000)
+    parser.add_argument('-p', '--path', default = None, help = "directory to write to, e.g. /mnt/storage")
+    parser.add_argument('--flush-bytes', type = int, default = 4096)
+    parser.add_argument('--flush-interval', type = float, default = 10)
+    options = parser.parse_args()
+
+    # Name, day file fsync policy and journal commit size (None without a journal)
+    policies = [
+        ("fsync never", 'never', None),
+        ("fsync flush", 'flush', None),
+        ("fsync always", 'always', None),
+        ("journal every row", 'never', 1),
+        ("journal every 10 rows", 'never', 10),
+        ("journal every 100 rows", 'never', 100),
+        ("journal 10 + fsync flush", 'flush', 10)
+    ]
+
+    print("{:26} {:>10} {:>11} {:>10} {:>10} {:>10} {:>13}".format(
+        "Policy", "rows/s", "fsyncs/row", "p50 ms", "p99 ms", "max ms", "rows at risk"
+    ))
+
+    with tempfile.TemporaryDirectory(dir = options.path) as path:
+        for name, fsync_policy, commit_records in policies:
+            result = run_policy(
+                path,
+                name.replace(' ', '_'),
+                fsync_policy,
+                commit_records,
+                options.rows,
+                options.flush_bytes,
+                options.flush_interval
+            )
+
+            print("{:26} {:10.0f} {:11.3f} {:10.3f} {:10.3f} {:10.3f} {:>13}".format(
+                name,
+                result['rate'],
+                result['fsyncs'],
+                result['p50'] * 1000,
+                result['p99'] * 1000,
+                result['max'] * 1000,
+                result['atRisk']
+            ))
+
+        committed, recovered, intact, elapsed = check_recovery(path, options.rows, 10)
+
+    print("\nRecovery of a torn day file : {} of {} committed rows restored in {:.1f} ms, {}".format(
+        recovered,
+        committed,
+        elapsed * 1000,
+        "file intact" if intact and recovered == committed else "FILE DOES NOT MATCH"
+    ))
+
+    return 0 if intact and recovered == committed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+###
+#
+#
+#
+# Program Description : Highest sample rate the ADC bus can sustain for each oversampling group.
+#                           First measures how many back-to-back reads of the group fit in a
+#                           second, then runs the group from the deadline scheduler at increasing
+#                           rates, with a 1 Hz decimated output, and counts late and skipped
+#                           samples.  Runs on the DAQC2plates or the simulator.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : bench_max_rate.py
+#
+###
+
+# System imports
+import os, sys
+import json
+import time
+import argparse
+import functools
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project imports
+from src.adc_backend import create_backend
+from src.channel_plan import ChannelPlan
+from src.oversampler import Oversampler
+from src.scheduler import Scheduler
+
+
+# Reads of a group per second when the reads are done back to back
+def back_to_back_rate(oversampler, group, duration):
+
+    reads = 0
+    start = time.perf_counter()
+
+    while time.perf_counter() - start < duration:
+        oversampler.channel_plan.read_raw(oversampler.adc, group.board_groups, oversampler.scratch)
+        reads += 1
+
+    return reads / (time.perf_counter() - start)
+
+
+# Run a group from the scheduler at a rate, with the output decimated once per second
+def scheduled_rate(oversampler, group, rate, duration, late_tolerance):
+
+    group.rate = rate
+    group.count = 0
+    group.samples = 0
+    group.outputs = 0
+    group.overruns = 0
+
+    scheduler = Scheduler(late_tolerance)
+    scheduler.add_task('output', 1.0, functools.partial(oversampler.read, {'anemometer': 0, 'rainGauge': 0}), priority=2, align=True)
+    task = scheduler.add_task(group.name, 1.0 / rate, functools.partial(oversampler.sample, group), priority=3, align=True)
+
+    timer = threading.Timer(duration, scheduler.stop)
+
+    start = time.monotonic()
+    timer.start()
+    scheduler.run()
+    elapsed = time.monotonic() - start
+
+    return {
+        'achieved': group.samples / elapsed,
+        'late': task.late,
+        'skipped': task.skipped,
+        'overruns': group.overruns,
+        'runs': task.runs,
+        'maxLateness': task.max_lateness
+    }
+
+
+def main():
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description = "Highest sustainable oversampling rate")
+    parser.add_argument('-d', '--duration', type = float, default = 5.0, help = "seconds per rate")
+    parser.add_argument('-r', '--rates', default = "10,20,50,100,200,500",
+                        help = "comma separated rates in Hz")
+    parser.add_argument('-b', '--backend', choices = ['daqc2', 'simulated'], default = None,
+                        help = "overrides the backend in radiometer.json")
+    parser.add_argument('-c', '--config', default = os.path.join(project_root, 'etc', 'radiometer.json'))
+    options = parser.parse_args()
+
+    with open(options.config) as json_file:
+        preferences = json.load(json_file)
+
+    if options.backend is not None:
+        preferences.setdefault('adc', {})['backend'] = options.backend
+
+    # The largest rate is used for the block size, so no rate overruns the block
+    rates = [float(rate) for rate in options.rates.split(',')]
+
+    for group_settings in preferences.get('oversampling', {}).get('groups', []):
+        group_settings['rate'] = max(rates)
+
+    adc = create_backend(preferences)
+    channel_plan = ChannelPlan(preferences)
+    oversampler = Oversampler.from_preferences(preferences, channel_plan, adc, 1.0)
+    late_tolerance = preferences.get('scheduler', {}).get('lateTolerance', 0.05)
+
+    print("Backend : {}, bulk read {}\n".format(
+        preferences.get('adc', {}).get('backend', 'daqc2'),
+        channel_plan.bulk_read
+    ))
+
+    for group in oversampler.groups:
+        limit = back_to_back_rate(oversampler, group, options.duration)
+
+        print("Group {} : {} channels on {} plates, {:.0f} reads per second back to back".format(
+            group.name,
+            len(group.positions),
+            len(group.board_groups),
+            limit
+        ))
+
+        sustainable = None
+
+        for rate in rates:
+            result = scheduled_rate(oversampler, group, rate, options.duration, late_tolerance)
+
+            # A rate is sustainable if no deadline was skipped and at most 1% of the samples were late
+            ok = result['skipped'] == 0 and result['overruns'] == 0 and result['late'] <= result['runs'] * 0.01
+
+            if ok:
+                sustainable = rate
+
+            print("   {:7.1f} Hz : achieved {:7.1f} Hz   late {:5}   skipped {:5}   max lateness {:6.1f} ms   {}".format(
+                rate,
+                result['achieved'],
+                result['late'],
+                result['skipped'],
+                result['maxLateness'] * 1000,
+                "ok" if ok else "not sustainable"
+            ))
+
+        if sustainable is None:
+            print("   None of the rates could be sustained\n")
+        else:
+            print("   Highest sustainable rate : {:.1f} Hz\n".format(sustainable))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+###
+#
+#
+#
+# Program Description : Cost of the retention engine.  Rolls a month of synthetic uploaded day
+#                           files into an archive with every codec and reports the throughput
+#                           and the space saved, then measures the latency of the day file
+#                           writes of the sample writer while a month is rolled up, with and
+#                           without the idle priority.  Run it with --path on the storage stick.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : bench_retention.py
+#
+###
+
+# System imports
+import os, sys
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project imports
+from src import file_catalog
+from src.file_catalog import FileCatalog
+from src.filemanager import Filemanager
+from src.data_writer import DataWriter
+from src.retention import RetentionEngine, ARCHIVE_CODECS
+from src.upload_manifest import sha256_file
+
+ROW = "2.50312,2.50144,2.49876,2.50011,2.50732,2.49921,2.50003,2.50118,2.50201,2.49987,2.50044,0.0000,4.8,42.1377,2.50019,2.49966,2020,09,24,13,45,07\n"
+
+
+# Rows with noisy channel values like the simulated ADC, so the compression is realistic
+def day_rows(day, rows):
+
+    generator = random.Random(day)
+
+    return "".join(
+        ",".join("{:.5f}".format(2.5 + generator.gauss(0, 0.002)) for channel in range(11))
+        + ",0.0000,4.8,{:.4f},{:.5f},{:.5f},2020,01,{:02d},{:02d},{:02d},{:02d}\n".format(
+            42 + generator.random(),
+            2.5 + generator.gauss(0, 0.002),
+            2.5 + generator.gauss(0, 0.002),
+            day,
+            row // 3600 % 24,
+            row // 60 % 60,
+            row % 60
+        )
+        for row in range(rows)
+    )
+
+
+# A save path with the uploaded day files of a past month recorded in a new catalog
+def build_month(path, days, rows):
+
+    preferences = {'savePath': path}
+
+    uploaded_path = os.path.join(path, 'uploaded')
+
+    for directory in ('uploaded', 'state'):
+        os.makedirs(os.path.join(path, directory))
+
+    catalog = FileCatalog.from_preferences(preferences)
+
+    filemanager = Filemanager({'preferences': preferences})
+    filemanager.preferences = preferences
+
+    upload_manifest = filemanager.get_upload_manifest()
+
+    # Only files whose upload was confirmed are archived
+    for day in range(1, days + 1):
+        name = '202001{:02d}.csv'.format(day)
+        full_path = os.path.join(uploaded_path, name)
+
+        with open(full_path, 'w') as day_file:
+            day_file.write(day_rows(day, rows))
+
+        sha256 = sha256_file(full_path)
+
+        catalog.record(full_path, file_catalog.UPLOADED, sha256)
+        upload_manifest.confirm(name, name, os.path.getsize(full_path), sha256, name)
+
+    return preferences, catalog, filemanager
+
+
+# Roll up the month on the calling thread and return the time taken and the archive size
+def run_codec(path, codec, days, rows):
+
+    preferences, catalog, filemanager = build_month(path, days, rows)
+
+    engine = RetentionEngine.from_preferences(preferences, catalog, filemanager)
+    engine.codec = codec
+    os.makedirs(engine.archive_path)
+
+    start = time.perf_counter()
+
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+
+        try:
+            engine.compact()
+        finally:
+            sys.stdout = stdout
+
+    elapsed = time.perf_counter() - start
+
+    archive_size = sum(
+        os.path.getsize(os.path.join(engine.archive_path, name)) for name in os.listdir(engine.archive_path)
+    )
+
+    return elapsed, archive_size
+
+
+# Latency of the day file writes while the month is rolled up on the retention thread
+def run_contention(path, days, rows, samples, idle):
+
+    preferences, catalog, filemanager = build_month(path, days, rows)
+
+    engine = RetentionEngine.from_preferences(preferences, catalog, filemanager)
+    os.makedirs(engine.archive_path)
+
+    if not idle:
+        engine.lower_priority = lambda: None
+
+    writer = DataWriter(flush_bytes=0, flush_interval=0, fsync_policy='flush')
+    writer.open(path, 'day.csv')
+
+    latencies = []
+
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+
+        try:
+            engine.start()
+            engine.request()
+
+            # Every row is flushed and synced, as the sample writer does with its flush policy
+            for i in range(samples):
+                write_start = time.perf_counter()
+                writer.write(ROW)
+                latencies.append(time.perf_counter() - write_start)
+
+                time.sleep(0.01)
+
+            engine.stop()
+        finally:
+            sys.stdout = stdout
+
+    writer.close()
+
+    latencies.sort()
+
+    return latencies
+
+
+def percentile(values, fraction):
+
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Cost of rolling uploaded day files into monthly archives")
+    parser.add_argument('-d', '--days', type = int, default = 10)
+    parser.add_argument('-r', '--rows', type = int, default = 20000, help = "rows per day file, 86400 for a full day")
+    parser.add_argument('-n', '--samples', type = int, default = 300, help = "day file writes timed during a roll up")
+    parser.add_argument('-p', '--path', default = None, help = "directory to write to, e.g. /mnt/storage")
+    options = parser.parse_args()
+
+    original_size = len(day_rows(1, options.rows)) * options.days
+
+    print("{:8} {:>10} {:>12} {:>10}".format("Codec", "MB/s", "archive MB", "saved"))
+
+    for codec in ARCHIVE_CODECS:
+        with tempfile.TemporaryDirectory(dir = options.path) as path:
+            elapsed, archive_size = run_codec(path, codec, options.days, options.rows)
+
+        print("{:8} {:10.1f} {:12.2f} {:9.1f}%".format(
+            codec,
+            original_size / elapsed / 1048576,
+            archive_size / 1048576,
+            (1 - archive_size / original_size) * 100
+        ))
+
+    print("\n{:26} {:>10} {:>10} {:>10}".format("Day file writes", "p50 ms", "p99 ms", "max ms"))
+
+    for name, idle in (("normal priority roll up", False), ("idle priority roll up", True)):
+        with tempfile.TemporaryDirectory(dir = options.path) as path:
+            latencies = run_contention(path, options.days, options.rows, options.samples, idle)
+
+        print("{:26} {:10.3f} {:10.3f} {:10.3f}".format(
+            name,
+            percentile(latencies, 0.50) * 1000,
+            percentile(latencies, 0.99) * 1000,
+            latencies[-1] * 1000
+        ))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+###
+#
+#
+#
+# Program Description : Micro-benchmark of the per-sample CPU cost of building a data row,
+#                           comparing the original heading parsing in sample_data with the
+#                           compiled channel plan.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : bench_sample_data.py
+#
+###
+
+# System imports
+from datetime import datetime, timezone
+
+import os, sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project imports
+from src.channel_plan import ChannelPlan
+from src.adc_backend import SimulatedBackend
+
+
+# The body of Radiometer.sample_data before the channel plan was introduced
+def legacy_sample(adc, args):
+
+    heading_indices = args['preferences']['headingString'].split(",")
+    data_string = ""
+
+    for idx in heading_indices:
+        if idx[:2] == "ch":
+            if args['preferences']['headerIndices'][idx] == "Anemometer(km/h)":
+                data_string += "{:.1f},".format(args['anemometer'])
+            elif args['preferences']['headerIndices'][idx] == "RainGauge(mm)":
+                data_string += "{:.4f},".format(args['rainGauge'])
+            elif args['preferences']['headerIndices'][idx] == "RelativeHumidity(%)":
+                Vout = adc.get_adc(int(idx[2]), int(idx[3])) * 1000
+                RH = 0.0375 * Vout - 37.7
+                data_string += "{:.4f},".format(RH)
+            else:
+                data_string += "{:.5f},".format(adc.get_adc(int(idx[2]), int(idx[3])))
+
+    data_string += "{},".format(datetime.now(timezone.utc).strftime('%Y'))
+    data_string += "{},".format(datetime.now(timezone.utc).strftime('%m'))
+    data_string += "{},".format(datetime.now(timezone.utc).strftime('%d'))
+    data_string += "{},".format(datetime.now(timezone.utc).strftime('%H'))
+    data_string += "{},".format(datetime.now(timezone.utc).strftime('%M'))
+    data_string += "{}\n".format(datetime.now(timezone.utc).strftime('%S'))
+
+    return data_string
+
+
+# The body of Radiometer.sample_data using the compiled channel plan
+def planned_sample(adc, args, channel_plan):
+
+    timestamp = datetime.now(timezone.utc)
+    values = channel_plan.read(adc, args)
+
+    return channel_plan.format_row(values, timestamp)
+
+
+# Return the CPU time per call in microseconds
+def measure(function, iterations):
+
+    start = time.process_time()
+
+    for i in range(iterations):
+        function()
+
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description = "Per-sample CPU cost of sample_data")
+    parser.add_argument('-n', '--iterations', type = int, default = 20000)
+    parser.add_argument('-c', '--config', default = os.path.join(project_root, 'etc', 'radiometer.json'))
+    options = parser.parse_args()
+
+    with open(options.config) as json_file:
+        preferences = json.load(json_file)
+
+    args = {
+        'preferences': preferences,
+        'anemometer': 4.8,
+        'rainGauge': 0.2794
+    }
+
+    # Bus latency is left out so only the CPU cost of building the row is measured
+    adc = SimulatedBackend(preferences, {'latency': 0, 'bulkLatency': 0})
+    channel_plan = ChannelPlan(preferences, bulk_read = False)
+    bulk_plan = ChannelPlan(preferences, bulk_read = True)
+
+    # Make sure both paths produce the same columns before timing them
+    if legacy_sample(adc, args).count(",") != planned_sample(adc, args, channel_plan).count(","):
+        print("Legacy and compiled rows differ in column count")
+        return 1
+
+    legacy = measure(lambda: legacy_sample(adc, args), options.iterations)
+    planned = measure(lambda: planned_sample(adc, args, channel_plan), options.iterations)
+    bulk = measure(lambda: planned_sample(adc, args, bulk_plan), options.iterations)
+
+    print("Channels                 : {}".format(len(channel_plan)))
+    print("Iterations               : {}".format(options.iterations))
+    print("Legacy sample_data       : {:8.2f} us CPU per sample".format(legacy))
+    print("Compiled channel plan    : {:8.2f} us CPU per sample".format(planned))
+    print("Speedup                  : {:8.2f}x".format(legacy / planned))
+    print("Plan with bulk reads     : {:8.2f} us CPU per sample".format(bulk))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
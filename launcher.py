@@ -4,21 +4,26 @@
 #
 #
 #
-# Program Description :
+# Program Description : Starts the radiometer.  The time the launcher started is passed on,
+#                           so the program can report how long it took to start sampling.
 # Created By          : Benjamin Kleynhans
 # Creation Date       : January 25, 2020
 # Authors             : Benjamin Kleynhans
 #
 # Last Modified By    : Benjamin Kleynhans
-# Last Modified Date  : August 20, 2020
+# Last Modified Date  : October 18, 2026
 # Filename            : launcher.py
 #
 ###
 
 # System Imports
+import time
+
+# Taken before the other imports so the startup time includes them
+LAUNCH_TIME = time.monotonic()
+
 import sys, os, inspect
 import subprocess as sp
-import pdb
 
 # Module Imports
 from src import radiometer
@@ -42,39 +47,15 @@ def set_path_variables():
 
     path, filename = get_module_path()
 
-    sys.path.append(path)
-
-    op_sys = None
-    delimeter = None
-
-    # Automatically build the path
-    for element in os.walk(path):
-        if ('/' in element[0]):
-            if (op_sys == None):
-                op_sys = 'ux'
-                delimeter = '/'
-
+    # The modules are imported through the src package, so only the project root is needed.
+    # Walking the tree added every subdirectory to the module search path with no need.
+    if path not in sys.path:
+        sys.path.insert(0, path)
 
-            ind = element[0].rindex('/')
-            index_value = element[0][ind + 1]
+    if os.sep == '\\':
+        return 'win', '\\'
 
-            # If the directory does not start with a '_' or a '.' append it to the path
-            if (index_value != '_') and (index_value != '.'):
-                sys.path.append(element[0])
-
-        elif ('\\' in element[0]):
-            if (op_sys == None):
-                op_sys = 'win'
-                delimeter = '\\'
-
-            ind = element[0].rindex('\\')
-            index_value = element[0][ind + 1]
-
-            # If the directory does not start with a '_' or a '.' append it to the path
-            if (index_value != '_') and (index_value != '.'):
-                sys.path.append(element[0])
-
-    return op_sys, delimeter
+    return 'ux', '/'
 
 
 def main(args):
@@ -89,9 +70,12 @@ def main(args):
         'project_root': __PROJECT_ROOT,
         'os': op_sys,
         'delimeter': delimeter,
-        'preferences': {}
+        'preferences': {},
+        'launchTime': LAUNCH_TIME
     }
 
+    print("Modules imported {:.2f} s after launch".format(time.monotonic() - LAUNCH_TIME))
+
     radiometer.main(args)
 
     # sp.call('clear', shell = True)
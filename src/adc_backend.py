@@ -0,0 +1,196 @@
+###
+#
+#
+#
+# Program Description : Pluggable ADC backends.  The DAQC2 backend talks to the PiPlates
+#                           DAQC2plates on the Raspberry Pi, the simulated backend produces
+#                           configurable waveforms so the program can run on any Linux machine.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : adc_backend.py
+#
+###
+
+# System imports
+import math
+import random
+import threading, time
+
+# Number of analog inputs on a DAQC2plate
+PINS_PER_PLATE = 8
+
+
+# Reads the PiPlates DAQC2plates over the SPI bus
+class Daqc2Backend:
+    # Constructor
+    def __init__(self, settings):
+
+        # The PiPlates library can only be imported on a Raspberry Pi
+        import piplates.DAQC2plate as DAQC2
+
+        self.daqc2 = DAQC2
+        self.settings = settings
+
+        # Only one plate can be read at a time, so every access to the bus holds this lock
+        self.lock = threading.RLock()
+
+
+    def get_adc(self, board, pin):
+
+        with self.lock:
+            return self.daqc2.getADC(board, pin)
+
+
+    # Read all eight inputs of a plate in a single transaction
+    def get_all_adc(self, board):
+
+        with self.lock:
+            return self.daqc2.getADCall(board)
+
+
+    def set_led(self, board, state):
+
+        with self.lock:
+            self.daqc2.setLED(board, state)
+
+
+# Produces a voltage that changes over time, used by the simulated backend
+class Waveform:
+    # Constructor
+    def __init__(self, settings):
+
+        self.type = settings.get('type', 'constant')
+
+        self.offset = settings.get('offset', 0.0)
+        self.amplitude = settings.get('amplitude', 0.0)
+        self.period = settings.get('period', 60.0)
+        self.noise = settings.get('noise', 0.0)
+
+        # Pulse train settings, used for the anemometer and rain gauge
+        self.frequency = settings.get('frequency', 1.0)
+        self.duty = settings.get('duty', 0.5)
+        self.high = settings.get('high', 5.0)
+        self.low = settings.get('low', 0.0)
+
+
+    # Voltage at time t, in seconds
+    def value(self, t):
+
+        if self.type == 'pulse':
+            if self.frequency <= 0:
+                return self.low
+            elif (t * self.frequency) % 1.0 < self.duty:
+                return self.high
+            else:
+                return self.low
+
+        value = self.offset
+
+        if self.type == 'sine':
+            value += self.amplitude * math.sin(2 * math.pi * t / self.period)
+
+        if self.noise:
+            value += random.gauss(0.0, self.noise)
+
+        return value
+
+
+# Simulates the DAQC2plates, including the time each call spends on the SPI bus
+class SimulatedBackend:
+
+    # Default waveforms for the special channels
+    DEFAULT_WAVEFORMS = {
+        "Anemometer(km/h)"      : {'type': 'pulse', 'frequency': 2.0, 'duty': 0.5},
+        "RainGauge(mm)"         : {'type': 'pulse', 'frequency': 0.05, 'duty': 0.1},
+        "RelativeHumidity(%)"   : {'type': 'sine', 'offset': 2.3, 'amplitude': 0.2, 'period': 3600}
+    }
+
+    # Constructor
+    def __init__(self, preferences, settings):
+
+        self.settings = settings
+
+        # Time spent by each call on the simulated bus, in seconds
+        self.latency = settings.get('latency', 0.0015)
+        self.bulk_latency = settings.get('bulkLatency', 0.0025)
+
+        self.start_time = time.monotonic()
+        self.lock = threading.RLock()
+
+        self.waveforms = {}
+        self.build_waveforms(preferences, settings.get('waveforms', {}))
+
+        self.leds = {}
+
+
+    # Create a waveform for every channel in the heading, configured waveforms take precedence
+    def build_waveforms(self, preferences, configured):
+
+        default = {'type': 'sine', 'offset': 2.5, 'amplitude': 0.05, 'period': 600, 'noise': 0.001}
+
+        for channel_id, name in preferences.get('headerIndices', {}).items():
+            settings = configured.get(channel_id, self.DEFAULT_WAVEFORMS.get(name, default))
+
+            self.waveforms[(int(channel_id[2]), int(channel_id[3]))] = Waveform(settings)
+
+
+    # Simulate the time it takes to complete a transaction on the bus
+    def transaction(self, latency):
+
+        if latency > 0:
+            time.sleep(latency)
+
+
+    # Voltage of a single input at the current time
+    def value(self, board, pin, t):
+
+        waveform = self.waveforms.get((board, pin))
+
+        if waveform is None:
+            return 0.0
+
+        return waveform.value(t)
+
+
+    def get_adc(self, board, pin):
+
+        with self.lock:
+            self.transaction(self.latency)
+
+            return self.value(board, pin, time.monotonic() - self.start_time)
+
+
+    # Read all eight inputs of a plate in a single transaction
+    def get_all_adc(self, board):
+
+        with self.lock:
+            self.transaction(self.bulk_latency)
+
+            t = time.monotonic() - self.start_time
+
+            return [self.value(board, pin, t) for pin in range(PINS_PER_PLATE)]
+
+
+    def set_led(self, board, state):
+
+        with self.lock:
+            self.transaction(self.latency)
+            self.leds[board] = state
+
+
+# Create the ADC backend named in the 'adc' section of the preferences
+def create_backend(preferences):
+
+    settings = preferences.get('adc', {})
+    backend = settings.get('backend', 'daqc2')
+
+    if backend == 'daqc2':
+        return Daqc2Backend(settings)
+    elif backend == 'simulated':
+        return SimulatedBackend(preferences, settings.get('simulated', {}))
+    else:
+        raise ValueError("Unknown ADC backend '{}'".format(backend))
@@ -0,0 +1,243 @@
+###
+#
+#
+#
+# Program Description : Online per-minute and per-hour statistics of every channel.  Each sample
+#                           updates streaming accumulators in constant time, and a summary row
+#                           is written when a minute or an hour is complete.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : aggregator.py
+#
+###
+
+# Imports
+from array import array
+
+import os
+import math
+
+# Project imports
+from src.data_writer import DataWriter
+from src.channel_plan import KIND_ANEMOMETER, KIND_RAIN_GAUGE
+
+# Suffix of the summary file written next to the day file
+SUMMARY_SUFFIX = "_summary.csv"
+
+
+class IntervalAccumulator():
+    # Constructor
+    def __init__(self, channel_count):
+
+        self.channel_count = channel_count
+
+        self.reset()
+
+
+    def reset(self):
+
+        self.count = 0
+        self.start = None
+
+        # Running mean and sum of squared differences from the mean (Welford)
+        self.mean = array('d', bytes(8 * self.channel_count))
+        self.m2 = array('d', bytes(8 * self.channel_count))
+        self.total = array('d', bytes(8 * self.channel_count))
+        self.minimum = array('d', [math.inf] * self.channel_count)
+        self.maximum = array('d', [-math.inf] * self.channel_count)
+
+
+    # Add a sample
+    def add(self, values):
+
+        self.count += 1
+
+        count = self.count
+        mean = self.mean
+        m2 = self.m2
+        total = self.total
+        minimum = self.minimum
+        maximum = self.maximum
+
+        for i, value in enumerate(values):
+            delta = value - mean[i]
+            mean[i] += delta / count
+            m2[i] += delta * (value - mean[i])
+            total[i] += value
+
+            if value < minimum[i]:
+                minimum[i] = value
+
+            if value > maximum[i]:
+                maximum[i] = value
+
+
+    # Add all the samples of another interval, so the hour is built from the minutes
+    # instead of from every sample
+    def merge(self, other):
+
+        if other.count == 0:
+            return
+
+        if self.count == 0:
+            self.start = other.start
+
+        count = self.count + other.count
+
+        for i in range(self.channel_count):
+            delta = other.mean[i] - self.mean[i]
+
+            self.m2[i] += other.m2[i] + delta * delta * self.count * other.count / count
+            self.mean[i] += delta * other.count / count
+            self.total[i] += other.total[i]
+            self.minimum[i] = min(self.minimum[i], other.minimum[i])
+            self.maximum[i] = max(self.maximum[i], other.maximum[i])
+
+        self.count = count
+
+
+    # Population standard deviation of a channel
+    def std(self, i):
+
+        return math.sqrt(self.m2[i] / self.count) if self.count > 0 else 0.0
+
+
+class Aggregator():
+    # Constructor
+    def __init__(self, channels, kinds, data_writer, rain_scale=1.0):
+
+        self.channels = list(channels)
+        self.kinds = kinds
+
+        # Each rain gauge value is the rain in the pulse counter window, so the total of an
+        # interval is the sum of the values times the sample period over the window
+        self.rain_scale = rain_scale
+
+        self.data_writer = data_writer
+
+        self.minute = IntervalAccumulator(len(self.channels))
+        self.hour = IntervalAccumulator(len(self.channels))
+
+
+    # Create an aggregator for the channel plan, the summary file uses the 'dataWriter' settings
+    @classmethod
+    def from_preferences(cls, preferences, channel_plan, sample_period):
+
+        window = preferences.get('pulseCounter', {}).get('window', 1.0)
+
+        return cls(
+            channel_plan.names,
+            channel_plan.kinds,
+            DataWriter.from_preferences(preferences),
+            rain_scale = sample_period / window
+        )
+
+
+    # Name of the summary file of a day file
+    @staticmethod
+    def summary_filename(filename):
+
+        return os.path.splitext(filename)[0] + SUMMARY_SUFFIX
+
+
+    # Open the summary file for a day file, a new file gets the heading
+    def open(self, path, filename):
+
+        summary_filename = self.summary_filename(filename)
+        create_heading = not os.path.isfile(os.path.join(path, summary_filename))
+
+        self.data_writer.rotate(path, summary_filename)
+
+        if create_heading:
+            self.data_writer.write(self.build_heading())
+
+
+    def build_heading(self):
+
+        columns = ["Period", "Year", "Month", "Day", "Hour", "Minutes", "Samples"]
+
+        for name, kind in zip(self.channels, self.kinds):
+            columns += ["{} mean".format(name), "{} min".format(name)]
+
+            # The maximum wind speed of an interval is the gust
+            if kind == KIND_ANEMOMETER:
+                columns.append("{} gust".format(name))
+            else:
+                columns.append("{} max".format(name))
+
+            columns.append("{} std".format(name))
+
+            if kind == KIND_RAIN_GAUGE:
+                columns.append("{} total".format(name))
+
+        return ",".join(columns) + "\n"
+
+
+    # Add a sample, the rows of the minute and hour that ended before it are written first
+    def add(self, timestamp, values):
+
+        minute = timestamp.replace(second=0, microsecond=0)
+
+        if self.minute.count > 0 and minute != self.minute.start:
+            self.complete_minute()
+
+            if minute.replace(minute=0) != self.hour.start:
+                self.complete_hour()
+
+        if self.minute.count == 0:
+            self.minute.start = minute
+
+        self.minute.add(values)
+
+
+    def complete_minute(self):
+
+        self.write_row('minute', self.minute)
+        self.hour.merge(self.minute)
+
+        if self.hour.start is not None:
+            self.hour.start = self.hour.start.replace(minute=0)
+
+        self.minute.reset()
+
+
+    def complete_hour(self):
+
+        if self.hour.count > 0:
+            self.write_row('hour', self.hour)
+
+        self.hour.reset()
+
+
+    def write_row(self, period, interval):
+
+        fields = [period, interval.start.strftime("%Y,%m,%d,%H,%M"), str(interval.count)]
+
+        for i, kind in enumerate(self.kinds):
+            fields.append("{:.5f},{:.5f},{:.5f},{:.5f}".format(
+                    interval.mean[i],
+                    interval.minimum[i],
+                    interval.maximum[i],
+                    interval.std(i)
+                )
+            )
+
+            if kind == KIND_RAIN_GAUGE:
+                fields.append("{:.4f}".format(interval.total[i] * self.rain_scale))
+
+        self.data_writer.write(",".join(fields) + "\n")
+
+
+    # Write the rows of the intervals in progress and close the summary file
+    def close(self):
+
+        if self.minute.count > 0:
+            self.complete_minute()
+
+        self.complete_hour()
+
+        self.data_writer.close()
@@ -0,0 +1,346 @@
+###
+#
+#
+#
+# Program Description : AT command channel for the Sim7600 serial port.  A single reader thread
+#                           splits everything the module sends into lines.  Replies are framed
+#                           on the final result code and returned as soon as they are complete,
+#                           and unsolicited result codes are kept in a separate queue.  The late
+#                           reply of a command that timed out is dropped, so it never completes
+#                           the next command.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : at_channel.py
+#
+###
+
+# Imports
+import queue
+import threading
+import time
+
+# Final result codes that end the reply to a command
+STATUS_OK = 'OK'
+STATUS_ERROR = 'ERROR'
+STATUS_PROMPT = 'PROMPT'
+STATUS_TIMEOUT = 'TIMEOUT'
+
+ERROR_PREFIXES = ('ERROR', '+CME ERROR:', '+CMS ERROR:')
+
+# Lines the module sends on its own, without a command
+URC_PREFIXES = (
+    'RDY', 'RING', 'NO CARRIER', 'PB DONE', 'SMS DONE',
+    '+CPIN:', '+CREG:', '+CGREG:', '+CEREG:', '+CMTI:', '+CGEV:', '+CNMP:', '+CPSI:',
+    '+CTZV:', '*ATREADY:', '+CGNSSINFO:', '+CLIP:'
+)
+
+
+class AtResult():
+    # Constructor
+    def __init__(self, command, status, lines, latency):
+
+        self.command = command
+
+        # OK, ERROR, PROMPT or TIMEOUT
+        self.status = status
+
+        # Information lines of the reply, without the echo and the final result code
+        self.lines = lines
+
+        self.latency = latency
+
+
+    @property
+    def ok(self):
+
+        return self.status == STATUS_OK
+
+
+    # The reply as a single string
+    @property
+    def text(self):
+
+        return '\n'.join(self.lines)
+
+
+    # The first line that starts with prefix, or None
+    def find(self, prefix):
+
+        for line in self.lines:
+            if line.startswith(prefix):
+                return line
+
+        return None
+
+
+    def __repr__(self):
+
+        return "AtResult({!r}, {}, {!r}, {:.3f} s)".format(self.command, self.status, self.lines, self.latency)
+
+
+class CommandStatistics():
+    # Constructor
+    def __init__(self, name):
+
+        self.name = name
+
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class AtChannel():
+    # Constructor
+    def __init__(self, serial_port, urc_queue_size=100, late_reply_wait=0.5):
+
+        self.serial_port = serial_port
+
+        # Reads return after this many seconds so the reader thread can be stopped
+        self.serial_port.timeout = 0.1
+
+        # Only one command can be in progress
+        self.command_lock = threading.Lock()
+
+        # Held while the reply state is changed by the reader thread or by a command
+        self.state_lock = threading.RLock()
+
+        # Reply of the command in progress
+        self.pending = None
+        self.pending_prefix = None
+        self.pending_lines = []
+        self.pending_status = None
+        self.reply_complete = threading.Event()
+
+        # Number of commands that timed out and may still be answered.  A command waits up to
+        # late_reply_wait seconds for their replies before it is written.
+        self.stale_replies = 0
+        self.stale_cleared = threading.Event()
+        self.stale_cleared.set()
+        self.late_reply_wait = late_reply_wait
+
+        self.urcs = queue.Queue(maxsize=urc_queue_size)
+
+        self.statistics = {}
+
+        self.active = False
+        self.thread = None
+
+
+    def start(self):
+
+        if self.active:
+            return
+
+        self.active = True
+
+        self.thread = threading.Thread(target=self.run, name='AtChannel', daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+
+        self.active = False
+
+        if self.thread is not None:
+            self.thread.join(1.0)
+            self.thread = None
+
+
+    # Reader thread, splits the incoming bytes into lines
+    def run(self):
+
+        receive_buffer = b''
+
+        while self.active:
+            try:
+                data = self.serial_port.read(max(1, self.serial_port.in_waiting))
+            except Exception as e:
+                print("AT channel stopped : {}".format(e))
+                self.active = False
+                break
+
+            if not data:
+                continue
+
+            receive_buffer += data
+
+            while b'\n' in receive_buffer:
+                line, receive_buffer = receive_buffer.split(b'\n', 1)
+                line = line.decode('utf-8', 'replace').strip()
+
+                if line:
+                    self.handle_line(line)
+
+            # A prompt for data is not followed by a line ending
+            if receive_buffer.strip() == b'>':
+                receive_buffer = b''
+                self.complete(STATUS_PROMPT)
+
+
+    # Add a line to the reply of the command in progress, or to the unsolicited result codes
+    def handle_line(self, line):
+
+        with self.state_lock:
+            if self.pending is None or self.reply_complete.is_set():
+                if self.stale_replies > 0 and not line.startswith(URC_PREFIXES):
+                    self.drop_stale_line(line)
+                else:
+                    self.add_urc(line)
+
+                return
+
+            # The module echoes the command
+            if line == self.pending:
+                return
+
+            if line == 'OK':
+                self.complete(STATUS_OK)
+            elif line.startswith(ERROR_PREFIXES):
+                self.pending_lines.append(line)
+                self.complete(STATUS_ERROR)
+            elif line.startswith(URC_PREFIXES) and not line.startswith(self.pending_prefix):
+                self.add_urc(line)
+            else:
+                self.pending_lines.append(line)
+
+
+    # A line of the reply to a command that timed out.  The reply ends with its final result code.
+    def drop_stale_line(self, line):
+
+        if line == 'OK' or line.startswith(ERROR_PREFIXES):
+            self.stale_replies -= 1
+
+            if self.stale_replies == 0:
+                self.stale_cleared.set()
+
+
+    def add_urc(self, line):
+
+        try:
+            self.urcs.put_nowait((time.time(), line))
+        except queue.Full:
+            # The oldest code is dropped so the newest is kept
+            self.urcs.get_nowait()
+            self.urcs.put_nowait((time.time(), line))
+
+
+    def complete(self, status):
+
+        with self.state_lock:
+            if self.pending is not None:
+                self.pending_status = status
+                self.reply_complete.set()
+
+
+    # Next unsolicited result code as (time, line), or None if there is none within timeout
+    def get_urc(self, timeout=0):
+
+        try:
+            return self.urcs.get(timeout=timeout) if timeout > 0 else self.urcs.get_nowait()
+        except queue.Empty:
+            return None
+
+
+    # Send a command and wait until the reply is complete or timeout seconds have passed
+    def send(self, command, timeout=5.0):
+
+        with self.command_lock:
+            # The module answers in order, so the late reply of a command that timed out would
+            # complete this one.  It is given a short time to arrive and is dropped when it does.
+            if self.stale_replies > 0 and not self.stale_cleared.wait(min(timeout, self.late_reply_wait)):
+                print("No late reply to {} timed out AT commands, sending {}".format(self.stale_replies, command))
+
+            with self.state_lock:
+                self.stale_replies = 0
+                self.stale_cleared.set()
+
+                self.pending_lines = []
+                self.pending_status = None
+                self.pending_prefix = self.response_prefix(command)
+                self.reply_complete.clear()
+                self.pending = command
+
+            start = time.monotonic()
+
+            self.serial_port.write((command + '\r\n').encode())
+
+            self.reply_complete.wait(timeout)
+
+            with self.state_lock:
+                if self.reply_complete.is_set():
+                    status = self.pending_status
+                else:
+                    # The reply may still arrive, it is dropped by the reader thread
+                    status = STATUS_TIMEOUT
+                    self.stale_replies += 1
+                    self.stale_cleared.clear()
+
+                latency = time.monotonic() - start
+
+                result = AtResult(command, status, self.pending_lines, latency)
+
+                self.pending = None
+
+        self.record(result)
+
+        return result
+
+
+    # Information lines of a reply start with the name of the command, for example +CGPSINFO:
+    def response_prefix(self, command):
+
+        name = self.command_name(command)
+
+        return name[2:] + ':' if name.upper().startswith('AT+') else '\0'
+
+
+    # Name of a command without its parameters, used to group the statistics
+    def command_name(self, command):
+
+        for separator in ('=', '?'):
+            if separator in command:
+                command = command[:command.index(separator)]
+
+        return command
+
+
+    def record(self, result):
+
+        name = self.command_name(result.command)
+
+        if name not in self.statistics:
+            self.statistics[name] = CommandStatistics(name)
+
+        statistics = self.statistics[name]
+
+        statistics.count += 1
+        statistics.total += result.latency
+        statistics.max = max(statistics.max, result.latency)
+
+        if result.status == STATUS_ERROR:
+            statistics.errors += 1
+        elif result.status == STATUS_TIMEOUT:
+            statistics.timeouts += 1
+
+
+    # Print the latency of each command
+    def report(self):
+
+        print("\n     --- AT command latency ---\n")
+
+        for statistics in self.statistics.values():
+            print("{:15} count {:6}   mean {:7.1f} ms   max {:7.1f} ms   errors {}   timeouts {}".format(
+                    statistics.name,
+                    statistics.count,
+                    statistics.total / statistics.count * 1000,
+                    statistics.max * 1000,
+                    statistics.errors,
+                    statistics.timeouts
+                )
+            )
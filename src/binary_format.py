@@ -0,0 +1,339 @@
+###
+#
+#
+#
+# Program Description : Compact binary storage format for the daily data.  Every record is an
+#                           integer timestamp followed by one float32 per channel, and the site
+#                           name, coordinates and channel names are stored once in the header.
+#                           Also contains a memory-mapped reader and a converter from the CSV
+#                           day files.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : binary_format.py
+#
+###
+
+# System imports
+from datetime import datetime, timezone
+
+import os, sys
+import json
+import mmap
+import time
+import struct
+import argparse
+
+# Project imports
+from src.data_writer import DataWriter
+
+# File layout
+#   magic           8 bytes     b'RADBIN01'
+#   header length   uint32      little endian
+#   header          JSON        utf-8, padded with spaces to a multiple of 8 bytes
+#   records         int64 timestamp in milliseconds since the epoch (UTC), float32 per channel
+MAGIC = b'RADBIN01'
+HEADER_LENGTH = struct.Struct('<I')
+PREAMBLE_SIZE = len(MAGIC) + HEADER_LENGTH.size
+
+# Extension used for binary day files
+EXTENSION = '.rad'
+
+
+# Build the header stored at the start of every binary day file
+def build_header(site_name, coordinates, channels):
+
+    return {
+        'version': 1,
+        'siteName': site_name,
+        'coordinates': coordinates,
+        'channels': list(channels),
+        'timestampUnit': 'ms'
+    }
+
+
+# Encode the preamble and header, padded so the records start on an 8 byte boundary
+def encode_header(header):
+
+    encoded = json.dumps(header).encode('utf-8')
+    encoded += b' ' * (-(PREAMBLE_SIZE + len(encoded)) % 8)
+
+    return MAGIC + HEADER_LENGTH.pack(len(encoded)) + encoded
+
+
+# Read the header from an open file, returns the header and the offset of the first record
+def read_header(filehandle):
+
+    preamble = filehandle.read(PREAMBLE_SIZE)
+
+    if len(preamble) < PREAMBLE_SIZE or preamble[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a radiometer binary data file")
+
+    header_length = HEADER_LENGTH.unpack(preamble[len(MAGIC):])[0]
+    header = json.loads(filehandle.read(header_length).decode('utf-8'))
+
+    return header, PREAMBLE_SIZE + header_length
+
+
+# Struct of a single record for the given number of channels
+def record_struct(channel_count):
+
+    return struct.Struct('<q{}f'.format(channel_count))
+
+
+# Convert a UTC datetime to the integer timestamp stored in each record
+def to_timestamp(moment):
+
+    return int(round(moment.timestamp() * 1000))
+
+
+class BinaryWriter():
+    # Constructor
+    def __init__(self, data_writer):
+
+        # Rows are buffered and flushed by a DataWriter, just like the CSV day file
+        self.data_writer = data_writer
+        self.record = None
+
+
+    # Create a writer that uses the 'dataWriter' settings of the preferences
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        return cls(DataWriter.from_preferences(preferences))
+
+
+    def is_open(self):
+
+        return self.data_writer.is_open()
+
+
+    # Open a day file, a new file gets the header and an existing file must match it
+    def open(self, path, filename, header):
+
+        save_location = os.path.join(path, filename)
+
+        self.record = record_struct(len(header['channels']))
+
+        if os.path.isfile(save_location) and os.path.getsize(save_location) > 0:
+            try:
+                with open(save_location, 'rb') as filehandle:
+                    existing, offset = read_header(filehandle)
+            except ValueError as e:
+                # The header was cut off by a power failure, the file is kept aside and a new
+                # file is started
+                damaged_location = "{}.{}.damaged".format(save_location, int(time.time()))
+
+                print("Unable to read the header of {} ({}), moving it to {}".format(save_location, e, damaged_location))
+                os.replace(save_location, damaged_location)
+
+                return self.open(path, filename, header)
+
+            if existing['channels'] != header['channels']:
+                raise ValueError("{} was written with different channels".format(save_location))
+
+            self.trim_partial_record(save_location, offset)
+
+            self.data_writer.rotate(path, filename)
+
+        else:
+            self.data_writer.rotate(path, filename)
+            self.data_writer.write_bytes(encode_header(header))
+            self.data_writer.flush()
+
+
+    # Remove a record that was only partly written when the power failed, so the records that
+    # are appended stay aligned
+    def trim_partial_record(self, save_location, offset):
+
+        size = os.path.getsize(save_location)
+        partial = (size - offset) % self.record.size
+
+        if partial == 0:
+            return
+
+        print("Removing {} bytes of a partial record from the end of {}".format(partial, save_location))
+
+        with open(save_location, 'r+b') as filehandle:
+            filehandle.truncate(size - partial)
+            filehandle.flush()
+            os.fsync(filehandle.fileno())
+
+
+    # Append a record for a sample
+    def write(self, timestamp, values):
+
+        self.data_writer.write_bytes(self.record.pack(to_timestamp(timestamp), *values))
+
+
+    def flush(self):
+
+        self.data_writer.flush()
+
+
+    def close(self):
+
+        self.data_writer.close()
+
+
+class BinaryDayFile():
+    # Constructor
+    def __init__(self, file_path):
+
+        # NumPy is only needed to read the files, it is not required on the radiometer itself
+        import numpy
+
+        self.file_path = file_path
+
+        self.filehandle = open(file_path, 'rb')
+
+        self.header, offset = read_header(self.filehandle)
+        self.channels = self.header['channels']
+
+        dtype = numpy.dtype([
+            ('timestamp', '<i8'),
+            ('values', '<f4', (len(self.channels),))
+        ])
+
+        # A partially written record at the end of the file is ignored
+        count = (os.path.getsize(file_path) - offset) // dtype.itemsize
+
+        if count > 0:
+            self.mmap = mmap.mmap(self.filehandle.fileno(), 0, access=mmap.ACCESS_READ)
+            self.records = numpy.frombuffer(self.mmap, dtype=dtype, count=count, offset=offset)
+        else:
+            self.mmap = None
+            self.records = numpy.zeros(0, dtype=dtype)
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+
+    def __len__(self):
+
+        return len(self.records)
+
+
+    # Timestamps in milliseconds since the epoch, a view on the file
+    @property
+    def timestamps(self):
+
+        return self.records['timestamp']
+
+
+    # Values as a (records, channels) array, a view on the file
+    @property
+    def values(self):
+
+        return self.records['values']
+
+
+    # Values of a single channel by heading name, a view on the file
+    def channel(self, name):
+
+        return self.records['values'][:, self.channels.index(name)]
+
+
+    # The mapping can only be closed once no arrays refer to it
+    def close(self):
+
+        self.records = None
+
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                pass
+
+            self.mmap = None
+
+        self.filehandle.close()
+
+
+# Convert a CSV day file written by build_heading and sample_data to the binary format
+def convert_csv(csv_path, binary_path):
+
+    site_name = ""
+    coordinates = ""
+    channels = None
+
+    record = None
+    converted = 0
+    skipped = 0
+
+    with open(csv_path, encoding='utf-8') as csv_file, open(binary_path, 'wb') as binary_file:
+        for line in csv_file:
+            line = line.rstrip('\n')
+
+            if channels is None:
+                if line.startswith('Site Name : '):
+                    site_name = line[len('Site Name : '):]
+
+                elif line.startswith('Latitude : '):
+                    coordinates = line
+
+                elif ',Year,' in line:
+                    # The last six columns are the date and time
+                    channels = line.split(',')[:-6]
+                    record = record_struct(len(channels))
+
+                    binary_file.write(encode_header(build_header(site_name, coordinates, channels)))
+
+                continue
+
+            fields = line.split(',')
+
+            # Rows that were cut short, for example by a power failure, are skipped
+            if len(fields) != len(channels) + 6:
+                skipped += 1
+                continue
+
+            try:
+                moment = datetime(*[int(field) for field in fields[-6:]], tzinfo=timezone.utc)
+                binary_file.write(record.pack(to_timestamp(moment), *[float(field) for field in fields[:-6]]))
+                converted += 1
+            except ValueError:
+                skipped += 1
+
+    if channels is None:
+        raise ValueError("{} does not contain a heading row".format(csv_path))
+
+    return converted, skipped
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Convert CSV day files to the binary format")
+    parser.add_argument('csv_files', nargs = '+')
+    options = parser.parse_args()
+
+    for csv_path in options.csv_files:
+        binary_path = os.path.splitext(csv_path)[0] + EXTENSION
+
+        converted, skipped = convert_csv(csv_path, binary_path)
+
+        print("{} -> {} : {} rows converted, {} skipped, {} bytes -> {} bytes".format(
+                csv_path,
+                binary_path,
+                converted,
+                skipped,
+                os.path.getsize(csv_path),
+                os.path.getsize(binary_path)
+            )
+        )
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
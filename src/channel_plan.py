@@ -0,0 +1,223 @@
+###
+#
+#
+#
+# Program Description : Compiles the heading configuration from radiometer.json into a
+#                           compact channel plan that can be sampled without re-parsing the
+#                           preferences on every sample.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : channel_plan.py
+#
+###
+
+# System imports
+from array import array
+
+import time
+
+# Channel kinds, stored in the plan as unsigned bytes
+KIND_ADC = 0
+KIND_HUMIDITY = 1
+KIND_ANEMOMETER = 2
+KIND_RAIN_GAUGE = 3
+
+# Formatters used for each kind of channel when the data row is built
+FORMATTERS = {
+    KIND_ADC        : "{:.5f}",
+    KIND_HUMIDITY   : "{:.4f}",
+    KIND_ANEMOMETER : "{:.1f}",     # 1 tick per second = 2.4km/h
+    KIND_RAIN_GAUGE : "{:.4f}"      # 1 tick = 0.2794mm rain
+}
+
+# Heading names of the channels that are not read directly from the ADC
+SPECIAL_CHANNELS = {
+    "Anemometer(km/h)"      : KIND_ANEMOMETER,
+    "RainGauge(mm)"         : KIND_RAIN_GAUGE,
+    "RelativeHumidity(%)"   : KIND_HUMIDITY
+}
+
+# Date and time columns appended to every row
+TIMESTAMP_FORMAT = "%Y,%m,%d,%H,%M,%S\n"
+
+
+class ChannelPlan:
+    # Constructor
+    def __init__(self, preferences, bulk_read=None):
+
+        # Read all the inputs of a plate in one transaction instead of one pin at a time
+        if bulk_read is None:
+            bulk_read = preferences.get('adc', {}).get('bulkRead', True)
+
+        self.bulk_read = bulk_read
+
+        # One entry per channel in heading order, (board, pin, kind, formatter)
+        self.channel_ids = []
+        self.names = []
+        self.boards = array('b')
+        self.pins = array('b')
+        self.kinds = array('B')
+        self.formatters = []
+
+        # The ADC channels grouped by plate, (board, pins, positions in heading order)
+        self.board_groups = []
+
+        # Acquisition latency of every read, in seconds
+        self.read_count = 0
+        self.read_time_total = 0.0
+        self.read_time_max = 0.0
+
+        self.compile(preferences)
+
+
+    # Split the heading string once and store every channel as a plan entry
+    def compile(self, preferences):
+
+        heading_indices = preferences['headingString'].rstrip('\n').split(",")
+
+        for idx in heading_indices:
+            if idx[:2] == "ch":
+                name = preferences['headerIndices'][idx]
+                kind = SPECIAL_CHANNELS.get(name, KIND_ADC)
+
+                self.channel_ids.append(idx)
+                self.names.append(name)
+                self.boards.append(int(idx[2]))
+                self.pins.append(int(idx[3]))
+                self.kinds.append(kind)
+                self.formatters.append(FORMATTERS[kind])
+
+        self.group_by_board()
+
+        # The complete row is formatted with a single call
+        self.row_format = ",".join(self.formatters)
+
+        if self.row_format:
+            self.row_format += ","
+
+
+    # Group the channels that are read from the ADC by plate, so each plate is read once
+    def group_by_board(self):
+
+        self.board_groups = self.board_groups_for(self.adc_positions())
+
+
+    # Positions in heading order of the channels that are read from the ADC
+    def adc_positions(self):
+
+        return [i for i, kind in enumerate(self.kinds) if kind == KIND_ADC or kind == KIND_HUMIDITY]
+
+
+    # Positions of channels by their heading keys, for example 'ch00'
+    def positions_of(self, channel_ids):
+
+        return [self.channel_ids.index(channel_id) for channel_id in channel_ids]
+
+
+    # Group a subset of the ADC channels by plate, (board, pins, positions in heading order)
+    def board_groups_for(self, positions):
+
+        groups = {}
+        board_groups = []
+
+        for i in sorted(positions):
+            if self.boards[i] not in groups:
+                groups[self.boards[i]] = (array('b'), array('b'))
+                board_groups.append((self.boards[i],) + groups[self.boards[i]])
+
+            groups[self.boards[i]][0].append(self.pins[i])
+            groups[self.boards[i]][1].append(i)
+
+        return board_groups
+
+
+    # Number of channels in the plan
+    def __len__(self):
+
+        return len(self.kinds)
+
+
+    # Read every channel in the plan and return the values in heading order
+    def read(self, adc, args):
+
+        return self.convert(self.read_raw(adc), args)
+
+
+    # Read the ADC voltages of the channels in board_groups, every channel by default.  Returns
+    # a row in heading order, the channels that were not read are 0.
+    def read_raw(self, adc, board_groups=None, values=None):
+
+        if board_groups is None:
+            board_groups = self.board_groups
+
+        if values is None:
+            values = [0.0] * len(self.kinds)
+
+        start = time.perf_counter()
+
+        for board, pins, positions in board_groups:
+            if self.bulk_read:
+                readings = adc.get_all_adc(board)
+
+                for pin, position in zip(pins, positions):
+                    values[position] = readings[pin]
+            else:
+                for pin, position in zip(pins, positions):
+                    values[position] = adc.get_adc(board, pin)
+
+        self.record_latency(time.perf_counter() - start)
+
+        return values
+
+
+    # Convert the raw voltages to the values written to the file, and add the gauge values
+    def convert(self, values, args):
+
+        for i, kind in enumerate(self.kinds):
+
+            # Relative humidity is calculated using the formula:
+            # RH = 0.0375 * Vout - 37.7
+            # Vout needs to be in mV and RH in %
+            if kind == KIND_HUMIDITY:
+                Vout = values[i] * 1000 # We have to convert voltage to mV as it is read in V
+                values[i] = 0.0375 * Vout - 37.7
+
+            elif kind == KIND_ANEMOMETER:
+                values[i] = args['anemometer']
+
+            elif kind == KIND_RAIN_GAUGE:
+                values[i] = args['rainGauge']
+
+        return values
+
+
+    def record_latency(self, elapsed):
+
+        self.read_count += 1
+        self.read_time_total += elapsed
+        self.read_time_max = max(self.read_time_max, elapsed)
+
+
+    # Print the acquisition latency statistics
+    def report(self):
+
+        if self.read_count == 0:
+            return
+
+        print("Acquisition latency : {} reads, mean {:.2f} ms, max {:.2f} ms, bulk read {}".format(
+                self.read_count,
+                self.read_time_total / self.read_count * 1000,
+                self.read_time_max * 1000,
+                self.bulk_read
+            )
+        )
+
+
+    # Build the data row for a set of values and a single timestamp
+    def format_row(self, values, timestamp):
+
+        return self.row_format.format(*values) + timestamp.strftime(TIMESTAMP_FORMAT)
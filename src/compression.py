@@ -0,0 +1,147 @@
+###
+#
+#
+#
+# Program Description : Compresses data files before they are uploaded over the cellular link.
+#                           The output is deterministic, so a file that is compressed again
+#                           after a failed upload produces exactly the same bytes.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : compression.py
+#
+###
+
+# System imports
+import os
+import bz2
+import gzip
+import lzma
+import time
+import shutil
+import zipfile
+
+# File extension added by each codec
+EXTENSIONS = {
+    'none'  : '',
+    'gzip'  : '.gz',
+    'bz2'   : '.bz2',
+    'xz'    : '.xz',
+    'zip'   : '.zip'
+}
+
+# Size of the blocks that are read from the source file
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadPackager():
+    # Constructor
+    def __init__(self, staging_path, codec='gzip', level=6):
+
+        if codec not in EXTENSIONS:
+            raise ValueError("Unknown compression codec '{}', expected one of {}".format(codec, list(EXTENSIONS)))
+
+        # Compressed files are written here and removed once they have been uploaded
+        self.staging_path = staging_path
+
+        self.codec = codec
+        self.level = level
+
+
+    # Create a packager from the 'compression' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        settings = preferences.get('compression', {})
+
+        return cls(
+            os.path.join(preferences['savePath'], 'staging'),
+            codec = settings.get('codec', 'gzip'),
+            level = settings.get('level', 6)
+        )
+
+
+    # Name of the file that is uploaded for a source file
+    def package_name(self, source_name):
+
+        return source_name + EXTENSIONS[self.codec]
+
+
+    # Wrap the package file in a compressor
+    def open_output(self, package_file):
+
+        if self.codec == 'gzip':
+            # The name and modification time are left out of the gzip header to keep the output deterministic
+            return gzip.GzipFile(filename='', mode='wb', compresslevel=self.level, fileobj=package_file, mtime=0)
+        elif self.codec == 'bz2':
+            return bz2.BZ2File(package_file, 'wb', compresslevel=self.level)
+        elif self.codec == 'xz':
+            return lzma.LZMAFile(package_file, 'wb', preset=self.level)
+
+
+    # Compress a file for upload, returns the path to the package and the compression statistics
+    def package(self, full_source_path):
+
+        source_name = os.path.basename(full_source_path)
+        original_size = os.path.getsize(full_source_path)
+
+        if self.codec == 'none':
+            return full_source_path, {
+                'originalSize': original_size,
+                'packageSize': original_size,
+                'seconds': 0.0
+            }
+
+        package_path = os.path.join(self.staging_path, self.package_name(source_name))
+
+        start = time.perf_counter()
+
+        if self.codec == 'zip':
+            with zipfile.ZipFile(package_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=self.level) as archive:
+                # A fixed date in the entry keeps the archive deterministic
+                info = zipfile.ZipInfo(source_name, date_time=(1980, 1, 1, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_DEFLATED
+
+                with open(full_source_path, 'rb') as source, archive.open(info, 'w') as destination:
+                    shutil.copyfileobj(source, destination, CHUNK_SIZE)
+        else:
+            with open(full_source_path, 'rb') as source, open(package_path, 'wb') as package_file:
+                with self.open_output(package_file) as output:
+                    shutil.copyfileobj(source, output, CHUNK_SIZE)
+
+        return package_path, {
+            'originalSize': original_size,
+            'packageSize': os.path.getsize(package_path),
+            'seconds': time.perf_counter() - start
+        }
+
+
+    # Remove a package from the staging directory
+    def discard(self, package_path):
+
+        if os.path.dirname(package_path) == self.staging_path and os.path.isfile(package_path):
+            os.remove(package_path)
+
+
+# Print the bytes saved and the time taken to compress a file
+def report(source_name, statistics):
+
+    saved = statistics['originalSize'] - statistics['packageSize']
+
+    if statistics['originalSize'] > 0:
+        ratio = saved / statistics['originalSize'] * 100
+    else:
+        ratio = 0.0
+
+    print("Compressed {} : {} -> {} bytes, {} bytes saved ({:.1f}%) in {:.2f} s".format(
+            source_name,
+            statistics['originalSize'],
+            statistics['packageSize'],
+            saved,
+            ratio,
+            statistics['seconds']
+        )
+    )
@@ -0,0 +1,165 @@
+###
+#
+#
+#
+# Program Description : Long-lived buffered writer for the daily data file.  The file is kept
+#                           open for the whole day and rows are written in batches instead of
+#                           opening, appending and closing the file for every sample.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : data_writer.py
+#
+###
+
+# Imports
+import os
+import time
+
+# Supported fsync policies
+#   never  : leave it to the operating system to write the data to the storage device
+#   flush  : fsync every time the buffer is flushed to the file
+#   always : flush and fsync after every row
+FSYNC_POLICIES = ('never', 'flush', 'always')
+
+
+class DataWriter():
+    # Constructor
+    def __init__(self, flush_bytes=4096, flush_interval=10, fsync_policy='flush', journal=None):
+
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy '{}', expected one of {}".format(fsync_policy, FSYNC_POLICIES))
+
+        # Flush the buffer when it holds this many bytes, or when this many seconds have passed
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+
+        self.save_location = None
+        self.filehandle = None
+
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.last_flush = time.monotonic()
+
+        # Optional SampleJournal, every row is recorded in it with its position in the file
+        # before it is buffered, so the rows that did not reach the file can be restored
+        self.journal = journal
+        self.position = 0
+
+
+    # Create a writer from the 'dataWriter' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        settings = preferences.get('dataWriter', {})
+
+        return cls(
+            flush_bytes = settings.get('flushBytes', 4096),
+            flush_interval = settings.get('flushInterval', 10),
+            fsync_policy = settings.get('fsyncPolicy', 'flush')
+        )
+
+
+    # Is the writer currently attached to a file
+    def is_open(self):
+
+        return self.filehandle is not None
+
+
+    # Open the day file for appending, the file is created if it does not exist
+    def open(self, path, filename):
+
+        self.save_location = os.path.join(path, filename)
+
+        # The buffer is managed by the writer, so the file itself is unbuffered
+        self.filehandle = open(self.save_location, 'ab', buffering=0)
+        self.position = os.fstat(self.filehandle.fileno()).st_size
+        self.last_flush = time.monotonic()
+
+        if self.journal is not None:
+            self.journal.open(filename)
+
+
+    # Flush and close the current file and open the new one
+    def rotate(self, path, filename):
+
+        self.close()
+        self.open(path, filename)
+
+
+    # Add a row to the buffer and flush if a threshold has been reached
+    def write(self, data_string):
+
+        self.write_bytes(data_string.encode('utf-8'))
+
+
+    # Add an encoded row or record to the buffer
+    def write_bytes(self, encoded):
+
+        if self.journal is not None:
+            self.journal.append(self.position, encoded)
+
+        self.position += len(encoded)
+
+        self.buffer.append(encoded)
+        self.buffered_bytes += len(encoded)
+
+        if self.fsync_policy == 'always':
+            self.flush()
+        elif self.buffered_bytes >= self.flush_bytes:
+            self.flush()
+        elif time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+
+    # Write the buffered rows to the file in a single system call
+    def flush(self):
+
+        self.last_flush = time.monotonic()
+
+        if self.filehandle is None or not self.buffer:
+            return
+
+        data = b''.join(self.buffer)
+        written = 0
+
+        # An unbuffered file may accept only part of the data on a single write
+        while written < len(data):
+            written += self.filehandle.write(data[written:])
+
+        self.buffer = []
+        self.buffered_bytes = 0
+
+        # Without a sync on every flush the day file is synced when the journal is full, so the
+        # journal does not grow for the whole day
+        if self.fsync_policy != 'never' or (self.journal is not None and self.journal.is_full()):
+            os.fsync(self.filehandle.fileno())
+
+            # Every journaled row is now in the synced day file
+            if self.journal is not None:
+                self.journal.reset()
+
+
+    # Flush any remaining rows and close the file
+    def close(self):
+
+        if self.filehandle is None:
+            return
+
+        try:
+            self.flush()
+
+            # The journal is only removed once the rows are synced to the day file
+            if self.journal is not None:
+                if self.fsync_policy == 'never':
+                    os.fsync(self.filehandle.fileno())
+
+                self.journal.close(remove=True)
+        finally:
+            self.filehandle.close()
+            self.filehandle = None
+            self.save_location = None
@@ -0,0 +1,253 @@
+###
+#
+#
+#
+# Program Description : Persistent catalog of the data files on the storage device, indexed by
+#                           the date in their name.  Every file has a state that follows it
+#                           through the directories, active in the save path, waiting in the
+#                           'toUpload' directory, done in the 'uploaded' directory or rolled into
+#                           a monthly archive, with its size and checksum, so the directories do
+#                           not have to be scanned.  Files in the 'uploaded' directory whose upload
+#                           was never confirmed are kept in a state of their own.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : file_catalog.py
+#
+###
+
+# Imports
+import os
+import time
+import sqlite3
+import threading
+
+# File states
+ACTIVE = 'active'
+TO_UPLOAD = 'toUpload'
+UPLOADED = 'uploaded'
+ARCHIVED = 'archived'
+
+# In the 'uploaded' directory without a confirmed upload in the upload manifest.  Older versions
+# of the program moved files there even when the upload failed, so these are never removed.
+UNCONFIRMED = 'unconfirmed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name            TEXT PRIMARY KEY,
+    day             TEXT NOT NULL,
+    path            TEXT NOT NULL,
+    state           TEXT NOT NULL,
+    size            INTEGER NOT NULL,
+    sha256          TEXT,
+    updated         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_day ON files (state, day);
+"""
+
+
+# Date of a data file from its name, e.g. 20200924 for 20200924.csv and 20200924_summary.csv.
+# Returns None for files that do not belong to a day, like the sample test.
+def day_of(name):
+
+    day = name[:8]
+
+    if len(day) == 8 and day.isdigit():
+        return day
+
+    return None
+
+
+class CatalogEntry():
+    # Constructor
+    def __init__(self, name, day, path, state, size, sha256):
+
+        self.name = name
+        self.day = day
+        self.path = path
+        self.state = state
+        self.size = size
+        self.sha256 = sha256
+
+
+class FileCatalog():
+    # Constructor
+    def __init__(self, database_path):
+
+        self.database_path = database_path
+
+        # The catalog is updated by the sample writer and by the network worker
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.executescript(SCHEMA)
+
+
+    # Create the catalog in the 'state' directory on the storage device
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        return cls(os.path.join(preferences['savePath'], 'state', 'file_catalog.db'))
+
+
+    # A new catalog has to be built from the directories once
+    def is_empty(self):
+
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0
+
+
+    def upsert(self, name, path, state, size, sha256):
+
+        day = day_of(name)
+
+        if day is None:
+            return False
+
+        with self.lock:
+            self.connection.execute(
+                """
+                INSERT INTO files (name, day, path, state, size, sha256, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    path = excluded.path,
+                    state = excluded.state,
+                    size = excluded.size,
+                    sha256 = COALESCE(excluded.sha256, sha256),
+                    updated = excluded.updated
+                """,
+                (name, day, path, state, size, sha256, time.time())
+            )
+
+        return True
+
+
+    # Record the state and location of a file.  The checksum is kept when none is given, files
+    # without a date in their name are not catalogued.
+    def record(self, path, state, sha256=None):
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+
+        return self.upsert(os.path.basename(path), path, state, size, sha256)
+
+
+    # Record a file that was added to an archive.  The path is the archive and the size is the
+    # compressed size of the file in it.
+    def record_archived(self, name, archive_path, size, sha256=None):
+
+        return self.upsert(name, archive_path, ARCHIVED, size, sha256)
+
+
+    # Remove a file that no longer exists
+    def forget(self, name):
+
+        with self.lock:
+            self.connection.execute("DELETE FROM files WHERE name = ?", (name,))
+
+
+    # Remove the files of an archive that was deleted
+    def forget_archive(self, archive_path):
+
+        with self.lock:
+            self.connection.execute("DELETE FROM files WHERE path = ? AND state = ?", (archive_path, ARCHIVED))
+
+
+    # Number of files recorded in an archive
+    def archived_count(self, archive_path):
+
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM files WHERE path = ? AND state = ?",
+                (archive_path, ARCHIVED)
+            ).fetchone()[0]
+
+
+    # Files in one of the states, oldest day first
+    def oldest(self, states):
+
+        with self.lock:
+            rows = self.connection.execute(
+                """
+                SELECT name, day, path, state, size, sha256 FROM files
+                WHERE state IN ({})
+                ORDER BY day, name
+                """.format(", ".join("?" * len(states))),
+                tuple(states)
+            ).fetchall()
+
+        return [CatalogEntry(*row) for row in rows]
+
+
+    # Names of the files recorded in an archive
+    def archived_names(self, archive_path):
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name FROM files WHERE path = ? AND state = ?",
+                (archive_path, ARCHIVED)
+            ).fetchall()
+
+        return [row[0] for row in rows]
+
+
+    def get(self, name):
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT name, day, path, state, size, sha256 FROM files WHERE name = ?",
+                (name,)
+            ).fetchone()
+
+        return None if row is None else CatalogEntry(*row)
+
+
+    # Files in a state, oldest day first.  Only the days before the given day when one is given.
+    def files(self, state, before=None):
+
+        with self.lock:
+            rows = self.connection.execute(
+                """
+                SELECT name, day, path, state, size, sha256 FROM files
+                WHERE state = ? AND day < ?
+                ORDER BY day, name
+                """,
+                (state, '99999999' if before is None else before)
+            ).fetchall()
+
+        return [CatalogEntry(*row) for row in rows]
+
+
+    # Number of files and bytes in each state
+    def totals(self):
+
+        with self.lock:
+            rows = self.connection.execute("SELECT state, COUNT(*), SUM(size) FROM files GROUP BY state").fetchall()
+
+        return {state: (count, size) for state, count, size in rows}
+
+
+    # Print the number of files and bytes in each state
+    def report(self):
+
+        totals = self.totals()
+
+        print("File catalog : {}".format(
+                ", ".join(
+                    "{} {} ({:.1f} MB)".format(totals.get(state, (0, 0))[0], state, totals.get(state, (0, 0))[1] / 1048576)
+                    for state in (ACTIVE, TO_UPLOAD, UPLOADED, ARCHIVED, UNCONFIRMED)
+                )
+            )
+        )
+
+
+    def close(self):
+
+        with self.lock:
+            self.connection.close()
@@ -8,17 +8,22 @@
 # Authors             : Benjamin Kleynhans
 #
 # Last Modified By    : Benjamin Kleynhans
-# Last Modified Date  : August 19, 2020
+# Last Modified Date  : October 18, 2026
 # Filename            : filemanager.py
 #
 ###
 
 # Imports
 import os, subprocess
-import paramiko
 import json
-import time
-import pdb
+import errno
+import shutil
+
+from src.data_writer import DataWriter
+from src import journal
+from src.journal import SampleJournal
+from src.binary_format import BinaryWriter
+from src.upload_manifest import UploadManifest, sha256_file
 
 class Filemanager():
     # Constructor
@@ -29,6 +34,21 @@ class Filemanager():
         self.preferences = {}
         self.preferences['status'] = None
         
+        # Buffered writer that keeps the day file open between samples
+        self.data_writer = None
+        
+        # Writer for the optional binary copy of the day file
+        self.binary_writer = None
+        
+        # SFTP session that is reused for every file in an upload window
+        self.sftp_session = None
+        
+        # Remote directories that are known to exist in the current session
+        self.remote_directories = set()
+        
+        # Record of the uploads that have been confirmed on the server
+        self.upload_manifest = None
+        
         
     def load_file(self, cfg_file):
         
@@ -46,31 +66,112 @@ class Filemanager():
     def save_to_file(self, path, filename, data_string):
         
         save_location = os.path.join(path, filename)
-
-        filehandle = open(save_location, 'a+')
-        filehandle.writelines(data_string)
-        filehandle.close()
+        
+        # Rows for the day file go through the buffered writer while it is open
+        if self.data_writer is not None and self.data_writer.save_location == save_location:
+            self.data_writer.write(data_string)
+            
+        else:
+            filehandle = open(save_location, 'a+')
+            filehandle.writelines(data_string)
+            filehandle.close()
+        
+    
+    # Keep the day file open in the buffered writer, closing any previously open file
+    def open_data_writer(self, path, filename):
+        
+        if self.data_writer is None:
+            self.data_writer = DataWriter.from_preferences(self.preferences)
+            
+            # The rows are also recorded in a crash-safe journal when it is enabled
+            if self.preferences.get('journal', {}).get('enabled', False):
+                self.data_writer.journal = SampleJournal.from_preferences(self.preferences)
+            
+        self.data_writer.rotate(path, filename)
+        
+    
+    # Remove the torn rows of the day files that were open when the power was lost and restore
+    # the rows from their journals.  This must run before a day file is opened again.
+    def recover_day_files(self):
+        
+        # The rows are only restored when the journal is enabled
+        if self.preferences.get('journal', {}).get('enabled', False):
+            journal.recover(journal.journal_directory(self.preferences), self.preferences['savePath'])
+        
+        # The torn last row is removed whether or not the journal is enabled
+        journal.trim_day_files(self.preferences['savePath'])
+        
+    
+    # Write any buffered rows to the day file without closing it
+    def flush_data_writer(self):
+        
+        if self.data_writer is not None:
+            self.data_writer.flush()
+            
+    
+    # Flush and close the day file, this must happen before the file is moved
+    def close_data_writer(self):
+        
+        if self.data_writer is not None:
+            self.data_writer.close()
+            
+        self.close_binary_writer()
         
     
+    # Open the binary day file, the header is only written when the file is new
+    def open_binary_writer(self, path, filename, header):
+        
+        if self.binary_writer is None:
+            self.binary_writer = BinaryWriter.from_preferences(self.preferences)
+            
+        self.binary_writer.open(path, filename, header)
+        
+    
+    # Append a sample to the binary day file if it is open
+    def save_binary_record(self, timestamp, values):
+        
+        if self.binary_writer is not None and self.binary_writer.is_open():
+            self.binary_writer.write(timestamp, values)
+            
+    
+    def close_binary_writer(self):
+        
+        if self.binary_writer is not None:
+            self.binary_writer.close()
+        
+    
+    # Open a single SFTP session for the upload window, returns True when connected
     def connect_sftp(self):
         
-        self.ssh_client = paramiko.SSHClient()
-        self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        # Close the previous session, so connections are never left open
+        self.disconnect_sftp()
         
-        connected = False
+        # The SSH stack takes a long time to import, so it is only loaded when the first upload
+        # window opens instead of when the program starts
+        from src.sftp_session import SftpSession
         
-        for host in self.preferences['protocol']['ssh']['servers']:
-            if not connected:
-                try:
-                    self.ssh_client.connect(
-                        hostname=host,
-                        username=self.preferences['protocol']['ssh']['username'],
-                        password=self.preferences['protocol']['ssh']['password']
-                    )
-                    
-                    connected = True
-                except:
-                    continue
+        self.sftp_session = SftpSession.from_preferences(self.preferences)
+        self.get_upload_manifest()
+        
+        return self.sftp_session.open()
+    
+    
+    # The upload manifest, loaded the first time it is needed
+    def get_upload_manifest(self):
+        
+        if self.upload_manifest is None:
+            self.upload_manifest = UploadManifest.from_preferences(self.preferences)
+        
+        return self.upload_manifest
+        
+    
+    def disconnect_sftp(self):
+        
+        if self.sftp_session is not None:
+            self.sftp_session.close()
+            self.sftp_session = None
+            
+        self.remote_directories = set()
                     
     
     def check_directory_requirements(self):
@@ -78,7 +179,7 @@ class Filemanager():
         print ("Checking required directory structure on USB drive\n")
         
         # The required directories
-        required_dirs = ['toUpload', 'uploaded']
+        required_dirs = ['toUpload', 'uploaded', 'staging', 'state']
         
         # Get a list of directories in the /mnt/storage path
         existing_dirs = self.get_local_directories(self.preferences['savePath'])
@@ -108,41 +209,32 @@ class Filemanager():
         
         # Construct the path to get a directory listing for existing sites
         path_to_sites = self.preferences['protocol']['ssh']['remoteDestinationPath']
-        sites = self.get_remote_directories(path_to_sites)
         path_to_years = os.path.join(path_to_sites, site_name)
+        path_to_months = os.path.join(path_to_years, str(year))
+        path_to_days = os.path.join(path_to_months, str(month))
         
-        # If the site name does not exist, create it
-        if not site_name in sites:
-            stdin, stdout, stderr = self.ssh_client.exec_command("mkdir {}".format(path_to_years))
+        # The directories only have to be checked once per session
+        if path_to_days in self.remote_directories:
+            return
         
-        # Construct the path to get a directory listing for existing years
-        years = self.get_remote_directories(path_to_years)
-        path_to_months = os.path.join(path_to_years, str(year))
+        # If the site name does not exist, create it
+        if not site_name in self.get_remote_directories(path_to_sites):
+            self.sftp_session.mkdir(path_to_years)
         
         # If the year does not exist, create it
-        if not year in years:
-            stdin, stdout, stderr = self.ssh_client.exec_command("mkdir {}".format(path_to_months))
-        
-        # Construct the path to get a directory listing for existing months
-        months = self.get_remote_directories(path_to_months)
-        path_to_days = os.path.join(path_to_months, str(month))
+        if not year in self.get_remote_directories(path_to_years):
+            self.sftp_session.mkdir(path_to_months)
         
         # If the month does not exist, create it
-        if not month in months:            
-            stdin, stdout, stderr = self.ssh_client.exec_command("mkdir {}".format(path_to_days))
+        if not month in self.get_remote_directories(path_to_months):
+            self.sftp_session.mkdir(path_to_days)
+            
+        self.remote_directories.add(path_to_days)
             
                                 
     def get_remote_directories(self, path):
         
-        stdin, stdout, stderr = self.ssh_client.exec_command("ls {}".format(path))
-        
-        unformatted_entries = stdout.readlines()
-        formatted_entries = []
-        
-        for entry in unformatted_entries:
-            formatted_entries.append(entry.rstrip('\n'))
-            
-        return formatted_entries
+        return self.sftp_session.listdir(path)
         
         
     def get_local_files(self, path):
@@ -155,44 +247,260 @@ class Filemanager():
         return [f for f in os.listdir(path) if os.path.isdir(os.path.join(path, f))]
     
     
-    def upload_to_server(self, full_source_path, full_destination_path):
+    # Upload a file and verify the remote copy against the hash of the local file.  A partial
+    # remote file left by an interrupted upload is resumed from its current size.  Returns True
+    # once the upload has been confirmed and recorded in the manifest.
+    def upload_to_server(self, full_source_path, full_destination_path, source_name=None):
+        
+        if source_name is None:
+            source_name = os.path.basename(full_source_path)
+        
+        local_size = os.path.getsize(full_source_path)
+        local_sha256 = sha256_file(full_source_path)
+        
+        if self.upload_manifest.is_confirmed(source_name, local_sha256):
+            print("{} was already confirmed on the server".format(source_name))
+            return True
+        
+        # Resume from the end of the remote file, unless it is larger than the local file
+        offset = 0
+        remote_size = self.sftp_session.remote_size(full_destination_path)
+        
+        if remote_size is not None and remote_size <= local_size:
+            offset = remote_size
+            
+            if offset > 0:
+                print("Resuming upload at byte {} of {}".format(offset, local_size))
+        
+        self.transfer(full_source_path, full_destination_path, offset)
+        remote_sha256 = self.sftp_session.remote_sha256(full_destination_path)
+        
+        # The bytes that were already on the server did not match, send the whole file again
+        if remote_sha256 != local_sha256 and offset > 0:
+            print("Resumed upload of {} does not match, uploading the complete file".format(source_name))
+            
+            self.transfer(full_source_path, full_destination_path, 0)
+            remote_sha256 = self.sftp_session.remote_sha256(full_destination_path)
+        
+        if remote_sha256 != local_sha256:
+            print("Checksum mismatch for {} : local {} remote {}".format(source_name, local_sha256, remote_sha256))
+            return False
+        
+        # A copy of the file that was built up by the intraday uploads
+        live_copy = self.upload_manifest.increment_path(source_name)
+        
+        self.upload_manifest.confirm(
+            source_name,
+            os.path.basename(full_source_path),
+            local_size,
+            local_sha256,
+            full_destination_path
+        )
+        
+        print("{} verified, sha256 {}".format(source_name, local_sha256))
+        
+        # The verified file replaces the intraday copy when they are stored under different names
+        if live_copy is not None and live_copy != full_destination_path:
+            print("Removing intraday copy {}".format(live_copy))
+            self.sftp_session.remove(live_copy)
+        
+        return True
+        
+    
+    # Append the bytes that were added to the active day file since the last intraday upload to
+    # the remote copy.  The size of the remote copy is the offset, so an interrupted transfer
+    # continues where it stopped.  The file can still be growing, so only the bytes before end,
+    # the size when its rows were last flushed, are sent.  Returns the number of bytes sent.
+    def upload_increment(self, full_source_path, full_destination_path, source_name, end=None):
+        
+        local_size = os.path.getsize(full_source_path) if end is None else end
+        remote_size = self.sftp_session.remote_size(full_destination_path)
+        
+        # A remote file that is larger than the local file is not a copy of it, replace it
+        if remote_size is None or remote_size > local_size:
+            offset = 0
+        else:
+            offset = remote_size
+        
+        if offset == local_size:
+            print("No new data in {} since the last upload".format(source_name))
+            return 0
+        
+        print("Sending bytes {} to {} of {}".format(offset, local_size, source_name))
+        
+        statistics = self.transfer(full_source_path, full_destination_path, offset, local_size)
+        
+        self.upload_manifest.record_increment(source_name, offset + statistics['bytes'], full_destination_path)
+        
+        return statistics['bytes']
+        
+    
+    # Send a file, or the part of it from offset to end, and print the throughput
+    def transfer(self, full_source_path, full_destination_path, offset, end=None):
+        
+        statistics = self.sftp_session.put(full_source_path, full_destination_path, offset, end)
+        
+        print("Transferred {} bytes in {:.2f} s ({:.1f} kB/s)".format(
+                statistics['bytes'],
+                statistics['seconds'],
+                statistics['throughput'] / 1024
+            )
+        )
         
-        sftp_client = self.ssh_client.open_sftp()
-        sftp_client.put(full_source_path, full_destination_path)
-        sftp_client.close()
+        return statistics
 
 
+    # Move a file into a directory, or to a new file name.  On the same filesystem this is an
+    # atomic rename, across filesystems the file is copied, synced and then removed.
+    # Returns True if the file was moved.
     def move_file(self, full_source_path, local_destination_path):
         
-        command_string = "sudo mv "
-        command_string += full_source_path
-        command_string += " "
-        command_string += local_destination_path
+        full_destination_path = self.destination_path(full_source_path, local_destination_path)
+        
+        try:
+            try:
+                os.rename(full_source_path, full_destination_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
                 
-        os.popen(command_string)
+                self.copy_synced(full_source_path, full_destination_path)
+                os.remove(full_source_path)
+            
+            self.sync_directory(os.path.dirname(full_destination_path))
+            
+            return True
+        
+        except PermissionError:
+            return self.privileged_command(['mv', full_source_path, full_destination_path])
+        
+        except OSError as e:
+            print("Unable to move {} to {} : {}".format(full_source_path, full_destination_path, e))
+            
+            return False
     
     
+    # Copy a file into a directory, or to a new file name.  The copy only appears under its
+    # final name once all of its data is on the storage device.  Returns True if the file was copied.
     def copy_file(self, full_source_path, local_destination_path):
         
-        command_string = "sudo cp "
-        command_string += full_source_path
-        command_string += " "
-        command_string += local_destination_path
-                
-        os.popen(command_string)
+        full_destination_path = self.destination_path(full_source_path, local_destination_path)
+        
+        try:
+            self.copy_synced(full_source_path, full_destination_path)
+            
+            return True
+        
+        except PermissionError:
+            return self.privileged_command(['cp', full_source_path, full_destination_path])
+        
+        except OSError as e:
+            print("Unable to copy {} to {} : {}".format(full_source_path, full_destination_path, e))
+            
+            return False
     
     
+    # Returns True if the file was deleted
     def delete_file(self, full_file_path):
         
-        command_string = "sudo rm "
-        command_string += full_file_path
+        try:
+            os.remove(full_file_path)
+            
+            return True
         
-        os.popen(command_string)
+        except PermissionError:
+            return self.privileged_command(['rm', full_file_path])
         
+        except OSError as e:
+            print("Unable to delete {} : {}".format(full_file_path, e))
+            
+            return False
         
+        
+    # Returns True if the directory exists
     def create_local_directory(self, directory_path):
         
-        command_string = "sudo mkdir "
-        command_string += directory_path
+        try:
+            os.makedirs(directory_path, exist_ok=True)
+            
+            return True
+        
+        except PermissionError:
+            return self.privileged_command(['mkdir', '-p', directory_path])
+        
+        except OSError as e:
+            print("Unable to create {} : {}".format(directory_path, e))
+            
+            return False
+    
+    
+    # A destination directory keeps the name of the source file
+    def destination_path(self, full_source_path, local_destination_path):
+        
+        if os.path.isdir(local_destination_path):
+            return os.path.join(local_destination_path, os.path.basename(full_source_path))
+        
+        return local_destination_path
+    
+    
+    # Copy to a temporary file, sync it and rename it to the destination
+    def copy_synced(self, full_source_path, full_destination_path):
+        
+        temporary_path = full_destination_path + '.tmp'
+        
+        try:
+            with open(full_source_path, 'rb') as source, open(temporary_path, 'wb') as destination:
+                shutil.copyfileobj(source, destination, 64 * 1024)
+                
+                destination.flush()
+                os.fsync(destination.fileno())
+            
+            os.replace(temporary_path, full_destination_path)
+        
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            
+            raise
+        
+        self.sync_directory(os.path.dirname(full_destination_path))
+    
+    
+    # Make a rename or a new file in a directory durable
+    def sync_directory(self, directory_path):
+        
+        try:
+            directory = os.open(directory_path or '.', os.O_RDONLY)
+        except OSError:
+            return
+        
+        try:
+            os.fsync(directory)
+        except OSError:
+            pass
+        finally:
+            os.close(directory)
+    
+    
+    # Run a file operation with sudo when the program does not have the permissions itself.
+    # The command runs to completion and fails instead of asking for a password.
+    def privileged_command(self, arguments):
+        
+        try:
+            result = subprocess.run(
+                ['sudo', '-n'] + arguments,
+                stdout = subprocess.PIPE,
+                stderr = subprocess.PIPE,
+                timeout = 60
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print("Unable to run {} : {}".format(' '.join(arguments), e))
+            
+            return False
+        
+        if result.returncode != 0:
+            print("{} failed : {}".format(' '.join(arguments), result.stderr.decode('utf-8').strip()))
+            
+            return False
         
-        os.popen(command_string)
+        return True
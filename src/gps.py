@@ -0,0 +1,315 @@
+###
+#
+#
+#
+# Program Description : GPS position handling for the Sim7600.  Converts the NMEA
+#                           degrees and decimal minutes format to decimal degrees, keeps the
+#                           last good fix on the storage device so a restart does not wait for
+#                           the GPS, and refines the position from the NMEA stream in the
+#                           background.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : gps.py
+#
+###
+
+# Imports
+from datetime import datetime, timezone
+
+import os
+import json
+import threading
+
+
+# Convert a position in the NMEA format (ddmm.mmmm or dddmm.mmmm) to signed decimal degrees
+def nmea_to_decimal(value, hemisphere):
+
+    value = value.strip()
+    dot = value.index('.') if '.' in value else len(value)
+
+    decimal = float(value[:dot - 2]) + float(value[dot - 2:]) / 60
+
+    if hemisphere.strip() in ('S', 'W'):
+        decimal = -decimal
+
+    return decimal
+
+
+# Split decimal degrees into the degrees, minutes and seconds written in the file heading
+def decimal_to_dms(decimal, positive, negative):
+
+    direction = positive if decimal >= 0 else negative
+    absolute = abs(decimal)
+
+    degrees = int(absolute)
+    minutes = int((absolute - degrees) * 60)
+    seconds = (absolute - degrees - minutes / 60) * 3600
+
+    return {
+        'degrees': degrees,
+        'minutes': minutes,
+        'seconds': seconds,
+        'direction': direction,
+        'decimal': decimal
+    }
+
+
+# Coordinates in the format of the 'coordinates' section of the preferences
+def coordinates_from_decimal(latitude, longitude):
+
+    return {
+        'latitude': decimal_to_dms(latitude, 'N', 'S'),
+        'longitude': decimal_to_dms(longitude, 'E', 'W')
+    }
+
+
+def build_fix(latitude, longitude, source, hdop=None, samples=1):
+
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'source': source,
+        'hdop': hdop,
+        'samples': samples
+    }
+
+
+# Parse the reply to AT+CGPSINFO, returns a fix or None if the GPS has no fix yet
+#   +CGPSINFO: 4307.123456,N,07740.654321,W,181026,150102.0,120.3,0.0,
+def parse_cgpsinfo(line):
+
+    fields = line[line.index(':') + 1:].split(',')
+
+    if len(fields) < 4 or not fields[0].strip() or not fields[2].strip():
+        return None
+
+    try:
+        return build_fix(
+            nmea_to_decimal(fields[0], fields[1]),
+            nmea_to_decimal(fields[2], fields[3]),
+            'CGPSINFO'
+        )
+    except ValueError:
+        return None
+
+
+# Does the checksum of an NMEA sentence match its contents
+def valid_checksum(sentence):
+
+    if not sentence.startswith('$') or '*' not in sentence:
+        return False
+
+    body, checksum = sentence[1:].split('*', 1)
+
+    calculated = 0
+
+    for character in body:
+        calculated ^= ord(character)
+
+    try:
+        return calculated == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+# Parse a GGA sentence, returns (latitude, longitude, satellites, hdop) or None without a fix
+#   $GPGGA,150102.00,4307.1234,N,07740.6543,W,1,08,0.9,120.3,M,-34.2,M,,*5C
+def parse_gga(sentence):
+
+    if not valid_checksum(sentence):
+        return None
+
+    fields = sentence.split('*')[0].split(',')
+
+    if len(fields) < 9 or not fields[0].endswith('GGA'):
+        return None
+
+    try:
+        if int(fields[6] or 0) == 0:
+            return None
+
+        return (
+            nmea_to_decimal(fields[2], fields[3]),
+            nmea_to_decimal(fields[4], fields[5]),
+            int(fields[7] or 0),
+            float(fields[8] or 99.9)
+        )
+    except ValueError:
+        return None
+
+
+class FixStore():
+    # Constructor
+    def __init__(self, fix_path, max_age=604800):
+
+        self.fix_path = fix_path
+
+        # A stored fix older than this many seconds is not used
+        self.max_age = max_age
+
+
+    # Create a store in the 'state' directory from the 'gps' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        settings = preferences.get('gps', {})
+
+        return cls(
+            os.path.join(preferences['savePath'], 'state', 'last_fix.json'),
+            max_age = settings.get('maxFixAge', 604800)
+        )
+
+
+    # The stored fix, or None if there is none or it is too old
+    def load(self):
+
+        try:
+            with open(self.fix_path) as json_file:
+                fix = json.load(json_file)
+
+            age = datetime.now(timezone.utc) - datetime.fromisoformat(fix['timestamp'])
+        except (IOError, ValueError, KeyError):
+            return None
+
+        if age.total_seconds() > self.max_age:
+            return None
+
+        return fix
+
+
+    # Write the fix to a temporary file and rename it so the stored fix is never partial
+    def save(self, fix):
+
+        temporary_path = self.fix_path + '.tmp'
+
+        try:
+            with open(temporary_path, 'w') as json_file:
+                json.dump(fix, json_file, indent=4)
+                json_file.flush()
+                os.fsync(json_file.fileno())
+
+            os.replace(temporary_path, self.fix_path)
+        except IOError as e:
+            print("Unable to store the GPS fix : {}".format(e))
+
+
+class NmeaStream():
+    # Constructor
+    def __init__(self, port, baud_rate, on_fix, max_hdop=2.0, max_backoff=60.0):
+
+        self.port = port
+        self.baud_rate = baud_rate
+
+        # Called with the refined fix every time a usable sentence is received
+        self.on_fix = on_fix
+
+        # Fixes with a larger horizontal dilution of precision are not used
+        self.max_hdop = max_hdop
+
+        # The port disappears while the module restarts, so it is opened again after a delay
+        # that doubles with every failed attempt up to this many seconds
+        self.max_backoff = max_backoff
+
+        # The radiometer does not move, so the position is the running mean of every usable fix
+        self.samples = 0
+        self.latitude = 0.0
+        self.longitude = 0.0
+        self.best_hdop = None
+
+        self.active = False
+        self.stopped = threading.Event()
+        self.thread = None
+        self.serial_port = None
+
+
+    # Create a stream from the 'gps' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences, on_fix):
+
+        settings = preferences.get('gps', {})
+
+        return cls(
+            settings.get('nmeaPort', '/dev/ttyUSB1'),
+            settings.get('nmeaBaudRate', 115200),
+            on_fix,
+            max_hdop = settings.get('maxHdop', 2.0),
+            max_backoff = settings.get('nmeaMaxBackoff', 60.0)
+        )
+
+
+    def start(self):
+
+        if self.active:
+            return
+
+        self.active = True
+        self.stopped.clear()
+
+        self.thread = threading.Thread(target=self.run, name='NmeaStream', daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+
+        self.active = False
+        self.stopped.set()
+
+        if self.thread is not None:
+            self.thread.join(1.0)
+            self.thread = None
+
+
+    def run(self):
+
+        import serial
+
+        backoff = 1.0
+
+        while self.active:
+            try:
+                self.serial_port = serial.Serial(self.port, self.baud_rate, timeout=0.5)
+
+                while self.active:
+                    line = self.serial_port.readline().decode('ascii', 'replace').strip()
+
+                    if line:
+                        backoff = 1.0
+                        self.handle_sentence(line)
+            except Exception as e:
+                print("NMEA stream on {} interrupted : {}, reopening in {:.0f} s".format(self.port, e, backoff))
+            finally:
+                if self.serial_port is not None:
+                    self.serial_port.close()
+                    self.serial_port = None
+
+            if self.active:
+                self.stopped.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+
+    # Add a usable GGA sentence to the running mean of the position
+    def handle_sentence(self, sentence):
+
+        position = parse_gga(sentence)
+
+        if position is None:
+            return
+
+        latitude, longitude, satellites, hdop = position
+
+        if hdop > self.max_hdop:
+            return
+
+        self.samples += 1
+        self.latitude += (latitude - self.latitude) / self.samples
+        self.longitude += (longitude - self.longitude) / self.samples
+
+        if self.best_hdop is None or hdop < self.best_hdop:
+            self.best_hdop = hdop
+
+        self.on_fix(build_fix(self.latitude, self.longitude, 'NMEA', self.best_hdop, self.samples))
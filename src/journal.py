@@ -0,0 +1,330 @@
+###
+#
+#
+#
+# Program Description : Append-only journal of the rows written to the day file.  Every record
+#                           holds the position of the row in the day file and a CRC-32 of the
+#                           row, and records are committed to the storage device in groups.
+#                           After a power failure the torn tail of the day file is removed and
+#                           the committed rows that did not reach it are restored from the journal.
+#                           The torn tail is also removed from day files without a journal.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : journal.py
+#
+###
+
+# Imports
+import os
+import time
+import zlib
+import struct
+
+# Every record is the length of the row, its position in the day file and the CRC-32 of the
+# position and the row, followed by the row
+RECORD_HEADER = struct.Struct('<IQI')
+
+# Extension of the journal of a day file
+EXTENSION = ".journal"
+
+# Bytes read at a time when the end of the last complete row is searched
+TAIL_BLOCK = 4096
+
+
+# Directory of the journals on the storage device
+def journal_directory(preferences):
+
+    return os.path.join(preferences['savePath'], 'state', 'journal')
+
+
+def record_checksum(offset, payload):
+
+    return zlib.crc32(payload, zlib.crc32(struct.pack('<Q', offset)))
+
+
+# Read the valid records of an open journal one at a time.  Yields the offset and row of every
+# record and the end of the record in the journal, a record that is incomplete or fails its
+# checksum ends the journal.
+def read_records(journal_file):
+
+    record_end = 0
+
+    while True:
+        header = journal_file.read(RECORD_HEADER.size)
+
+        if len(header) < RECORD_HEADER.size:
+            return
+
+        length, offset, checksum = RECORD_HEADER.unpack(header)
+        payload = journal_file.read(length)
+
+        if len(payload) != length or record_checksum(offset, payload) != checksum:
+            return
+
+        record_end += RECORD_HEADER.size + length
+
+        yield offset, payload, record_end
+
+
+# Position after the last complete row of a file
+def last_row_end(filehandle, size):
+
+    position = size
+
+    while position > 0:
+        start = max(position - TAIL_BLOCK, 0)
+
+        filehandle.seek(start)
+        block = filehandle.read(position - start)
+
+        newline = block.rfind(b'\n')
+
+        if newline >= 0:
+            return start + newline + 1
+
+        position = start
+
+    return 0
+
+
+# Remove the torn last row of a day file.  Returns the number of bytes removed.
+def trim_day_file(day_file_path):
+
+    with open(day_file_path, 'r+b') as day_file:
+        size = os.fstat(day_file.fileno()).st_size
+        end = last_row_end(day_file, size)
+
+        if end < size:
+            day_file.truncate(end)
+            os.fsync(day_file.fileno())
+
+    return size - end
+
+
+# Remove the torn last row of every day file in the save path.  Only the end of each file is
+# read, so this runs at every start whether or not the journal is enabled.
+def trim_day_files(save_path):
+
+    for filename in sorted(os.listdir(save_path)):
+        day_file_path = os.path.join(save_path, filename)
+
+        if not filename.endswith('.csv') or not os.path.isfile(day_file_path):
+            continue
+
+        try:
+            torn = trim_day_file(day_file_path)
+        except OSError as e:
+            print("Unable to check the last row of {} : {}".format(filename, e))
+            continue
+
+        if torn > 0:
+            print("Removed the torn last row of {} ({} bytes)".format(filename, torn))
+
+
+# Remove the torn last row of a day file and append the journal records after its last complete
+# row.  Returns the number of bytes removed, the number of rows restored, the number of valid
+# records and the end of the valid part of the journal.
+def restore_day_file(day_file_path, records):
+
+    with open(day_file_path, 'r+b') as day_file:
+        size = os.fstat(day_file.fileno()).st_size
+        end = last_row_end(day_file, size)
+
+        torn = size - end
+
+        if torn > 0:
+            day_file.truncate(end)
+
+        restored = 0
+        read = 0
+        valid_end = 0
+
+        day_file.seek(end)
+
+        for offset, payload, record_end in records:
+            read += 1
+            valid_end = record_end
+
+            if offset < end:
+                continue
+
+            if offset > end:
+                print("Journal of {} has a gap of {} bytes at {}".format(os.path.basename(day_file_path), offset - end, end))
+
+            day_file.write(payload)
+            end += len(payload)
+            restored += 1
+
+        day_file.flush()
+        os.fsync(day_file.fileno())
+
+    return torn, restored, read, valid_end
+
+
+# Repair the day files that were open when the program stopped.  A journal whose day file is no
+# longer in the save path belongs to a day that was closed, so it is removed.
+def recover(journal_directory, save_path):
+
+    if not os.path.isdir(journal_directory):
+        return
+
+    for journal_name in sorted(os.listdir(journal_directory)):
+        if not journal_name.endswith(EXTENSION):
+            continue
+
+        journal_path = os.path.join(journal_directory, journal_name)
+        day_file_path = os.path.join(save_path, journal_name[:-len(EXTENSION)])
+
+        if not os.path.isfile(day_file_path):
+            os.remove(journal_path)
+            continue
+
+        start = time.perf_counter()
+
+        # The records are streamed, the journal of a whole day does not have to fit in memory
+        with open(journal_path, 'rb') as journal_file:
+            torn, restored, records, valid_end = restore_day_file(day_file_path, read_records(journal_file))
+
+        # The torn tail of the journal is removed, so new records follow the valid ones
+        if valid_end < os.path.getsize(journal_path):
+            with open(journal_path, 'r+b') as journal_file:
+                journal_file.truncate(valid_end)
+                os.fsync(journal_file.fileno())
+
+        print("Recovered {} : {} journal records, {} torn bytes removed, {} rows restored in {:.1f} ms".format(
+                os.path.basename(day_file_path),
+                records,
+                torn,
+                restored,
+                (time.perf_counter() - start) * 1000
+            )
+        )
+
+
+class SampleJournal():
+    # Constructor
+    def __init__(self, journal_directory, commit_records=10, commit_interval=5.0, max_bytes=1048576):
+
+        self.journal_directory = journal_directory
+
+        # The day file is synced and the journal emptied once it holds this many bytes, so it
+        # stays small when the day file is not synced on every flush
+        self.max_bytes = max_bytes
+        self.size = 0
+
+        # Records are written and synced when this many are waiting, or when this many seconds
+        # have passed since the last commit
+        self.commit_records = commit_records
+        self.commit_interval = commit_interval
+
+        self.journal_path = None
+        self.filehandle = None
+
+        self.pending = []
+        self.pending_records = 0
+        self.last_commit = time.monotonic()
+
+        # Statistics
+        self.records = 0
+        self.commits = 0
+
+
+    # Create a journal from the 'journal' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        settings = preferences.get('journal', {})
+
+        return cls(
+            journal_directory(preferences),
+            commit_records = settings.get('commitRecords', 10),
+            commit_interval = settings.get('commitInterval', 5.0),
+            max_bytes = settings.get('maxBytes', 1048576)
+        )
+
+
+    # Open the journal of a day file, the records are added to an existing journal
+    def open(self, filename):
+
+        os.makedirs(self.journal_directory, exist_ok=True)
+
+        self.journal_path = os.path.join(self.journal_directory, filename + EXTENSION)
+        self.filehandle = open(self.journal_path, 'ab', buffering=0)
+        self.size = os.fstat(self.filehandle.fileno()).st_size
+        self.last_commit = time.monotonic()
+
+
+    # Add the row written at offset in the day file
+    def append(self, offset, payload):
+
+        self.pending.append(RECORD_HEADER.pack(len(payload), offset, record_checksum(offset, payload)))
+        self.pending.append(payload)
+        self.pending_records += 1
+        self.records += 1
+
+        if self.pending_records >= self.commit_records or time.monotonic() - self.last_commit >= self.commit_interval:
+            self.commit()
+
+
+    # Write the waiting records in one system call and sync them to the storage device
+    def commit(self):
+
+        self.last_commit = time.monotonic()
+
+        if self.filehandle is None or not self.pending:
+            return
+
+        data = b''.join(self.pending)
+        written = 0
+
+        while written < len(data):
+            written += self.filehandle.write(data[written:])
+
+        os.fsync(self.filehandle.fileno())
+
+        self.size += len(data)
+
+        self.pending = []
+        self.pending_records = 0
+        self.commits += 1
+
+
+    # Has the journal reached its size limit
+    def is_full(self):
+
+        return self.size >= self.max_bytes
+
+
+    # Discard the records once the day file has been synced, the rows are then safe in the day
+    # file itself
+    def reset(self):
+
+        self.pending = []
+        self.pending_records = 0
+        self.size = 0
+
+        if self.filehandle is not None:
+            self.filehandle.truncate(0)
+
+
+    # Close the journal.  It is removed once the day file has been synced, the rows are then
+    # safe in the day file itself.
+    def close(self, remove=False):
+
+        if self.filehandle is None:
+            return
+
+        try:
+            self.commit()
+        finally:
+            self.filehandle.close()
+            self.filehandle = None
+
+        if remove:
+            os.remove(self.journal_path)
+
+        self.journal_path = None
@@ -0,0 +1,314 @@
+###
+#
+#
+#
+# Program Description : Counters and latency histograms for the hot paths of the radiometer.
+#                           They are written periodically to a file in the Prometheus text
+#                           format and to a small rolling log.  When the metrics are disabled
+#                           nothing is instrumented, so there is no cost at all.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : metrics.py
+#
+###
+
+# Imports
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+import os
+import time
+import functools
+import threading
+
+# Bucket upper bounds in seconds for the hot path latencies
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Bucket upper bounds in seconds for the modem stages
+STAGE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 90, 120, 300)
+
+# Bucket upper bounds in bytes per second for the upload throughput
+THROUGHPUT_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+# Format labels as {name="value",...}
+def format_labels(labels, extra=None):
+
+    pairs = list(labels)
+
+    if extra is not None:
+        pairs.append(extra)
+
+    if not pairs:
+        return ""
+
+    return "{" + ",".join('{}="{}"'.format(name, value) for name, value in pairs) + "}"
+
+
+class Counter():
+    # Constructor
+    def __init__(self):
+
+        self.value = 0
+
+
+    def inc(self, amount=1):
+
+        self.value += amount
+
+
+class Histogram():
+    # Constructor
+    def __init__(self, buckets):
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value):
+
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics():
+    # Constructor
+    def __init__(self, metrics_path, log_path, max_log_bytes=262144, prefix='radiometer_'):
+
+        self.metrics_path = metrics_path
+        self.log_path = log_path
+
+        # The log is moved to a backup when it reaches this size, so at most twice this is kept
+        self.max_log_bytes = max_log_bytes
+
+        self.prefix = prefix
+
+        # (name, labels) -> Counter or Histogram, and name -> (type, help)
+        self.series = {}
+        self.families = {}
+
+        self.lock = threading.Lock()
+
+
+    # Create the metrics from the 'metrics' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        settings = preferences.get('metrics', {})
+        state_path = os.path.join(preferences['savePath'], 'state')
+
+        return cls(
+            settings.get('path', os.path.join(state_path, 'radiometer.prom')),
+            settings.get('logPath', os.path.join(state_path, 'metrics.log')),
+            max_log_bytes = settings.get('maxLogBytes', 262144)
+        )
+
+
+    def get(self, kind, name, help_text, labels, factory):
+
+        key = (name, tuple(sorted(labels.items())))
+
+        series = self.series.get(key)
+
+        if series is None:
+            with self.lock:
+                self.families.setdefault(name, (kind, help_text))
+                series = self.series.setdefault(key, factory())
+
+        return series
+
+
+    def counter(self, name, help_text, **labels):
+
+        return self.get('counter', name, help_text, labels, Counter)
+
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, **labels):
+
+        return self.get('histogram', name, help_text, labels, lambda: Histogram(buckets))
+
+
+    # Wrap a function so every call is timed into a histogram
+    def timed(self, function, histogram):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return wrapper
+
+
+    # The metrics in the Prometheus text exposition format
+    def exposition(self):
+
+        lines = []
+
+        with self.lock:
+            series = sorted(self.series.items())
+            families = dict(self.families)
+
+        current = None
+
+        for (name, labels), value in series:
+            full_name = self.prefix + name
+
+            if name != current:
+                kind, help_text = families[name]
+
+                lines.append("# HELP {} {}".format(full_name, help_text))
+                lines.append("# TYPE {} {}".format(full_name, kind))
+
+                current = name
+
+            if isinstance(value, Counter):
+                lines.append("{}{} {}".format(full_name, format_labels(labels), value.value))
+                continue
+
+            cumulative = 0
+
+            for bound, count in zip(value.buckets, value.counts):
+                cumulative += count
+                lines.append("{}_bucket{} {}".format(full_name, format_labels(labels, ('le', bound)), cumulative))
+
+            lines.append("{}_bucket{} {}".format(full_name, format_labels(labels, ('le', '+Inf')), value.count))
+            lines.append("{}_sum{} {:.6f}".format(full_name, format_labels(labels), value.sum))
+            lines.append("{}_count{} {}".format(full_name, format_labels(labels), value.count))
+
+        return "\n".join(lines) + "\n"
+
+
+    # One line per series for the rolling log, the count and mean of every histogram
+    def summary(self):
+
+        fields = [datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')]
+
+        with self.lock:
+            series = sorted(self.series.items())
+
+        for (name, labels), value in series:
+            label_string = format_labels(labels)
+
+            if isinstance(value, Counter):
+                fields.append("{}{}={}".format(name, label_string, value.value))
+            elif value.count > 0:
+                fields.append("{}{}={}/{:.6f}".format(name, label_string, value.count, value.sum / value.count))
+
+        return " ".join(fields) + "\n"
+
+
+    # Replace the metrics file and append to the rolling log
+    def write(self):
+
+        try:
+            temporary_path = self.metrics_path + '.tmp'
+
+            with open(temporary_path, 'w') as metrics_file:
+                metrics_file.write(self.exposition())
+
+            os.replace(temporary_path, self.metrics_path)
+
+            if os.path.isfile(self.log_path) and os.path.getsize(self.log_path) >= self.max_log_bytes:
+                os.replace(self.log_path, self.log_path + '.1')
+
+            with open(self.log_path, 'a') as log_file:
+                log_file.write(self.summary())
+
+        except OSError as e:
+            print("Unable to write the metrics : {}".format(e))
+
+
+# Wrap the hot paths of a radiometer with timers.  Only called when the metrics are enabled,
+# so a disabled radiometer runs the original methods.
+def instrument(radiometer, metrics):
+
+    radiometer.sample_data = metrics.timed(
+        radiometer.sample_data,
+        metrics.histogram('sample_seconds', "Time to read one sample and queue it for the writer")
+    )
+
+    radiometer.write_sample = metrics.timed(
+        radiometer.write_sample,
+        metrics.histogram('sample_write_seconds', "Time to format and store one sample")
+    )
+
+    radiometer.channel_plan.read_raw = metrics.timed(
+        radiometer.channel_plan.read_raw,
+        metrics.histogram('adc_read_seconds', "Time to read the ADC channels of a sample or group")
+    )
+
+    radiometer.filemanager.save_to_file = metrics.timed(
+        radiometer.filemanager.save_to_file,
+        metrics.histogram('file_write_seconds', "Time to write a row to the day file, including flushes")
+    )
+
+    radiometer.weather_sensors.read_sensors = metrics.timed(
+        radiometer.weather_sensors.read_sensors,
+        metrics.histogram('gauge_poll_seconds', "Time to update the anemometer and rain gauge values")
+    )
+
+    radiometer.startup_procedure = metrics.timed(
+        radiometer.startup_procedure,
+        metrics.histogram('startup_seconds', "Time spent in the startup procedure", STAGE_BUCKETS)
+    )
+
+    # Lateness of every scheduled task relative to its deadline, the jitter of the loop
+    lateness_histograms = {}
+
+    def observe_lateness(task, lateness, skipped):
+        histogram = lateness_histograms.get(task.name)
+
+        if histogram is None:
+            histogram = metrics.histogram('loop_lateness_seconds', "Time between a deadline and the start of its task", task=task.name)
+            lateness_histograms[task.name] = histogram
+
+        histogram.observe(lateness)
+
+        if skipped:
+            metrics.counter('loop_skipped_total', "Deadlines skipped because a task ran late", task=task.name).inc(skipped)
+
+    radiometer.scheduler.observer = observe_lateness
+
+    # Upload throughput of every transfer
+    transfer = radiometer.filemanager.transfer
+
+    def timed_transfer(full_source_path, full_destination_path, offset, end=None):
+        statistics = transfer(full_source_path, full_destination_path, offset, end)
+
+        metrics.counter('upload_bytes_total', "Bytes sent to the server").inc(statistics['bytes'])
+        metrics.histogram('upload_throughput_bytes_per_second', "Throughput of each transfer", THROUGHPUT_BUCKETS).observe(statistics['throughput'])
+
+        return statistics
+
+    radiometer.filemanager.transfer = timed_transfer
+
+
+# Record the duration of every modem stage.  This is done before the modem is powered on, so
+# the power on and GPS stages at boot are included.
+def instrument_modem(sim7600, metrics):
+
+    stage_timer = getattr(sim7600, 'stage_timer', None)
+
+    if stage_timer is not None:
+        record = stage_timer.record
+
+        def record_stage(name, seconds, completed=True):
+            record(name, seconds, completed)
+
+            metrics.histogram('modem_stage_seconds', "Time spent in each modem stage", STAGE_BUCKETS, stage=name).observe(seconds)
+
+            if not completed:
+                metrics.counter('modem_stage_timeouts_total', "Modem stages that timed out", stage=name).inc()
+
+        stage_timer.record = record_stage
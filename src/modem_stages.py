@@ -0,0 +1,143 @@
+###
+#
+#
+#
+# Program Description : Polling helpers for the modem state machine.  Each stage waits for the
+#                           hardware to report that it is ready, polling with a growing interval
+#                           up to a per-stage timeout, and the time spent in every stage is
+#                           recorded.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : modem_stages.py
+#
+###
+
+# Imports
+import time
+
+
+# Poll condition until it returns a true value or timeout seconds have passed.  The interval
+# between polls starts at interval and grows by backoff up to max_interval.  A condition that
+# raises an exception is treated as not ready.  Returns the last value of the condition.
+def wait_until(condition, timeout, interval=0.5, backoff=1.5, max_interval=5.0):
+
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            result = condition()
+        except Exception:
+            result = None
+
+        if result:
+            return result
+
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            return result
+
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+class StageStatistics():
+    # Constructor
+    def __init__(self, name):
+
+        self.name = name
+
+        self.count = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+
+class StageTimer():
+    # Constructor
+    def __init__(self, timeouts=None, interval=0.5, backoff=1.5, max_interval=5.0):
+
+        # Longest time each stage may take, in seconds, by stage name
+        self.timeouts = timeouts if timeouts is not None else {}
+
+        self.interval = interval
+        self.backoff = backoff
+        self.max_interval = max_interval
+
+        self.stages = {}
+
+
+    # Create a timer from the 'sim7600' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences, default_timeouts):
+
+        settings = preferences.get('sim7600', {})
+
+        timeouts = dict(default_timeouts)
+        timeouts.update(settings.get('stageTimeouts', {}))
+
+        return cls(
+            timeouts,
+            interval = settings.get('pollInterval', 0.5),
+            backoff = settings.get('pollBackoff', 1.5),
+            max_interval = settings.get('maxPollInterval', 5.0)
+        )
+
+
+    # Add the duration of a stage to its statistics
+    def record(self, name, seconds, completed=True):
+
+        if name not in self.stages:
+            self.stages[name] = StageStatistics(name)
+
+        statistics = self.stages[name]
+
+        statistics.count += 1
+        statistics.total += seconds
+        statistics.last = seconds
+        statistics.max = max(statistics.max, seconds)
+
+        if not completed:
+            statistics.timeouts += 1
+
+
+    # Wait for a stage to complete and record how long it took.  Returns the value of the
+    # condition, which is false if the stage timed out.
+    def wait_for(self, name, condition):
+
+        timeout = self.timeouts.get(name, 60)
+        start = time.monotonic()
+
+        result = wait_until(condition, timeout, self.interval, self.backoff, self.max_interval)
+
+        seconds = time.monotonic() - start
+        self.record(name, seconds, bool(result))
+
+        if result:
+            print("Stage {} completed in {:.1f} s".format(name, seconds))
+        else:
+            print("Stage {} timed out after {:.1f} s".format(name, seconds))
+
+        return result
+
+
+    # Print the time spent in each stage
+    def report(self):
+
+        print("\n     --- Modem stage timings ---\n")
+
+        for statistics in self.stages.values():
+            print("{:15} runs {:5}   last {:6.1f} s   mean {:6.1f} s   max {:6.1f} s   timeouts {}".format(
+                    statistics.name,
+                    statistics.count,
+                    statistics.last,
+                    statistics.total / statistics.count,
+                    statistics.max,
+                    statistics.timeouts
+                )
+            )
@@ -0,0 +1,172 @@
+###
+#
+#
+#
+# Program Description : Oversampling of groups of ADC channels.  Each group is read at its own
+#                           rate into a preallocated block, and at every output sample the block
+#                           is reduced to one value per channel with a vectorized mean or median.
+#                           Channels that are not in a group are read once per output sample.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : oversampler.py
+#
+###
+
+# Imports
+import math
+import operator
+
+import numpy
+
+# Functions used to reduce the samples of a group to one value per channel
+FILTERS = ('mean', 'median')
+
+
+class SampleGroup():
+    # Constructor
+    def __init__(self, name, board_groups, positions, rate, filter_name, capacity):
+
+        if filter_name not in FILTERS:
+            raise ValueError("Unknown filter '{}' for group {}, expected one of {}".format(filter_name, name, FILTERS))
+
+        self.name = name
+        self.rate = rate
+        self.filter_name = filter_name
+
+        # Plates and pins that are read for this group, and the positions of its channels in
+        # heading order
+        self.board_groups = board_groups
+        self.positions = positions
+        self.pick = operator.itemgetter(*positions)
+
+        # One row per sample since the last output
+        self.block = numpy.empty((capacity, len(positions)))
+        self.count = 0
+
+        # Statistics
+        self.samples = 0
+        self.outputs = 0
+        self.overruns = 0
+
+
+    # Reduce the samples since the last output to one value per channel
+    def decimate(self):
+
+        block = self.block[:self.count]
+
+        if self.filter_name == 'median':
+            result = numpy.median(block, axis=0)
+        else:
+            result = block.mean(axis=0)
+
+        self.outputs += 1
+        self.count = 0
+
+        return result
+
+
+class Oversampler():
+    # Constructor
+    def __init__(self, channel_plan, adc, groups):
+
+        self.channel_plan = channel_plan
+        self.adc = adc
+        self.groups = groups
+
+        # The ADC channels that are not oversampled are read once per output sample
+        grouped = set()
+
+        for group in groups:
+            grouped.update(group.positions)
+
+        direct = [i for i in channel_plan.adc_positions() if i not in grouped]
+
+        self.direct_board_groups = channel_plan.board_groups_for(direct)
+
+        # Row the raw values of a group are read into
+        self.scratch = [0.0] * len(channel_plan)
+
+
+    # Create the groups from the 'oversampling' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences, channel_plan, adc, output_period):
+
+        settings = preferences.get('oversampling', {})
+        adc_positions = set(channel_plan.adc_positions())
+
+        groups = []
+
+        for group_settings in settings.get('groups', []):
+            positions = channel_plan.positions_of(group_settings['channels'])
+
+            for position in positions:
+                if position not in adc_positions:
+                    raise ValueError("{} is not read from the ADC and cannot be oversampled".format(
+                            channel_plan.names[position]
+                        )
+                    )
+
+            rate = group_settings.get('rate', 1)
+
+            # Room for every sample of an output period, with a margin for timing jitter
+            capacity = int(math.ceil(rate * output_period)) + 2
+
+            groups.append(SampleGroup(
+                group_settings['name'],
+                channel_plan.board_groups_for(positions),
+                positions,
+                rate,
+                group_settings.get('filter', 'mean'),
+                capacity
+            ))
+
+        return cls(channel_plan, adc, groups)
+
+
+    # Read one sample of a group, called by the scheduler at the rate of the group
+    def sample(self, group):
+
+        if group.count == len(group.block):
+            group.overruns += 1
+            return
+
+        self.channel_plan.read_raw(self.adc, group.board_groups, self.scratch)
+
+        group.block[group.count] = group.pick(self.scratch)
+        group.count += 1
+        group.samples += 1
+
+
+    # Build an output row, the oversampled channels are decimated and the other channels read
+    def read(self, args):
+
+        values = self.channel_plan.read_raw(self.adc, self.direct_board_groups)
+
+        for group in self.groups:
+            # A group without samples yet, for example right after startup, is read directly
+            if group.count == 0:
+                self.channel_plan.read_raw(self.adc, group.board_groups, values)
+                continue
+
+            for position, value in zip(group.positions, group.decimate().tolist()):
+                values[position] = value
+
+        return self.channel_plan.convert(values, args)
+
+
+    # Print the samples per output and overruns of every group
+    def report(self):
+
+        for group in self.groups:
+            print("Group {:12} : {} Hz, {} filter, {:.1f} samples per output, {} overruns".format(
+                    group.name,
+                    group.rate,
+                    group.filter_name,
+                    group.samples / group.outputs if group.outputs > 0 else 0.0,
+                    group.overruns
+                )
+            )
@@ -0,0 +1,243 @@
+###
+#
+#
+#
+# Program Description : Pulse counting engine for the anemometer and rain gauge.  The inputs are
+#                           sampled on a fixed-rate schedule in a separate thread, so ticks are
+#                           counted even while the main program loop is busy.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : pulse_counter.py
+#
+###
+
+# System imports
+from collections import deque
+
+import threading, time
+
+
+class PulseChannel:
+    # Constructor
+    def __init__(self, name, board, pin, threshold, debounce, window):
+
+        self.name = name
+        self.board = board
+        self.pin = pin
+
+        # Voltage above which the input is considered high
+        self.threshold = threshold
+
+        # Minimum time between two counted edges, faster edges are treated as contact bounce
+        self.debounce = debounce
+
+        # Length of the window over which counts and rates are calculated
+        self.window = window
+
+        self.level = False
+        self.last_edge = None
+
+        # Times of the counted edges inside the current window
+        self.edges = deque()
+
+        self.total_edges = 0
+        self.bounces = 0
+        self.missed_edges = 0.0
+
+
+    # Process a new sample and count a rising edge
+    def update(self, value, now):
+
+        high = value > self.threshold
+
+        if high and not self.level:
+            if self.last_edge is None or now - self.last_edge >= self.debounce:
+                self.edges.append(now)
+                self.last_edge = now
+                self.total_edges += 1
+            else:
+                self.bounces += 1
+
+        self.level = high
+
+
+    # Remove the edges that have fallen out of the window
+    def expire(self, now):
+
+        while self.edges and now - self.edges[0] > self.window:
+            self.edges.popleft()
+
+
+    # Estimate how many edges went unseen while the sampler was late
+    def estimate_missed(self, overrun, now):
+
+        self.expire(now)
+
+        self.missed_edges += len(self.edges) / self.window * overrun
+
+
+class PulseCounter:
+    # Constructor
+    def __init__(self, read_adc, sample_rate=100, threshold=4.0, debounce=0.025, window=1.0):
+
+        # Function used to read a single ADC pin, read_adc(board, pin)
+        self.read_adc = read_adc
+
+        self.period = 1.0 / sample_rate
+        self.threshold = threshold
+        self.debounce = debounce
+        self.window = window
+
+        self.channels = {}
+
+        # Protects the edge windows, which are written by the sampler and read by the main loop
+        self.channel_lock = threading.Lock()
+
+        self.active = False
+        self.sampler_thread = None
+
+        # Statistics of the sampling schedule
+        self.samples = 0
+        self.late_samples = 0
+        self.skipped_samples = 0
+
+
+    # Create a pulse counter from the 'pulseCounter' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences, read_adc):
+
+        settings = preferences.get('pulseCounter', {})
+
+        sample_rate = settings.get('sampleRate', 100)
+        debounce = settings.get('debounce', 0.025)
+
+        # A rising edge needs a low sample before it, so two edges are at least two sample
+        # periods apart and a shorter debounce can never suppress a bounce
+        minimum_debounce = 2.5 / sample_rate
+
+        if debounce < minimum_debounce:
+            print("Pulse counter debounce of {} s is too short for {} samples per second, using {} s".format(
+                    debounce,
+                    sample_rate,
+                    minimum_debounce
+                )
+            )
+
+            debounce = minimum_debounce
+
+        return cls(
+            read_adc,
+            sample_rate = sample_rate,
+            threshold = settings.get('threshold', 4.0),
+            debounce = debounce,
+            window = settings.get('window', 1.0)
+        )
+
+
+    # Add an input to be counted, the channel id has the format chBP (board, pin)
+    def add_channel(self, name, channel_id):
+
+        self.channels[name] = PulseChannel(
+            name,
+            int(channel_id[2]),
+            int(channel_id[3]),
+            self.threshold,
+            self.debounce,
+            self.window
+        )
+
+
+    # Start sampling in the background
+    def start(self):
+
+        if self.active:
+            return
+
+        self.active = True
+
+        self.sampler_thread = threading.Thread(target=self.run, name='PulseCounter', daemon=True)
+        self.sampler_thread.start()
+
+
+    # Stop sampling and wait for the sampler to finish
+    def stop(self):
+
+        self.active = False
+
+        if self.sampler_thread is not None:
+            self.sampler_thread.join()
+            self.sampler_thread = None
+
+
+    # Sample every channel once
+    def sample(self, now):
+
+        for channel in self.channels.values():
+            value = self.read_adc(channel.board, channel.pin)
+
+            with self.channel_lock:
+                channel.update(value, now)
+
+        self.samples += 1
+
+
+    # Fixed-rate sampling loop, the deadlines are kept on a monotonic clock
+    def run(self):
+
+        next_deadline = time.monotonic()
+        previous_sample = None
+
+        while self.active:
+            now = time.monotonic()
+
+            if now < next_deadline:
+                time.sleep(next_deadline - now)
+                now = time.monotonic()
+
+            self.sample(now)
+
+            # A gap longer than one and a half periods means edges could have been lost
+            if previous_sample is not None and now - previous_sample > self.period * 1.5:
+                self.late_samples += 1
+
+                with self.channel_lock:
+                    for channel in self.channels.values():
+                        channel.estimate_missed(now - previous_sample - self.period, now)
+
+            previous_sample = now
+            next_deadline += self.period
+
+            # If the sampler fell more than a period behind, skip the deadlines that have passed
+            if next_deadline < now:
+                skipped = int((now - next_deadline) / self.period) + 1
+                self.skipped_samples += skipped
+                next_deadline += skipped * self.period
+
+
+    # Number of edges counted on a channel within the last window
+    def count(self, name):
+
+        now = time.monotonic()
+
+        with self.channel_lock:
+            channel = self.channels[name]
+            channel.expire(now)
+
+            return len(channel.edges)
+
+
+    # Edges per second on a channel within the last window
+    def rate(self, name):
+
+        return self.count(name) / self.window
+
+
+    # Estimated number of edges that were missed on a channel
+    def missed_edges(self, name):
+
+        with self.channel_lock:
+            return int(round(self.channels[name].missed_edges))
@@ -8,7 +8,7 @@
 # Authors             : Benjamin Kleynhans
 #
 # Last Modified By    : Benjamin Kleynhans
-# Last Modified Date  : September 9, 2020
+# Last Modified Date  : October 18, 2026
 # Filename            : radiometer.py
 #
 ###
@@ -17,18 +17,29 @@
 from datetime import datetime, timezone
 
 import os, sys
-import json
 import time
-import pdb
-import subprocess
-import zipfile
-
-import piplates.DAQC2plate as DAQC2
+import functools
+import threading
 
 # Project imports
-from src.sim7600 import Sim7600
+from src.adc_backend import create_backend
 from src.filemanager import Filemanager
 from src.weather_sensors import WeatherSensors
+from src.channel_plan import ChannelPlan
+from src.scheduler import Scheduler
+from src import binary_format
+from src import compression
+from src.compression import UploadPackager
+from src.aggregator import Aggregator
+from src import metrics
+from src.workers import SampleWriter, NetworkWorker
+from src import upload_queue
+from src.upload_queue import UploadQueue
+from src import file_catalog
+from src.file_catalog import FileCatalog
+from src.upload_manifest import sha256_file
+from src import retention
+from src.retention import RetentionEngine
 
 DEGREE_SIGN = u'\N{DEGREE SIGN}'
 
@@ -40,145 +51,253 @@ class Radiometer:
         self.filemanager = filemanager
         self.args = args
 
+        # Time the launcher started, the startup time is printed when the first sample is stored
+        self.launch_time = self.args.get('launchTime')
+        
         # Is this the first time the script is running after power cycle
         self.initial_startup = True
 
         # There will be a cron.log file which needs to be deleted IF the cron ran successfully
         self.delete_cron_log = True
 
-        # Should data be uploaded
-        self.upload_data = False 
-
         # Should we get a GPS postion
         self.get_gps_position = True 
+        
+        # Should a binary copy of the data be stored alongside the CSV file
+        self.store_binary = self.args['preferences'].get('binaryFormat', {}).get('enabled', False)
 
         # How many samples should be taken before the sample upload is done
         self.sample_size = 120
+        
+        # Send the data added to the day file since the last upload during the day, instead of
+        # sending the whole file after midnight
+        self.incremental_upload = self.args['preferences'].get('incrementalUpload', {})
+        
+        # Hot-path metrics.  The methods are only wrapped with timers when the metrics are
+        # enabled, so they cost nothing when they are not.
+        self.metrics = None
+        
+        if self.args['preferences'].get('metrics', {}).get('enabled', False):
+            self.metrics = metrics.Metrics.from_preferences(self.args['preferences'])
+            metrics.instrument_modem(self.sim7600, self.metrics)
+        
+        # The stored GPS fix is used right away, the heading of the first day file only waits
+        # for the GPS when there is none
+        if self.get_gps_position:
+            self.args['coordinates'] = self.sim7600.stored_position()
+        
+        # The modem is power cycled and the GPS position read on the network worker, while the
+        # filesystem is checked and the first samples are taken
+        self.modem_ready = threading.Event()
+        
+        self.network_worker = NetworkWorker()
+        self.network_worker.start()
+        self.network_worker.submit('powerCycle', self.power_cycle_modem)
+
+        # Create the ADC backend, either the DAQC2plates or the simulator
+        self.adc = create_backend(self.args['preferences'])
+
+        # Compresses the data files before they are uploaded
+        self.packager = UploadPackager.from_preferences(self.args['preferences'])
+        
+        # Compile the heading configuration once so it is not parsed on every sample
+        self.channel_plan = ChannelPlan(self.args['preferences'])
 
         # Check if required local directories exist, and if they don't creat them
         self.filemanager.check_directory_requirements()
+        
+        # Repair the day file if the power was lost while it was being written
+        self.filemanager.recover_day_files()
+        
+        # Files waiting to be uploaded are kept in a persistent queue and retried with a backoff
+        self.upload_queue = UploadQueue.from_preferences(self.args['preferences'])
+        
+        # The data files are tracked by date in a persistent catalog, the directories are only
+        # scanned to build a new catalog
+        self.file_catalog = FileCatalog.from_preferences(self.args['preferences'])
+        
+        if self.file_catalog.is_empty():
+            self.build_catalog()
+        
+        # Uploaded files are rolled into monthly archives and the oldest uploads are removed to
+        # stay within the storage budget, on a thread at idle priority
+        self.retention = None
+        
+        if self.args['preferences'].get('retention', {}).get('enabled', False):
+            self.retention = RetentionEngine.from_preferences(self.args['preferences'], self.file_catalog, self.filemanager)
+            self.retention.start()
+            self.retention.request()
 
-        # Save the current time
-        self.current_time = time.time()
-        self.previous_time = self.current_time
+        # Time between samples in seconds
+        self.sample_period = self.args['preferences'].get('scheduler', {}).get('samplePeriod', 1.0)
         
-        # Save today's date to check for 24-hour intervals
-        self.today = datetime.now(timezone.utc).strftime('%Y%m%d')
+        # Groups of channels can be read faster than the output rate and averaged or filtered
+        self.oversampler = None
         
-        # Turn SIM7600 module on
-        self.sim7600.power_on()
+        if self.args['preferences'].get('oversampling', {}).get('enabled', False):
+            # NumPy is only needed when the inputs are oversampled
+            from src.oversampler import Oversampler
+            
+            self.oversampler = Oversampler.from_preferences(self.args['preferences'], self.channel_plan, self.adc, self.sample_period)
         
-        # Get GPS Coordinates
-        if self.get_gps_position:
-            self.args['coordinates'] = self.sim7600.get_position()
+        # The most recent samples are kept in memory and served to local clients
+        self.sample_buffer = None
+        
+        if self.args['preferences'].get('sampleBuffer', {}).get('enabled', False):
+            # The HTTP server modules are only imported when the buffer is enabled
+            from src.sample_buffer import SampleBuffer, SampleServer
+            
+            self.sample_buffer = SampleBuffer.from_preferences(self.args['preferences'], self.channel_plan.names, self.sample_period)
+            
+            self.sample_server = SampleServer.from_preferences(self.args['preferences'], self.sample_buffer)
+            self.sample_server.start()
+        
+        # Per-minute and per-hour statistics are written to a summary file next to the day file
+        self.aggregator = None
+        
+        if self.args['preferences'].get('aggregation', {}).get('enabled', False):
+            self.aggregator = Aggregator.from_preferences(self.args['preferences'], self.channel_plan, self.sample_period)
+        
+        # Date of the day file, set by the startup procedure to check for 24-hour intervals
+        self.today = None
         
         # Add variables for wind and rain meter
         self.args['anemometer'] = 0
         self.args['rainGauge'] = 0
         
         # Create an instance of the WeatherSensors object
-        # This is a threaded object that measures wind speed and rain
-        self.weather_sensors = WeatherSensors(self.args)
+        # This is a threaded object that measures wind speed and rain, it is started
+        # before the startup procedure so no ticks are lost while the modem connects
+        self.weather_sensors = WeatherSensors(self.args, self.adc, start=True)
         
         # Turn off Pi-Plates status LED on each plate
         for i in range(0, 2):
-            DAQC2.setLED(i,'off')
+            self.adc.set_led(i,'off')
             
         # Counter to send initial upload for connectivity test
         self.test_counter = 0
         
-        # Run program loop
-        while True:
-            self.program_loop()
+        # All periodic work is driven from a single deadline scheduler.  Tasks that are due at
+        # the same time run in priority order, so the gauge values are updated before the
+        # sample is taken.
+        self.scheduler = Scheduler.from_preferences(self.args['preferences'])
         
-    
-    # The program loop runs continuously until Ctrl+C is pressed in the terminal
-    def program_loop(self):
+        if self.metrics is not None:
+            metrics.instrument(self, self.metrics)
+            
+            self.scheduler.add_task('metrics', self.args['preferences']['metrics'].get('period', 60), self.metrics.write, priority=9)
+        
+        # The samples are stored by the sample writer thread and the modem and upload work runs
+        # on the network worker, so the acquisition loop never waits for the disk or the network
+        self.sample_writer = SampleWriter.from_preferences(self.args['preferences'], self.write_sample)
+        self.sample_writer.start()
+        
+        self.scheduler.add_task('gauges', self.weather_sensors.pulse_counter.window, self.weather_sensors.read_sensors, priority=1, align=True)
+        self.scheduler.add_task('acquisition', self.sample_period, self.program_loop, priority=2, align=True)
+        
+        if self.oversampler is not None:
+            for group in self.oversampler.groups:
+                self.scheduler.add_task(group.name, 1.0 / group.rate, functools.partial(self.oversampler.sample, group), priority=3, align=True)
+        
+        # The upload queue is checked periodically, the modem is only started when a file is due
+        self.scheduler.add_task(
+            'uploadQueue',
+            self.args['preferences'].get('uploadQueue', {}).get('checkInterval', 900),
+            self.queue_uploads,
+            priority=4
+        )
         
-        # Check if this is the initial boot of the device, and set some values
-        if self.initial_startup:
-            self.startup_procedure()
+        # The retention pass also checks the free space on the storage device
+        if self.retention is not None:
+            self.scheduler.add_task(
+                'retention',
+                self.args['preferences']['retention'].get('checkInterval', 3600),
+                self.retention.request,
+                priority=5
+            )
         
-        # Check if the date has changed, and if it has, upload the file and create a new one
-        if datetime.now(timezone.utc).strftime('%Y%m%d') != self.today:
-            self.new_day_procedure()
-            
-        # The wind and rain sensors work on running averages of ticks per second,
-        # as such they need to be read continuously
-        self.weather_sensors.read_anemometer()
-        self.weather_sensors.read_rain_gauge()
+        if self.incremental_upload.get('enabled', False):
+            self.scheduler.add_task(
+                'incrementalUpload',
+                self.incremental_upload.get('period', 3600),
+                self.queue_increment,
+                priority=3,
+                align=True
+            )
         
-        self.current_time = time.time()
+    
+    # Run the scheduler, it sleeps between deadlines until Ctrl+C is pressed in the terminal
+    def run(self):
         
-        elapsed_time = self.current_time - self.previous_time
+        self.report_startup("Ready to sample")
+        
+        try:
+            self.scheduler.run()
+        finally:
+            # Write the samples that are still queued before the files are closed.  A network job
+            # can wait minutes for the modem, the uploads resume after the next start.
+            self.sample_writer.stop()
             
-        # Check if 1 second has passed, then take another set of samples
-        if elapsed_time >= 1 and not self.upload_data:
-            self.sample_data()
-            self.test_counter += 1
-        elif elapsed_time >= 1 and self.upload_data:
-            self.previous_time = self.current_time
-        
-        # After collecting 10 samples, upload a test file to the server
-        if self.test_counter == self.sample_size:
-            self.upload_sample_test()
+            if self.retention is not None:
+                self.retention.stop(timeout=5)
+    
+    
+    # The program loop runs once every sample period.  It only reads the inputs, the sample is
+    # stored by the sample writer and the day change is detected from its timestamp.
+    def program_loop(self):
+        
+        self.sample_data()
 
 
-    # The startup procedure runs on system boot, and every time the date changes
-    def startup_procedure(self):
+    # The startup procedure runs on system boot, and every time the date changes.  It runs on the
+    # sample writer thread and only does the local work, the modem is connected by the network
+    # worker while the samples are taken.
+    def startup_procedure(self, timestamp):
         
         print("\n     --- Running startup configuration ---\n")
         
-        # Turn the sim7600 module on if it is offline
-        if self.sim7600.power_status == "offline":
-            self.sim7600.power_on()
-            
-        # Connect to the internet
-        self.sim7600.connect()
-
-        # Only try to upload data if the device successfully connected to the internet
-        if self.sim7600.connected:
-            # If we need to upload a data file, upload it
-            if self.upload_data:
-                self.upload_to_server()
-                self.upload_data = False
-                
-            # Update the current day from the internet
-            self.set_clock()
-        
-        # If the device does not connect to internet, we need to disable the upload
-        # sequence or the device will go into a loop by continually trying to connect
-        else:
-            self.upload_data = False
+        # Save the date of the samples to detect the next day change
+        self.today = timestamp.strftime('%Y%m%d')
         
         # Set the filename for the new data file
         self.build_filename()
 
-        # Test if a sample file for the specific date already exists
-        data_files = self.filemanager.get_local_files(self.args['preferences']['savePath'])
-        create_headings = True
+        # Without a stored fix the coordinates come from the GPS during the modem power cycle,
+        # the samples wait in the queue until then
+        if self.get_gps_position and self.args.get('coordinates') is None:
+            self.modem_ready.wait()
+        
+        # The headings are only written to a new day file, or to one that was emptied because its
+        # only row was torn
+        full_file_path = os.path.join(self.args['preferences']['savePath'], self.args['filename'])
+        create_headings = not os.path.isfile(full_file_path) or os.path.getsize(full_file_path) == 0
         
-        for data_file in data_files:
-            if data_file == self.args['filename']:
-                create_headings = False
+        # Keep the day file open for the buffered writer, the headings are written through it so
+        # they are recorded in the journal with the rows
+        self.filemanager.open_data_writer(self.args['preferences']['savePath'], self.args['filename'])
         
         # If there is no file for the specified date, create a new file and add headings
         if create_headings:
             # Write the headings to the new data file
             self.build_heading()
         
-        self.initial_startup = False
+        if self.store_binary:
+            self.open_binary_file()
         
-        if self.sim7600.connected:
-            # Disconnect from internet
-            self.sim7600.disconnect()
+        if self.aggregator is not None:
+            self.aggregator.open(self.args['preferences']['savePath'], self.args['filename'])
         
-        # Power off Sim7600
-        self.sim7600.power_off()
+        for full_path in self.day_files():
+            self.file_catalog.record(full_path, file_catalog.ACTIVE)
+        
+        self.initial_startup = False
         
         # Move stale files to toUpload directory
         self.check_stale_files()
         
+        # Connect, upload the files in the 'toUpload' directory and set the clock
+        self.network_worker.submit('modem', self.modem_procedure)
+        
         # Delete cron log after successful startup if present
         try:
             if self.delete_cron_log:
@@ -186,42 +305,175 @@ class Radiometer:
                 self.filemanager.delete_file("/home/pi/cron.log")
         except:
             print("No log file to delete")
+    
+    
+    # Power cycle the modem so it starts from a known state and read the GPS position.  Runs on
+    # the network worker at boot.
+    def power_cycle_modem(self):
+        
+        try:
+            self.sim7600.hard_power_off()
+            self.sim7600.power_on()
+            
+            if self.get_gps_position:
+                position = self.sim7600.get_position()
+                
+                if position is not None:
+                    self.args['coordinates'] = position
+        finally:
+            # Use the configured coordinates if the position could not be read
+            if self.get_gps_position and self.args.get('coordinates') is None:
+                self.args['coordinates'] = self.args['preferences']['coordinates']
+            
+            self.modem_ready.set()
+    
+    
+    # Print the time since the program was launched
+    def report_startup(self, stage):
+        
+        if self.launch_time is not None:
+            print("{} {:.2f} s after launch".format(stage, time.monotonic() - self.launch_time))
+    
+    
+    # Connect to the internet, upload the waiting files if needed and update the clock.  Runs on
+    # the network worker, the samples are taken and stored while it waits for the modem.
+    def modem_procedure(self):
+        
+        # Turn the sim7600 module on if it is offline
+        if self.sim7600.power_status == "offline":
+            self.sim7600.power_on()
+        
+        # Connect to the internet
+        self.sim7600.connect()
+        
+        # Only try to upload data if the device successfully connected to the internet
+        if self.sim7600.connected:
+            # Upload the files in the upload queue that are due
+            if self.upload_queue.due() > 0:
+                self.upload_to_server()
+            
+            # Update the current day from the internet
+            self.set_clock()
+            
+            # Disconnect from internet
+            self.sim7600.disconnect()
+        
+        # If the device does not connect to internet, the due uploads are retried after their
+        # backoff instead of on every scheduler period
+        else:
+            self.upload_queue.defer_due("No internet connection")
+        
+        # Power off Sim7600
+        self.sim7600.power_off()
 
     
     # Upload the sample file to allow testing of data upload from remote location
     # while still on site.
     def upload_sample_test(self):
         
-        self.upload_data = True
-        self.initial_startup = True
-        
         print("Copying {} to {}".format(
                 os.path.join(self.args['preferences']['savePath'],self.args['filename']),
                 os.path.join(self.args['preferences']['toUploadPath'], "sample_test.csv")
             )
         )
         
+        # Make sure the buffered rows are in the file before it is copied
+        self.filemanager.flush_data_writer()
+        
         # Create a copy of the current day file in the 'toUpload' directory
         self.filemanager.copy_file(
                 os.path.join(self.args['preferences']['savePath'], self.args['filename']),
                 os.path.join(self.args['preferences']['toUploadPath'], "sample_test.csv")
             )
+        
+        # The copy is sent by the network worker while the samples are still taken
+        self.upload_queue.enqueue(os.path.join(self.args['preferences']['toUploadPath'], "sample_test.csv"))
+        self.network_worker.submit('modem', self.modem_procedure)
     
     
     # Check if there are any files in the storage root directory that have become "stale"
-    # (they are from previous days) and move them to the "toUpload" directory
+    # (they are from previous days) and move them to the "toUpload" directory.  The active files
+    # come from the catalog and are compared by their full date.
     def check_stale_files(self):
         
-        stale_files = self.filemanager.get_local_files('/mnt/storage')
-        
-        for s_file in stale_files:
-            if s_file[6:8] != "{}".format(datetime.now(timezone.utc).strftime('%d')):
-                print("Moving {} to 'toUpload' directory".format(os.path.join(self.args['preferences']['savePath'], s_file)))
+        for entry in self.file_catalog.files(file_catalog.ACTIVE):
+            if entry.day != self.today:
+                print("Moving {} to 'toUpload' directory".format(entry.path))
 
-                self.filemanager.move_file(
-                    os.path.join(self.args['preferences']['savePath'], s_file), 
-                    self.args['preferences']['toUploadPath']
-                )
+                self.move_to_upload(entry.path)
+    
+    
+    # Paths of the files of the current day in the save path
+    def day_files(self):
+        
+        filenames = [self.args['filename']]
+        
+        if self.store_binary:
+            filenames.append(self.args['binaryFilename'])
+        
+        if self.aggregator is not None:
+            filenames.append(Aggregator.summary_filename(self.args['filename']))
+        
+        return [os.path.join(self.args['preferences']['savePath'], filename) for filename in filenames]
+    
+    
+    # Move a file to the 'toUpload' directory, record it in the catalog and add it to the upload
+    # queue.  A file that was moved before the power failed, but not recorded, is only recorded.
+    def move_to_upload(self, full_source_path):
+        
+        full_destination_path = os.path.join(self.args['preferences']['toUploadPath'], os.path.basename(full_source_path))
+        
+        if os.path.isfile(full_source_path):
+            if not self.filemanager.move_file(full_source_path, self.args['preferences']['toUploadPath']):
+                return
+        
+        elif not os.path.isfile(full_destination_path):
+            print("{} no longer exists".format(full_source_path))
+            self.file_catalog.forget(os.path.basename(full_source_path))
+            return
+        
+        self.file_catalog.record(full_destination_path, file_catalog.TO_UPLOAD)
+        self.upload_queue.enqueue(full_destination_path)
+    
+    
+    # Build the catalog from the save path, the 'toUpload' and 'uploaded' directories and the
+    # monthly archives, this is the only time they are scanned.  The files waiting to be uploaded
+    # are queued, for example files that were left there by an older version of the program.
+    # Older versions also moved files to the 'uploaded' directory when the upload failed, so only
+    # the files confirmed in the upload manifest are catalogued as uploaded.
+    def build_catalog(self):
+        
+        print("Building the file catalog")
+        
+        upload_manifest = self.filemanager.get_upload_manifest()
+        
+        directories = (
+            (self.args['preferences']['savePath'], file_catalog.ACTIVE),
+            (self.args['preferences']['toUploadPath'], file_catalog.TO_UPLOAD),
+            (self.args['preferences']['uploadedPath'], file_catalog.UPLOADED)
+        )
+        
+        for path, state in directories:
+            for filename in self.filemanager.get_local_files(path):
+                if state == file_catalog.UPLOADED and not upload_manifest.has_confirmed(filename):
+                    self.file_catalog.record(os.path.join(path, filename), file_catalog.UNCONFIRMED)
+                    continue
+                
+                self.file_catalog.record(os.path.join(path, filename), state)
+                
+                if state == file_catalog.TO_UPLOAD:
+                    self.upload_queue.enqueue(os.path.join(path, filename))
+        
+        retention.catalog_archives(self.file_catalog, retention.archive_directory(self.args['preferences']))
+        
+        self.file_catalog.report()
+    
+    
+    # Queue a modem job when uploads are due, called by the scheduler
+    def queue_uploads(self):
+        
+        if self.upload_queue.due() > 0:
+            self.network_worker.submit('modem', self.modem_procedure)
 
 
     # The new day procedure runs every time the date changes
@@ -229,72 +481,70 @@ class Radiometer:
         
         print("\n     --- Day has changed, updating configuration and creating new file ---\n")
         
-        # Update the current Day
-        self.today = datetime.now(timezone.utc).strftime('%Y%m%d')
+        self.weather_sensors.report()
+        self.scheduler.report()
+        self.channel_plan.report()
+        
+        if self.oversampler is not None:
+            self.oversampler.report()
         
-        # Move yesterdays file to toUpload directory
-        full_source_path = os.path.join(self.args['preferences']['savePath'], self.args['filename'])
-        self.filemanager.move_file(full_source_path, self.args['preferences']['toUploadPath'])
+        self.sample_writer.report()
+        self.network_worker.report()
+        self.upload_queue.report()
+        self.file_catalog.report()
         
-        # Give the system time to move the file
-        time.sleep(1)
+        if self.retention is not None:
+            self.retention.report()
         
-        # Upload data files to online storage
-        self.upload_data = True
+        # Write the remaining rows and close yesterdays file before it is moved
+        self.filemanager.close_data_writer()
         
-        # Set initial startup to ture, which will force a re-sync of the clock and create a new
-        # file for the new day
+        if self.aggregator is not None:
+            self.aggregator.close()
+        
+        # Move yesterdays files to toUpload directory and queue them for upload
+        for full_path in self.day_files():
+            self.move_to_upload(full_path)
+        
+        # Set initial startup to ture, which will create a new file for the new day and queue the
+        # upload and a re-sync of the clock
         self.initial_startup = True
     
     
+    # Read one sample and queue it for the sample writer, called by the scheduler
     def sample_data(self):
         
-        heading_indices = self.args['preferences']['headingString'].split(",")
-        data_string = ""
-                
-        for idx in heading_indices:
-            if idx[:2] == "ch":
-                
-                # Read the normal input pins
-                if self.args['preferences']['headerIndices'][idx] == "Anemometer(km/h)": # 1 tick per second = 2.4km/h
-                    data_string += "{:.1f},".format(
-                        self.args['anemometer']
-                    )
-                elif self.args['preferences']['headerIndices'][idx] == "RainGauge(mm)": # 1 tick = 0.2794mm rain
-                    data_string += "{:.4f},".format(
-                        self.args['rainGauge']
-                    )
-                # Relative humidity is calculated using the formula:
-                # RH = 0.0375 * Vout - 37.7
-                # Vout needs to be in mV and RH in %
-                elif self.args['preferences']['headerIndices'][idx] == "RelativeHumidity(%)": 
-                    Vout = DAQC2.getADC(
-                            int(idx[2]),
-                            int(idx[3])
-                        ) * 1000 # We have to convert voltage to mV as it is read in V
-                        
-                    RH = 0.0375 * Vout - 37.7
-                    
-                    data_string += "{:.4f},".format(RH)
-                    
-                elif self.args['preferences']['headerIndices'][idx] == "RainGauge(mm)": # 1 tick = 0.2794mm rain
-                    data_string += "{:.4f},".format(
-                        self.args['rainGauge']
-                    )
-                else:
-                    data_string += "{:.5f},".format(
-                        DAQC2.getADC(
-                            int(idx[2]),
-                            int(idx[3])
-                        )
-                    )
+        # Take a single timestamp so every column of the row refers to the same second
+        timestamp = datetime.now(timezone.utc)
+        
+        if self.oversampler is not None:
+            values = self.oversampler.read(self.args)
+        else:
+            values = self.channel_plan.read(self.adc, self.args)
+        
+        self.sample_writer.put(timestamp, values)
+    
+    
+    # Store a sample, runs on the sample writer thread
+    def write_sample(self, timestamp, values):
+        
+        # Samples are stored in the file of the day they were taken, so a sample that waited in
+        # the queue over midnight still goes to yesterdays file
+        if not self.initial_startup and timestamp.strftime('%Y%m%d') != self.today:
+            self.new_day_procedure()
+        
+        if self.initial_startup:
+            self.startup_procedure(timestamp)
+        
+        data_string = self.channel_plan.format_row(values, timestamp)
+        
+        self.filemanager.save_binary_record(timestamp, values)
         
-        data_string += "{},".format(datetime.now(timezone.utc).strftime('%Y'))
-        data_string += "{},".format(datetime.now(timezone.utc).strftime('%m'))
-        data_string += "{},".format(datetime.now(timezone.utc).strftime('%d'))
-        data_string += "{},".format(datetime.now(timezone.utc).strftime('%H'))
-        data_string += "{},".format(datetime.now(timezone.utc).strftime('%M'))
-        data_string += "{}\n".format(datetime.now(timezone.utc).strftime('%S'))
+        if self.sample_buffer is not None:
+            self.sample_buffer.append(timestamp.timestamp(), values)
+        
+        if self.aggregator is not None:
+            self.aggregator.add(timestamp, values)
         
         print(data_string, end = '')
         
@@ -303,71 +553,241 @@ class Radiometer:
                             self.args['filename'], 
                             data_string
                         )
-
-        self.previous_time = self.current_time
+        
+        if self.launch_time is not None:
+            self.report_startup("First sample stored")
+            self.launch_time = None
+        
+        self.test_counter += 1
+        
+        # After collecting the test samples, upload a test file to the server
+        if self.test_counter == self.sample_size:
+            self.upload_sample_test()
 
 
     def upload_to_server(self):
         
-        self.filemanager.connect_sftp()
+        # A single SFTP session is used for every file in this upload window
+        if not self.filemanager.connect_sftp():
+            print("\n   !!! Unable to connect to any of the servers !!!")
+            self.upload_queue.defer_due("Unable to connect to any of the servers")
+            return
         
-        files_to_upload = self.filemanager.get_local_files(self.args['preferences']['toUploadPath'])
-
-        self.filemanager.build_remote_structure(self.args['preferences']['siteName'], self.args['filename'])
+        try:
+            self.upload_files()
+        finally:
+            self.filemanager.disconnect_sftp()
+            
+    
+    # Queue an intraday upload, called by the scheduler.  The rows are flushed on the sample writer
+    # thread and the bytes written up to then are sent by the network worker.
+    def queue_increment(self):
         
-        for csv_source_file in files_to_upload:
-                                
-            full_source_path = os.path.join(
-                                    self.args['preferences']['toUploadPath'],
-                                    csv_source_file
-                                )
-
-            if csv_source_file == "sample_test.csv":
-                full_destination_path = os.path.join(
-                                            self.args['preferences']['protocol']['ssh']['remoteDestinationPath'],
-                                            self.args['preferences']['siteName'],
-                                            "sample_test.csv"#"sample_test.zip"
-                                        )
-                
-                print("\n     --- Uploading SAMPLE_TEST.ZIP to server ---\n")
-
-            else:
-                full_destination_path = os.path.join(
-                                            self.args['preferences']['protocol']['ssh']['remoteDestinationPath'],
-                                            self.args['preferences']['siteName'],
-                                            csv_source_file[:4],
-                                            csv_source_file[4:6],
-                                            full_source_path[full_source_path.rfind('/') + 1:]
-                                        )
-
-                print("\n     --- Uploading {} to server ---\n".format(full_source_path[full_source_path.rfind('/') + 1:].upper()))
+        self.sample_writer.call(self.flush_increment)
+    
+    
+    def flush_increment(self):
+        
+        # The day file is created by the startup procedure
+        if self.initial_startup:
+            return
+        
+        # Make sure the buffered rows are in the file before it is sent
+        self.filemanager.flush_data_writer()
+        
+        end = os.path.getsize(os.path.join(self.args['preferences']['savePath'], self.args['filename']))
+        
+        self.network_worker.submit('increment', functools.partial(self.upload_increment, self.args['filename'], end))
+    
+    
+    # Append the rows written since the last intraday upload to the copy of the day file on the
+    # server, up to the end of the rows that were flushed.  The copy is replaced by the compressed
+    # file once the day has been uploaded.  Runs on the network worker.
+    def upload_increment(self, filename, end):
+        
+        # The day may have changed since the job was queued, the file is then sent by the
+        # upload of the complete day
+        if not self.increment_source_exists(filename):
+            return
+        
+        print("\n     --- Uploading new rows of {} to server ---\n".format(filename.upper()))
+        
+        if self.sim7600.power_status == "offline":
+            self.sim7600.power_on()
+        
+        self.sim7600.connect()
+        
+        if self.sim7600.connected:
+            # The day can also change while the modem connects
+            if self.increment_source_exists(filename):
+                if self.filemanager.connect_sftp():
+                    try:
+                        self.filemanager.build_remote_structure(self.args['preferences']['siteName'], filename)
+                        
+                        full_destination_path = os.path.join(
+                                                    self.args['preferences']['protocol']['ssh']['remoteDestinationPath'],
+                                                    self.args['preferences']['siteName'],
+                                                    filename[:4],
+                                                    filename[4:6],
+                                                    filename
+                                                )
+                        
+                        self.filemanager.upload_increment(
+                            os.path.join(self.args['preferences']['savePath'], filename),
+                            full_destination_path,
+                            filename,
+                            end
+                        )
+                    except:
+                        e = sys.exc_info()[0]
+                        
+                        print("\n   !!! An Exception Occurred During Intraday Upload !!!")
+                        print("{}".format(e))
+                    finally:
+                        self.filemanager.disconnect_sftp()
+                else:
+                    print("\n   !!! Unable to connect to any of the servers !!!")
+            
+            self.sim7600.disconnect()
+        
+        self.sim7600.power_off()
+        
+    
+    # Is the day file of an intraday upload still in the save path
+    def increment_source_exists(self, filename):
+        
+        if os.path.isfile(os.path.join(self.args['preferences']['savePath'], filename)):
+            return True
+        
+        print("{} is no longer in the save path, skipping the intraday upload".format(filename))
+        
+        return False
+    
+    
+    # Upload the due jobs of the upload queue in order of priority.  A file that fails is retried
+    # after its backoff, and an exception ends the upload window because the link is most likely down.
+    def upload_files(self):
+        
+        while True:
+            job = self.upload_queue.next_job()
+            
+            if job is None:
+                break
+            
+            if not os.path.isfile(job.path):
+                print("{} is no longer in the 'toUpload' directory".format(job.source_name))
+                self.upload_queue.complete(job, upload_queue.MISSING)
+                self.file_catalog.forget(job.source_name)
+                continue
             
             try:
-                self.filemanager.upload_to_server(full_source_path, full_destination_path)
-                print("{} uploaded successfully".format(csv_source_file))
-                
+                confirmed = self.upload_file(job.source_name)
             except:
                 e = sys.exc_info()[0]
                 
                 print("\n   !!! An Exception Occurred During Remote Transfer !!!")
                 print("{}".format(e))
+                
+                attempts = self.upload_queue.fail(job, e)
+                print("{} will be uploaded again in {:.0f} s".format(job.source_name, self.upload_queue.backoff(attempts)))
+                break
+            
+            if confirmed:
+                self.upload_queue.complete(job)
+            else:
+                attempts = self.upload_queue.fail(job, "The remote copy could not be verified")
+                print("{} will be uploaded again in {:.0f} s".format(job.source_name, self.upload_queue.backoff(attempts)))
+    
+    
+    # Compress, upload and verify a file in the 'toUpload' directory, and move it to the
+    # 'uploaded' directory.  Returns True once the file is confirmed on the server.
+    def upload_file(self, csv_source_file):
+        
+        full_source_path = os.path.join(
+                                self.args['preferences']['toUploadPath'],
+                                csv_source_file
+                            )
+        
+        # Compress the file to reduce the data sent over the cellular link
+        try:
+            package_path, statistics = self.packager.package(full_source_path)
+            compression.report(csv_source_file, statistics)
+        except:
+            e = sys.exc_info()[0]
+            
+            print("\n   !!! An Exception Occurred During Compression, Sending Uncompressed !!!")
+            print("{}".format(e))
+            
+            package_path = full_source_path
+            
+        package_name = os.path.basename(package_path)
+
+        if csv_source_file == "sample_test.csv":
+            # The sample test is stored in the site directory
+            self.filemanager.build_remote_structure(self.args['preferences']['siteName'], self.args['filename'])
+            
+            full_destination_path = os.path.join(
+                                        self.args['preferences']['protocol']['ssh']['remoteDestinationPath'],
+                                        self.args['preferences']['siteName'],
+                                        package_name
+                                    )
+            
+            print("\n     --- Uploading {} to server ---\n".format(package_name.upper()))
+
+        else:
+            # Make sure the year and month directories of this file exist on the server
+            self.filemanager.build_remote_structure(self.args['preferences']['siteName'], csv_source_file)
+            
+            full_destination_path = os.path.join(
+                                        self.args['preferences']['protocol']['ssh']['remoteDestinationPath'],
+                                        self.args['preferences']['siteName'],
+                                        csv_source_file[:4],
+                                        csv_source_file[4:6],
+                                        package_name
+                                    )
+
+            print("\n     --- Uploading {} to server ---\n".format(package_name.upper()))
+        
+        # An exception during the transfer is passed on, the link is most likely down
+        try:
+            confirmed = self.filemanager.upload_to_server(package_path, full_destination_path, csv_source_file)
+        finally:
+            # The compressed copy is only needed for the transfer
+            self.packager.discard(package_path)
+        
+        # Files that could not be confirmed stay in the 'toUpload' directory and the
+        # upload resumes where it stopped at the next attempt
+        if not confirmed:
+            return False
+        
+        print("{} uploaded successfully".format(package_name))
+        
+        print("\n     --- Moving old file ---\n")
             
-            print("\n     --- Moving old file ---\n")
+        try:
+            if csv_source_file != "sample_test.csv":
+                # The checksum of the local file is kept in the catalog with the uploaded file
+                sha256 = sha256_file(full_source_path)
                 
-            try:
-                if csv_source_file != "sample_test.csv":
-                    self.filemanager.move_file(full_source_path, self.args['preferences']['uploadedPath'])
-                else:
-                    self.filemanager.delete_file(os.path.join(
-                            self.args['preferences']['toUploadPath'],
-                            "sample_test.csv"#"sample_test.zip"
-                        )
+                if self.filemanager.move_file(full_source_path, self.args['preferences']['uploadedPath']):
+                    self.file_catalog.record(
+                        os.path.join(self.args['preferences']['uploadedPath'], csv_source_file),
+                        file_catalog.UPLOADED,
+                        sha256
                     )
-            except:
-                e = sys.exc_info()[0]
-                
-                print("\n   !!! An Exception Occurred During Local File Move !!!")
-                print("{}".format(e))
+            else:
+                self.filemanager.delete_file(os.path.join(
+                        self.args['preferences']['toUploadPath'],
+                        "sample_test.csv"
+                    )
+                )
+        except:
+            e = sys.exc_info()[0]
+            
+            print("\n   !!! An Exception Occurred During Local File Move !!!")
+            print("{}".format(e))
+        
+        return True
 
 
     def set_clock(self):
@@ -386,11 +806,10 @@ class Radiometer:
         
         print("\n\n    --- Building Filename --- \n")
         
-        # Set the new filename
-        self.args['filename'] = str(datetime.now(timezone.utc).strftime('%Y'))
-        self.args['filename'] += str(datetime.now(timezone.utc).strftime('%m'))
-        self.args['filename'] += str(datetime.now(timezone.utc).strftime('%d'))
-        self.args['filename'] += ".csv"
+        # The file is named after the day of the samples that are written to it
+        self.args['filename'] = self.today + ".csv"
+        
+        self.args['binaryFilename'] = self.args['filename'][:-len(".csv")] + binary_format.EXTENSION
 
         print("Writing to {}".format(self.args['filename']))
         
@@ -427,6 +846,20 @@ class Radiometer:
         
     def write_coordinate_string(self):
         
+        coordinate_string = self.build_coordinate_string()
+        
+        print(coordinate_string, end = '')
+        
+        # Write the coordinates of the radiometer
+        self.filemanager.save_to_file(
+            self.args['preferences']['savePath'], 
+            self.args['filename'], 
+            coordinate_string
+        )
+        
+    
+    def build_coordinate_string(self):
+        
         # Build the coordinate string_at
         coordinate_string = 'Latitude : {}{}'.format(int(self.args['coordinates']['latitude']['degrees']), DEGREE_SIGN)
         coordinate_string += '{}\''.format(int(self.args['coordinates']['latitude']['minutes']))
@@ -440,13 +873,27 @@ class Radiometer:
         coordinate_string += '{:.3f}"'.format(float(self.args['coordinates']['longitude']['seconds']))
         coordinate_string += ' {}\n'.format(self.args['coordinates']['longitude']['direction'])
         
-        print(coordinate_string, end = '')
+        return coordinate_string
         
-        # Write the coordinates of the radiometer
-        self.filemanager.save_to_file(
-            self.args['preferences']['savePath'], 
-            self.args['filename'], 
-            coordinate_string
+    
+    # Open the binary copy of the day file, the site and coordinates are stored in its header
+    def open_binary_file(self):
+        
+        coordinate_string = ""
+        
+        if self.get_gps_position:
+            coordinate_string = self.build_coordinate_string().rstrip('\n')
+        
+        header = binary_format.build_header(
+            self.args['preferences']['siteName'],
+            coordinate_string,
+            self.channel_plan.names
+        )
+        
+        self.filemanager.open_binary_writer(
+            self.args['preferences']['savePath'],
+            self.args['binaryFilename'],
+            header
         )
         
 
@@ -476,6 +923,12 @@ class Radiometer:
         
     def __del__(self):
         
+        # Write any buffered rows to the day file
+        self.filemanager.close_data_writer()
+        
+        if self.aggregator is not None:
+            self.aggregator.close()
+        
         # Power off Sim7600
         self.sim7600.power_off()
 
@@ -492,11 +945,19 @@ def main(args):
     # Read the contents of the file into the global preferences file
     args['preferences'] = filemanager.load_file(cfg_file)
     
+    # The Sim7600 module needs the Raspberry Pi GPIO libraries, so it is only imported
+    # when the program runs on the unit
+    from src.sim7600 import Sim7600
+    
     # Create instances of base SIM7600X module
     sim7600 = Sim7600(args)
 
     try:
-        Radiometer(sim7600, filemanager, args)
+        radiometer = Radiometer(sim7600, filemanager, args)
+        radiometer.run()
     except:
+        # Write any buffered rows to the day file
+        filemanager.close_data_writer()
+        
         # Power off Sim7600
         sim7600.power_off()
@@ -0,0 +1,451 @@
+###
+#
+#
+#
+# Program Description : Keeps the uploaded data from filling the storage device.  The uploaded
+#                           day files of every month that is over are rolled into a compressed
+#                           monthly archive, and the oldest uploaded data is removed when the
+#                           archive grows past its budget or the free space runs low.  Only files
+#                           whose upload is confirmed in the upload manifest are archived or
+#                           removed.  The work runs on its own thread at idle CPU and I/O priority.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : retention.py
+#
+###
+
+# Imports
+from datetime import datetime, timezone
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import zipfile
+import threading
+import traceback
+import subprocess
+
+from src import file_catalog
+
+# Compression of the archive members for each codec
+ARCHIVE_CODECS = {
+    'zip'   : zipfile.ZIP_DEFLATED,
+    'bz2'   : zipfile.ZIP_BZIP2,
+    'xz'    : zipfile.ZIP_LZMA
+}
+
+# Size of the blocks that are read and written
+CHUNK_SIZE = 64 * 1024
+
+
+# Directory of the monthly archives on the storage device
+def archive_directory(preferences):
+
+    return os.path.join(preferences['savePath'], 'archive')
+
+
+# Record the files of the archives in the catalog, used when a new catalog is built
+def catalog_archives(catalog, archive_path):
+
+    if not os.path.isdir(archive_path):
+        return
+
+    for archive_name in sorted(os.listdir(archive_path)):
+        if not archive_name.endswith('.zip'):
+            continue
+
+        full_archive_path = os.path.join(archive_path, archive_name)
+
+        try:
+            with zipfile.ZipFile(full_archive_path) as archive:
+                for info in archive.infolist():
+                    catalog.record_archived(info.filename, full_archive_path, info.compress_size)
+        except (OSError, zipfile.BadZipFile) as e:
+            print("Unable to read archive {} : {}".format(archive_name, e))
+
+
+# SHA-256 of an archive member
+def sha256_member(archive, name):
+
+    digest = hashlib.sha256()
+
+    with archive.open(name) as member:
+        for chunk in iter(lambda: member.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class RetentionEngine():
+    # Constructor
+    def __init__(self, catalog, filemanager, archive_path, watch_path, budget_bytes=4294967296, min_free_bytes=268435456, codec='bz2', level=9):
+
+        if codec not in ARCHIVE_CODECS:
+            raise ValueError("Unknown archive codec '{}', expected one of {}".format(codec, list(ARCHIVE_CODECS)))
+
+        self.catalog = catalog
+        self.filemanager = filemanager
+
+        self.archive_path = archive_path
+
+        # The file system whose free space is watched
+        self.watch_path = watch_path
+
+        # Uploaded and archived data is removed, oldest day first, while it takes more than the
+        # budget or while the free space is below the minimum
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+
+        self.codec = codec
+        self.level = level
+
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = None
+
+        # Statistics
+        self.archives = 0
+        self.archived_files = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.low_space_warnings = 0
+
+
+    # Create an engine from the 'retention' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences, catalog, filemanager):
+
+        settings = preferences.get('retention', {})
+
+        return cls(
+            catalog,
+            filemanager,
+            archive_directory(preferences),
+            preferences['savePath'],
+            budget_bytes = settings.get('budgetBytes', 4294967296),
+            min_free_bytes = settings.get('minFreeBytes', 268435456),
+            codec = settings.get('codec', 'bz2'),
+            level = settings.get('level', 9)
+        )
+
+
+    def start(self):
+
+        if self.thread is not None:
+            return
+
+        os.makedirs(self.archive_path, exist_ok=True)
+
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, name='Retention', daemon=True)
+        self.thread.start()
+
+
+    # Ask for a retention pass, called by the scheduler.  A pass that is requested while one is
+    # running starts when it is done.
+    def request(self):
+
+        self.wake.set()
+
+
+    def run(self):
+
+        self.lower_priority()
+
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+
+            if self.stopping:
+                break
+
+            try:
+                self.compact()
+                self.enforce()
+            except Exception:
+                print("\n   !!! An Exception Occurred During Retention !!!")
+                traceback.print_exc(file=sys.stdout)
+
+
+    # Stop after the current pass.  Rolling up a month can take minutes, so the wait is limited
+    # by the timeout and an unfinished archive is written again by the next pass.
+    def stop(self, timeout=None):
+
+        if self.thread is None:
+            return
+
+        self.stopping = True
+        self.wake.set()
+        self.thread.join(timeout)
+        self.thread = None
+
+
+    # Run this thread at the lowest CPU priority and in the idle I/O class, so the archives are
+    # only written when the sample writer is not using the storage device
+    def lower_priority(self):
+
+        thread_id = threading.get_native_id()
+
+        try:
+            os.setpriority(os.PRIO_PROCESS, thread_id, 19)
+        except (AttributeError, OSError) as e:
+            print("Unable to lower the CPU priority of the retention thread : {}".format(e))
+
+        try:
+            subprocess.run(
+                ['ionice', '-c', '3', '-p', str(thread_id)],
+                stdout = subprocess.DEVNULL,
+                stderr = subprocess.DEVNULL,
+                timeout = 10,
+                check = True
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            print("Unable to lower the I/O priority of the retention thread : {}".format(e))
+
+
+    # Roll the uploaded files of every month before the current one into a monthly archive
+    def compact(self):
+
+        current_month = datetime.now(timezone.utc).strftime('%Y%m')
+
+        months = {}
+
+        for entry in self.catalog.files(file_catalog.UPLOADED, before=current_month + '01'):
+            if not self.is_confirmed(entry):
+                continue
+
+            months.setdefault(entry.day[:6], []).append(entry)
+
+        for month in sorted(months):
+            if self.stopping:
+                return
+
+            self.archive_month(month, months[month])
+
+
+    # Name of the next archive of a month.  Files that arrive after the month was rolled up go
+    # into a second archive, the archives are never rewritten.  An archive without catalogued
+    # files was left by a pass that was interrupted before its files were recorded, so it is
+    # replaced.
+    def next_archive_path(self, month):
+
+        number = 0
+
+        while True:
+            archive_name = month + ('.zip' if number == 0 else '-{}.zip'.format(number))
+            full_archive_path = os.path.join(self.archive_path, archive_name)
+
+            if not os.path.isfile(full_archive_path) or self.catalog.archived_count(full_archive_path) == 0:
+                return full_archive_path
+
+            number += 1
+
+
+    # Write the files of a month to a new archive, check every member against the file it was
+    # read from and only then record the files as archived and remove them
+    def archive_month(self, month, entries):
+
+        start = time.perf_counter()
+
+        full_archive_path = self.next_archive_path(month)
+        temporary_path = full_archive_path + '.tmp'
+
+        compress_type = ARCHIVE_CODECS[self.codec]
+        checksums = {}
+
+        with open(temporary_path, 'wb') as archive_file:
+            with zipfile.ZipFile(archive_file, 'w', compress_type, compresslevel=self.level) as archive:
+                for entry in entries:
+                    if not os.path.isfile(entry.path):
+                        print("{} is no longer in the 'uploaded' directory".format(entry.name))
+                        self.catalog.forget(entry.name)
+                        continue
+
+                    info = zipfile.ZipInfo(entry.name, date_time=time.gmtime(os.path.getmtime(entry.path))[:6])
+                    info.compress_type = compress_type
+
+                    digest = hashlib.sha256()
+
+                    with open(entry.path, 'rb') as source, archive.open(info, 'w') as destination:
+                        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                            digest.update(chunk)
+                            destination.write(chunk)
+
+                    checksums[entry.name] = digest.hexdigest()
+
+                    if entry.sha256 is not None and entry.sha256 != checksums[entry.name]:
+                        print("{} changed after it was uploaded : uploaded {} archived {}".format(entry.name, entry.sha256, checksums[entry.name]))
+
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+
+        if not checksums:
+            os.remove(temporary_path)
+            return
+
+        os.replace(temporary_path, full_archive_path)
+        self.filemanager.sync_directory(self.archive_path)
+
+        original_size = 0
+
+        with zipfile.ZipFile(full_archive_path) as archive:
+            for entry in entries:
+                if entry.name not in checksums:
+                    continue
+
+                if sha256_member(archive, entry.name) != checksums[entry.name]:
+                    print("The archived copy of {} does not match, it is kept in the 'uploaded' directory".format(entry.name))
+                    continue
+
+                info = archive.getinfo(entry.name)
+
+                self.catalog.record_archived(entry.name, full_archive_path, info.compress_size, checksums[entry.name])
+                self.filemanager.delete_file(entry.path)
+
+                original_size += info.file_size
+                self.archived_files += 1
+
+        self.archives += 1
+
+        print("Archived {} files of {} in {} : {} -> {} bytes in {:.1f} s".format(
+                len(checksums),
+                month,
+                os.path.basename(full_archive_path),
+                original_size,
+                os.path.getsize(full_archive_path),
+                time.perf_counter() - start
+            )
+        )
+
+
+    # Has the upload of a file been confirmed on the server.  A file that is catalogued as
+    # uploaded without a confirmation is moved to the unconfirmed state and is never removed.
+    def is_confirmed(self, entry):
+
+        if self.filemanager.get_upload_manifest().has_confirmed(entry.name):
+            return True
+
+        if entry.state == file_catalog.UPLOADED:
+            print("The upload of {} was never confirmed, it is kept".format(entry.name))
+            self.catalog.upsert(entry.name, entry.path, file_catalog.UNCONFIRMED, entry.size, entry.sha256)
+
+        return False
+
+
+    # Bytes taken by the uploaded and archived data
+    def retained_bytes(self):
+
+        totals = self.catalog.totals()
+
+        return sum(totals.get(state, (0, 0))[1] or 0 for state in (file_catalog.UPLOADED, file_catalog.ARCHIVED))
+
+
+    def free_bytes(self):
+
+        return shutil.disk_usage(self.watch_path).free
+
+
+    # Remove the oldest confirmed uploads until the data is within the budget and there is enough
+    # free space.  Files that are active, waiting to be uploaded or not confirmed are never
+    # removed, and neither is an archive that holds a file that is not confirmed.
+    def enforce(self):
+
+        retained = self.retained_bytes()
+        free = self.free_bytes()
+
+        skipped_archives = set()
+
+        for entry in self.catalog.oldest((file_catalog.UPLOADED, file_catalog.ARCHIVED)):
+            if retained <= self.budget_bytes and free >= self.min_free_bytes:
+                break
+
+            if self.stopping:
+                return
+
+            if entry.state == file_catalog.ARCHIVED:
+                if entry.path in skipped_archives:
+                    continue
+
+                members = self.catalog.archived_names(entry.path)
+
+                if not all(self.filemanager.get_upload_manifest().has_confirmed(name) for name in members):
+                    print("{} holds files whose upload was never confirmed, it is kept".format(os.path.basename(entry.path)))
+                    skipped_archives.add(entry.path)
+                    continue
+
+            elif not self.is_confirmed(entry):
+                continue
+
+            # A file that could not be removed is tried again by the next pass
+            if not self.evict(entry):
+                continue
+
+            # The other files of a removed archive come later in the list
+            if entry.state == file_catalog.ARCHIVED:
+                skipped_archives.add(entry.path)
+
+            retained = self.retained_bytes()
+            free = self.free_bytes()
+
+        if free < self.min_free_bytes:
+            self.low_space_warnings += 1
+
+            print("\n   !!! Only {:.1f} MB free on {}, and no uploaded data is left to remove !!!".format(
+                    free / 1048576,
+                    self.watch_path
+                )
+            )
+
+
+    # Remove an uploaded file, or the whole archive of an archived file.  Returns True once it
+    # has been removed.
+    def evict(self, entry):
+
+        if entry.state == file_catalog.ARCHIVED:
+            removed_files = self.catalog.archived_count(entry.path)
+            removed_bytes = os.path.getsize(entry.path) if os.path.isfile(entry.path) else 0
+
+            if os.path.isfile(entry.path) and not self.filemanager.delete_file(entry.path):
+                return False
+
+            self.catalog.forget_archive(entry.path)
+        else:
+            removed_files = 1
+            removed_bytes = entry.size
+
+            if os.path.isfile(entry.path) and not self.filemanager.delete_file(entry.path):
+                return False
+
+            self.catalog.forget(entry.name)
+
+        self.evicted_files += removed_files
+        self.evicted_bytes += removed_bytes
+
+        print("Removed {} ({} files, {} bytes) to stay within the storage budget".format(
+                os.path.basename(entry.path),
+                removed_files,
+                removed_bytes
+            )
+        )
+
+        return True
+
+
+    # Print the retention statistics
+    def report(self):
+
+        print("Retention : {} archives with {} files written, {} files ({:.1f} MB) removed, {:.1f} MB retained, {:.1f} MB free".format(
+                self.archives,
+                self.archived_files,
+                self.evicted_files,
+                self.evicted_bytes / 1048576,
+                self.retained_bytes() / 1048576,
+                self.free_bytes() / 1048576
+            )
+        )
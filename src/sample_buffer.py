@@ -0,0 +1,311 @@
+###
+#
+#
+#
+# Program Description : Fixed-size ring buffer of the most recent samples of every channel, and
+#                           a small HTTP endpoint on localhost that answers queries for the
+#                           latest sample, a time window or per-channel statistics from memory.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : sample_buffer.py
+#
+###
+
+# Imports
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import json
+import math
+import threading
+import time
+
+
+class SampleBuffer():
+    # Constructor
+    def __init__(self, channels, capacity):
+
+        self.channels = list(channels)
+        self.channel_count = len(self.channels)
+        self.capacity = capacity
+
+        # Timestamps in seconds since the epoch, and the values of every sample in one flat
+        # float32 array, row after row
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = array('f', bytes(4 * capacity * self.channel_count))
+
+        # Position of the next sample, and the number of samples in the buffer
+        self.head = 0
+        self.count = 0
+
+        # Held only while a row is copied in or out
+        self.lock = threading.Lock()
+
+
+    # Create a buffer that holds the configured number of hours at the sample period
+    @classmethod
+    def from_preferences(cls, preferences, channels, sample_period):
+
+        settings = preferences.get('sampleBuffer', {})
+
+        capacity = int(settings.get('hours', 24) * 3600 / sample_period)
+
+        return cls(channels, max(capacity, 1))
+
+
+    def __len__(self):
+
+        return self.count
+
+
+    # Add a sample, the oldest sample is overwritten once the buffer is full
+    def append(self, timestamp, values):
+
+        with self.lock:
+            start = self.head * self.channel_count
+
+            self.timestamps[self.head] = timestamp
+            self.values[start:start + self.channel_count] = array('f', values)
+
+            self.head = (self.head + 1) % self.capacity
+
+            if self.count < self.capacity:
+                self.count += 1
+
+
+    # Index in the arrays of the i-th oldest sample
+    def index(self, i):
+
+        return (self.head - self.count + i) % self.capacity
+
+
+    # A sample as a dictionary.  NaN is not valid JSON, so a missing value is None.
+    def row(self, timestamp, values):
+
+        return {
+            'timestamp': timestamp,
+            'values': {
+                channel: None if math.isnan(value) else value
+                for channel, value in zip(self.channels, values)
+            }
+        }
+
+
+    # The most recent sample, or None if the buffer is empty
+    def latest(self):
+
+        with self.lock:
+            if self.count == 0:
+                return None
+
+            index = (self.head - 1) % self.capacity
+            start = index * self.channel_count
+
+            timestamp = self.timestamps[index]
+            values = self.values[start:start + self.channel_count]
+
+        return self.row(timestamp, values)
+
+
+    # Number of samples older than a time.  The timestamps increase, so it is found with a
+    # binary search.
+    def search(self, timestamp):
+
+        low = 0
+        high = self.count
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if self.timestamps[self.index(middle)] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+
+    # Copy of the timestamps and the values of the samples with start <= timestamp < end,
+    # oldest first, the values in one flat array row after row.  The window is one or two
+    # contiguous blocks of the ring, so it is copied with at most two slices of each array.
+    def window_arrays(self, start, end):
+
+        first = self.search(start)
+        count = max(self.search(end) - first, 0)
+
+        begin = self.index(first)
+        wrapped = begin + count - self.capacity
+
+        if wrapped <= 0:
+            return (
+                self.timestamps[begin:begin + count],
+                self.values[begin * self.channel_count:(begin + count) * self.channel_count]
+            )
+
+        return (
+            self.timestamps[begin:] + self.timestamps[:wrapped],
+            self.values[begin * self.channel_count:] + self.values[:wrapped * self.channel_count]
+        )
+
+
+    # Samples with start <= timestamp < end, oldest first.  The window is copied under the lock
+    # and the rows are built outside it, like the statistics.
+    def window(self, start, end):
+
+        with self.lock:
+            timestamps, values = self.window_arrays(start, end)
+
+        return [
+            self.row(timestamp, values[i * self.channel_count:(i + 1) * self.channel_count])
+            for i, timestamp in enumerate(timestamps)
+        ]
+
+
+    # Count, mean, minimum, maximum and standard deviation of each channel in a time window
+    def stats(self, start, end, channels=None):
+
+        channels = channels if channels else self.channels
+        positions = [self.channels.index(channel) for channel in channels]
+
+        # The window is copied under the lock and the statistics are computed outside it, so a
+        # query over a whole day does not hold up the sample writer
+        with self.lock:
+            timestamps, values = self.window_arrays(start, end)
+
+        statistics = {}
+
+        # Missing values are left out
+        for channel, position in zip(channels, positions):
+            samples = [sample for sample in values[position::self.channel_count] if not math.isnan(sample)]
+
+            if not samples:
+                statistics[channel] = {'count': 0}
+                continue
+
+            mean = sum(samples) / len(samples)
+            variance = sum((sample - mean) ** 2 for sample in samples) / len(samples)
+
+            statistics[channel] = {
+                'count': len(samples),
+                'mean': mean,
+                'min': min(samples),
+                'max': max(samples),
+                'std': math.sqrt(variance)
+            }
+
+        return statistics
+
+
+class SampleRequestHandler(BaseHTTPRequestHandler):
+
+    # Queries
+    #   /latest                                 the most recent sample
+    #   /window?start=<epoch>&end=<epoch>       samples in a time window
+    #   /window?last=<seconds>                  samples in the last number of seconds
+    #   /stats?last=<seconds>&channel=<name>    statistics, for every channel if none are given
+    def do_GET(self):
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        try:
+            start, end = self.time_range(query)
+
+            if url.path == '/latest':
+                body = self.server.sample_buffer.latest()
+            elif url.path == '/window':
+                body = self.server.sample_buffer.window(start, end)
+            elif url.path == '/stats':
+                body = self.server.sample_buffer.stats(start, end, query.get('channel'))
+            else:
+                self.send_error(404, "Unknown query {}".format(url.path))
+                return
+
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+
+        # Clients expect strict JSON, which has no NaN or infinity
+        try:
+            encoded = json.dumps(body, allow_nan=False).encode('utf-8')
+        except ValueError as e:
+            self.send_error(500, str(e))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+
+    def time_range(self, query):
+
+        if 'last' in query:
+            end = time.time() + 1
+            return end - 1 - float(query['last'][0]), end
+
+        return float(query.get('start', ['0'])[0]), float(query.get('end', ['inf'])[0])
+
+
+    # Requests are not written to the log of the radiometer
+    def log_message(self, format, *args):
+
+        pass
+
+
+class SampleServer():
+    # Constructor
+    def __init__(self, sample_buffer, host='127.0.0.1', port=8642):
+
+        self.sample_buffer = sample_buffer
+        self.host = host
+        self.port = port
+
+        self.httpd = None
+        self.thread = None
+
+
+    # Create a server from the 'sampleBuffer' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences, sample_buffer):
+
+        settings = preferences.get('sampleBuffer', {})
+
+        return cls(
+            sample_buffer,
+            host = settings.get('host', '127.0.0.1'),
+            port = settings.get('port', 8642)
+        )
+
+
+    def start(self):
+
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), SampleRequestHandler)
+        except OSError as e:
+            print("Unable to start the sample server on {}:{} : {}".format(self.host, self.port, e))
+            return False
+
+        self.httpd.daemon_threads = True
+        self.httpd.sample_buffer = self.sample_buffer
+
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='SampleServer', daemon=True)
+        self.thread.start()
+
+        print("Serving recent samples on http://{}:{}".format(self.host, self.port))
+
+        return True
+
+
+    def stop(self):
+
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -0,0 +1,165 @@
+###
+#
+#
+#
+# Program Description : Deadline scheduler for the periodic tasks of the radiometer.  Deadlines
+#                           are kept on the monotonic clock and advance by exactly one period,
+#                           so the sample times do not drift, and the scheduler sleeps between
+#                           deadlines instead of spinning.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : scheduler.py
+#
+###
+
+# System imports
+import heapq
+import itertools
+import time
+
+
+class ScheduledTask:
+    # Constructor
+    def __init__(self, name, period, callback, priority):
+
+        self.name = name
+        self.period = period
+        self.callback = callback
+
+        # Tasks due at the same deadline run in order of priority, lowest first
+        self.priority = priority
+
+        # Statistics
+        self.runs = 0
+        self.late = 0
+        self.skipped = 0
+        self.max_lateness = 0.0
+
+
+class Scheduler:
+    # Constructor
+    def __init__(self, late_tolerance=0.05):
+
+        # A task that starts more than this many seconds after its deadline is recorded as late
+        self.late_tolerance = late_tolerance
+
+        self.queue = []
+        self.tasks = {}
+
+        # Breaks ties between tasks with the same deadline and priority
+        self.sequence = itertools.count()
+
+        self.active = False
+        self.wakeups = 0
+
+        # Optional function called with the task, its lateness and the deadlines it skipped
+        self.observer = None
+
+
+    # Create a scheduler from the 'scheduler' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        settings = preferences.get('scheduler', {})
+
+        return cls(late_tolerance = settings.get('lateTolerance', 0.05))
+
+
+    # Add a periodic task.  An aligned task fires on multiples of its period on the wall clock,
+    # for example on every whole second for a one second period.
+    def add_task(self, name, period, callback, priority=10, align=False):
+
+        task = ScheduledTask(name, period, callback, priority)
+        self.tasks[name] = task
+
+        now = time.monotonic()
+
+        if align:
+            deadline = now + period - (time.time() % period)
+        else:
+            deadline = now + period
+
+        self.push(deadline, task)
+
+        return task
+
+
+    def push(self, deadline, task):
+
+        heapq.heappush(self.queue, (deadline, task.priority, next(self.sequence), task))
+
+
+    # Run the next task if its deadline has passed, otherwise return the time until it is due
+    def run_pending(self):
+
+        deadline, priority, sequence, task = self.queue[0]
+        now = time.monotonic()
+
+        if now < deadline:
+            return deadline - now
+
+        heapq.heappop(self.queue)
+
+        lateness = now - deadline
+
+        # Deadlines that passed completely while the previous task was running are skipped,
+        # the task runs once for the most recent one
+        skipped = 0
+
+        if lateness >= task.period:
+            skipped = int(lateness // task.period)
+            task.skipped += skipped
+            deadline += skipped * task.period
+            lateness -= skipped * task.period
+
+        if lateness > self.late_tolerance:
+            task.late += 1
+
+        task.max_lateness = max(task.max_lateness, lateness)
+
+        if self.observer is not None:
+            self.observer(task, lateness, skipped)
+
+        # The next deadline is based on the previous deadline, not on the current time
+        self.push(deadline + task.period, task)
+
+        task.callback()
+        task.runs += 1
+
+        return 0
+
+
+    # Run the tasks until stop is called
+    def run(self):
+
+        self.active = True
+
+        while self.active and self.queue:
+            delay = self.run_pending()
+
+            if delay > 0:
+                time.sleep(delay)
+                self.wakeups += 1
+
+
+    def stop(self):
+
+        self.active = False
+
+
+    # Print the statistics of every task
+    def report(self):
+
+        for task in self.tasks.values():
+            print("Task {:12} : {} runs, {} late, {} skipped, max lateness {:.3f} s".format(
+                    task.name,
+                    task.runs,
+                    task.late,
+                    task.skipped,
+                    task.max_lateness
+                )
+            )
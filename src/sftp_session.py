@@ -0,0 +1,255 @@
+###
+#
+#
+#
+# Program Description : Managed SFTP session used for a complete upload window.  A single SSH
+#                           connection and SFTP channel are opened once and reused for every
+#                           file, with keepalive, pipelined writes and a tuned window size.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : sftp_session.py
+#
+###
+
+# Imports
+import time
+import shlex
+import hashlib
+import paramiko
+
+
+class SftpSession():
+    # Constructor
+    def __init__(self, servers, username, password, port=22, keepalive=30, window_size=2097152,
+                 max_packet_size=32768, buffer_size=32768, timeout=60):
+
+        self.servers = servers
+        self.port = port
+        self.username = username
+        self.password = password
+
+        # Seconds between keepalive packets, keeps the cellular NAT mapping open during long transfers
+        self.keepalive = keepalive
+
+        # A large window lets many write requests be in flight on a high-latency link
+        self.window_size = window_size
+        self.max_packet_size = max_packet_size
+
+        # Size of each write request
+        self.buffer_size = buffer_size
+
+        self.timeout = timeout
+
+        self.ssh_client = None
+        self.sftp_client = None
+        self.host = None
+
+
+    # Create a session from the 'ssh' section of the protocol preferences
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        settings = preferences['protocol']['ssh']
+
+        return cls(
+            settings['servers'],
+            settings['username'],
+            settings['password'],
+            port = settings.get('port', 22),
+            keepalive = settings.get('keepalive', 30),
+            window_size = settings.get('windowSize', 2097152),
+            max_packet_size = settings.get('maxPacketSize', 32768),
+            buffer_size = settings.get('bufferSize', 32768),
+            timeout = settings.get('timeout', 60)
+        )
+
+
+    def __enter__(self):
+
+        self.open()
+
+        return self
+
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+
+    # Connect to the first server that accepts the connection, returns True when connected
+    def open(self):
+
+        self.close()
+
+        for host in self.servers:
+            ssh_client = paramiko.SSHClient()
+            ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+            try:
+                ssh_client.connect(
+                    hostname=host,
+                    port=self.port,
+                    username=self.username,
+                    password=self.password,
+                    timeout=self.timeout,
+                    banner_timeout=self.timeout,
+                    auth_timeout=self.timeout
+                )
+
+                transport = ssh_client.get_transport()
+                transport.set_keepalive(self.keepalive)
+                transport.default_window_size = self.window_size
+                transport.default_max_packet_size = self.max_packet_size
+
+                self.sftp_client = paramiko.SFTPClient.from_transport(
+                    transport,
+                    window_size=self.window_size,
+                    max_packet_size=self.max_packet_size
+                )
+
+                self.ssh_client = ssh_client
+                self.host = host
+
+                return True
+
+            except Exception as e:
+                print("Unable to connect to {} : {}".format(host, e))
+                ssh_client.close()
+
+        return False
+
+
+    def is_open(self):
+
+        return (
+            self.ssh_client is not None
+            and self.ssh_client.get_transport() is not None
+            and self.ssh_client.get_transport().is_active()
+        )
+
+
+    # List the entries in a remote directory, a missing directory has no entries
+    def listdir(self, path):
+
+        try:
+            return self.sftp_client.listdir(path)
+        except IOError:
+            return []
+
+
+    def mkdir(self, path):
+
+        self.sftp_client.mkdir(path)
+
+
+    # Remove a remote file, a file that is already gone is not an error
+    def remove(self, path):
+
+        try:
+            self.sftp_client.remove(path)
+        except IOError:
+            pass
+
+
+    # Size of a remote file, or None if it does not exist
+    def remote_size(self, path):
+
+        try:
+            return self.sftp_client.stat(path).st_size
+        except IOError:
+            return None
+
+
+    # Upload a file with pipelined writes, starting at offset to resume a partial upload.  When
+    # end is given only the bytes before it are sent, for files that are still being written.
+    # Returns the transfer statistics.
+    def put(self, full_source_path, full_destination_path, offset=0, end=None):
+
+        start = time.perf_counter()
+        transferred = 0
+
+        # A new upload truncates the remote file, a resumed upload writes after the bytes already there
+        mode = 'r+' if offset > 0 else 'wb'
+
+        with open(full_source_path, 'rb') as source:
+            with self.sftp_client.open(full_destination_path, mode, bufsize=self.buffer_size) as destination:
+                # Writes are not acknowledged one at a time, errors are reported when the file is closed
+                destination.set_pipelined(True)
+
+                source.seek(offset)
+                destination.seek(offset)
+
+                while True:
+                    size = self.buffer_size
+
+                    if end is not None:
+                        size = min(size, end - offset - transferred)
+
+                    data = source.read(size) if size > 0 else b''
+
+                    if not data:
+                        break
+
+                    destination.write(data)
+                    transferred += len(data)
+
+        seconds = time.perf_counter() - start
+
+        return {
+            'bytes': transferred,
+            'offset': offset,
+            'seconds': seconds,
+            'throughput': transferred / seconds if seconds > 0 else 0.0
+        }
+
+
+    # SHA-256 of a remote file.  It is computed on the server with sha256sum, and the file is
+    # only read back over the link when the server cannot run the command.
+    def remote_sha256(self, path):
+
+        try:
+            stdin, stdout, stderr = self.ssh_client.exec_command(
+                "sha256sum {}".format(shlex.quote(path)),
+                timeout=self.timeout
+            )
+
+            output = stdout.read().decode().split()
+
+            if stdout.channel.recv_exit_status() == 0 and output:
+                return output[0]
+        except Exception as e:
+            print("sha256sum failed on {} : {}".format(self.host, e))
+
+        print("Reading {} back from the server to verify it".format(path))
+
+        digest = hashlib.sha256()
+
+        with self.sftp_client.open(path, 'rb', bufsize=self.buffer_size) as remote_file:
+            remote_file.prefetch()
+
+            for chunk in iter(lambda: remote_file.read(self.buffer_size), b''):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+
+    # Close the SFTP channel and the SSH connection
+    def close(self):
+
+        if self.sftp_client is not None:
+            try:
+                self.sftp_client.close()
+            except Exception:
+                pass
+
+            self.sftp_client = None
+
+        if self.ssh_client is not None:
+            self.ssh_client.close()
+            self.ssh_client = None
+
+        self.host = None
@@ -11,7 +11,7 @@
 # Authors             : Benjamin Kleynhans
 #
 # Last Modified By    : Benjamin Kleynhans
-# Last Modified Date  : September 9, 2020
+# Last Modified Date  : October 18, 2026
 # Filename            : sim7600.pyd
 #
 ###
@@ -20,12 +20,34 @@
 import os, sys, subprocess
 import time
 import inspect
-import pdb
 
 # Raspberry Pi Specific imports
 import RPi.GPIO as GPIO
 import serial
 
+# Project imports
+from src.modem_stages import StageTimer
+from src.at_channel import AtChannel
+from src import gps
+
+# Longest time in seconds each stage may take before the program continues without it.  The
+# stages complete as soon as the hardware reports that it is ready.
+STAGE_TIMEOUTS = {
+    'powerOn'           : 30,
+    'powerOff'          : 25,
+    'wwanInterface'     : 15,
+    'radioResetStart'   : 15,
+    'radioReset'        : 90,
+    'radioOnline'       : 90,
+    'registration'      : 120,
+    'radioOffline'      : 60,
+    'interfaceDown'     : 10,
+    'rawIp'             : 10,
+    'interfaceUp'       : 10,
+    'clockSync'         : 60,
+    'gpsFix'            : 120
+}
+
 class Sim7600():
     # Constructor
     def __init__(self, args):
@@ -35,8 +57,18 @@ class Sim7600():
         
         self.args = args
 
-        # How many times should the GPS try to triangulate before using default values
-        self.gps_retries = 100
+        # The last good fix is kept on the storage device and used after a restart, and the
+        # position is refined from the NMEA stream while the module is on
+        self.fix_store = gps.FixStore.from_preferences(args['preferences'])
+        self.nmea_stream = None
+        self.last_fix_saved = 0
+        
+        # Set once the position has been read, the GPS session is started again after the
+        # module restarts
+        self.gps_session = False
+        
+        # Seconds between writes of the refined position to the storage device
+        self.fix_save_interval = args['preferences'].get('gps', {}).get('saveInterval', 60)
         
         # The defined dictionary contains a set of predefined strings
         # that are used for interface with the sim7600 module.  These strings
@@ -52,6 +84,7 @@ class Sim7600():
             'getRadioMode'          : " --dms-get-operating-mode",  # Note the space BEFORE the string
             'getSignalStrength'     : " --nas-get-signal-strength", # Note the space BEFORE the string
             'getHomeNetwork'        : " --nas-get-home-network",    # Note the space BEFORE the string
+            'getServingSystem'      : " --nas-get-serving-system",  # Note the space BEFORE the string
             'wwanInterface'         : '',
             'wwanInterfaceCommand'  : "sudo ip link set ",          # Note the space AFTER the string
             'getWwanInterface'      : " -w",                        # Note the space BEFORE the string
@@ -65,13 +98,24 @@ class Sim7600():
         # Maintains the current logical state of the module
         self.power_status = 'offline'
         
+        # State of the connection : poweredOff, poweredOn, radioOnline, interfaceReady or connected
+        self.state = 'poweredOff'
+        
+        # Waits for each stage to complete and records the time it took
+        self.stage_timer = StageTimer.from_preferences(args['preferences'], STAGE_TIMEOUTS)
+        
         # Keep track of whether the device successfully connected to the internet
         self.connected = False
         
         self.serial0 = serial.Serial(self.defined['serial0'], self.defined['baudRate'])
         self.serial0.flushInput()
         
-        self.hard_power_off()
+        # All AT commands and unsolicited result codes go through a single reader
+        self.at_channel = AtChannel(self.serial0)
+        self.at_channel.start()
+        
+        # The module is not power cycled here, the radiometer does it on its network worker so
+        # the program starts sampling while the module powers down and up again
 
 
     # Powers the device down to ensure uniform startup of program and hardware interface
@@ -79,8 +123,15 @@ class Sim7600():
         
         self._print_debug_info()
                 
-        self._send_at_command('AT+CPOF', 'OK', 1)
-        time.sleep(10)
+        # The NMEA port disappears with the module
+        self.stop_gps_stream()
+        
+        self._send_at_command('AT+CPOF')
+        
+        # The module is off once it stops answering
+        self.stage_timer.wait_for('powerOff', lambda: not self._is_responding())
+        
+        self.state = 'poweredOff'
     
     
     # Connects the module to the internet
@@ -88,9 +139,14 @@ class Sim7600():
         
         self._print_debug_info()
         
+        start = time.monotonic()
+        
         self.turn_gsm_radio_on()
         self.update_wwan_protocol()
         self.connect_wwan_network()
+        
+        self.stage_timer.record('connect', time.monotonic() - start, self.connected)
+        self.report()
 
 
     # Disconnects the module from the internet
@@ -101,6 +157,7 @@ class Sim7600():
         self.turn_gsm_radio_off()
         
         self.connected = False
+        self.state = 'poweredOn'
 
 
     # Turns the GSM radio on
@@ -121,11 +178,15 @@ class Sim7600():
             
         radio_status, stderr = self._shell_process(self.build_command('setRadioMode', 'online'))
         
-        time.sleep(60)
-        
         if self.return_status(radio_status):
             print("GSM Radio Status : Online")
         
+        # Wait for the radio to come online and register on the network
+        if self.stage_timer.wait_for('radioOnline', lambda: self.get_gsm_radio_status() == 'online'):
+            self.state = 'radioOnline'
+        
+        self.stage_timer.wait_for('registration', self.is_registered)
+        
     
     # The wwan protocol needs to be set to raw_ip.  This has to be done every time the
     # unit connects, as it resets to default automatically when power is cycled
@@ -133,15 +194,13 @@ class Sim7600():
         
         self._print_debug_info()
         
-        time.sleep(10)
-        
         # Bring the interface down
         command_string = self.defined['wwanInterfaceCommand'] + self.defined['wwanInterface'] + ' down'
         
         print(command_string)
         stdout, stderr = self._shell_process(command_string)
 
-        time.sleep(5)
+        self.stage_timer.wait_for('interfaceDown', lambda: not self.interface_is_up())
 
         # Change protocol to RAW
         filepath = os.path.join('/sys/class/net', self.defined['wwanInterface'], 'qmi/raw_ip')
@@ -150,7 +209,7 @@ class Sim7600():
         print(command_string)
         stdout, stderr = self._shell_process(command_string)
         
-        time.sleep(5)
+        self.stage_timer.wait_for('rawIp', lambda: self._read_sys_file(filepath) == 'Y')
     
         # Bring the interface up
         command_string = self.defined['wwanInterfaceCommand'] + self.defined['wwanInterface'] + ' up'
@@ -158,6 +217,9 @@ class Sim7600():
         print(command_string)
         stdout, stderr = self._shell_process(command_string)
         
+        if self.stage_timer.wait_for('interfaceUp', self.interface_is_up):
+            self.state = 'interfaceReady'
+        
     
     # Open the connection to the internet
     def connect_wwan_network(self):
@@ -185,6 +247,7 @@ class Sim7600():
         # Check if there was an error connecting to the internet
         if "CallFailed" not in stderr:
             self.connected = True
+            self.state = 'connected'
             
             self.get_ip_address()
             self.update_routing_table()
@@ -217,9 +280,9 @@ class Sim7600():
         
         self._print_debug_info()
 
-        # It can take a long time for the server to connect to an NTP server
-        # therefore we are adding a 1 minute sleep timer
-        time.sleep(60)
+        # It can take a long time for the server to connect to an NTP server, so wait until
+        # the clock reports that it is synchronized
+        self.stage_timer.wait_for('clockSync', self.clock_is_synchronized)
         
         command_string = "sudo timedatectl"
         stdout, stderr = self._shell_process(command_string)
@@ -233,12 +296,19 @@ class Sim7600():
         self._print_debug_info()
             
         radio_status, stderr = self._shell_process(self.build_command('setRadioMode', 'reset'))
-        
-        time.sleep(60)
             
         if self.return_status(radio_status):
             print("GSM Radio Status : low-power")
         
+        # The control device disappears while the module restarts, and the reset is complete
+        # once the module reports its operating mode again
+        self.stage_timer.wait_for('radioResetStart', lambda: not os.path.exists(self.defined['gsmRadio']))
+        self.stage_timer.wait_for('radioReset', lambda: self.get_gsm_radio_status() is not None)
+        
+        self.state = 'poweredOn'
+        
+        self.resume_gps()
+        
     
     # Set the GSM radio to offline mode
     def turn_gsm_radio_off(self):
@@ -247,10 +317,10 @@ class Sim7600():
         
         radio_status, stderr = self._shell_process(self.build_command('setRadioMode', 'offline'))
         
-        time.sleep(60)
-        
         self.return_status(radio_status)
         
+        self.stage_timer.wait_for('radioOffline', lambda: self.get_gsm_radio_status() in ('offline', 'low-power'))
+        
         
     # Get the current status of the GSM radio (online, offline, low-power)
     def get_gsm_radio_status(self):
@@ -260,10 +330,40 @@ class Sim7600():
         # Get the operating mode -> Is the GSM radio on or off
         operating_mode, stderr = self._shell_process(self.build_command('getRadioMode'))
         
-        start_index = operating_mode.index('Mode: ') + len('Mode: ') + 1
-        remainder = operating_mode[start_index:]
+        # The module does not answer while it is restarting
+        try:
+            start_index = operating_mode.index('Mode: ') + len('Mode: ') + 1
+            remainder = operating_mode[start_index:]
+            
+            return remainder[:remainder.index('\n\t') -1]           # returns 'online', 'offline', or 'low-power'
+        except ValueError:
+            return None
+    
+    
+    # Is the module registered on the home network or roaming
+    def is_registered(self):
+        
+        self._print_debug_info()
+        
+        stdout, stderr = self._shell_process(self.build_command('getServingSystem'))
         
-        return remainder[:remainder.index('\n\t') -1]               # returns 'online', 'offline', or 'low-power'
+        return "Registration state: 'registered'" in stdout or "Registration state: 'roaming'" in stdout
+    
+    
+    # Is the wwan interface administratively up
+    def interface_is_up(self):
+        
+        flags = self._read_sys_file(os.path.join('/sys/class/net', self.defined['wwanInterface'], 'flags'))
+        
+        return flags is not None and int(flags, 16) & 0x1 == 0x1
+    
+    
+    # Has the system clock been synchronized with an NTP server
+    def clock_is_synchronized(self):
+        
+        stdout, stderr = self._shell_process("timedatectl show --property=NTPSynchronized --value")
+        
+        return stdout.strip() == 'yes'
     
 
     # Get the cellular signal strength
@@ -296,6 +396,8 @@ class Sim7600():
         
         self.defined['wwanInterface'] = stdout.rstrip('\n')
         
+        return self.defined['wwanInterface']
+        
     
     # Determine if we are currently online or offline
     def get_network_status(self):
@@ -392,15 +494,19 @@ class Sim7600():
         GPIO.output(self.defined['powerKey'], GPIO.HIGH)
         time.sleep(2)
         GPIO.output(self.defined['powerKey'], GPIO.LOW)
-        time.sleep(20)
-        self.serial0.flushInput()
+        
+        # The module has booted once it answers AT commands and the wwan interface exists
+        self.stage_timer.wait_for('powerOn', self._is_responding)
         
         self.power_status = "online"
+        self.state = 'poweredOn'
         
-        self.get_wwan_interface()
+        self.stage_timer.wait_for('wwanInterface', self.get_wwan_interface)
         
         print('SIM7600X is ready')
         
+        self.resume_gps()
+        
         
     def _power_off(self):
         
@@ -408,12 +514,17 @@ class Sim7600():
         
         print('Powering down SIM7600X\n')
         
+        # The NMEA port disappears with the module
+        self.stop_gps_stream()
+        
         GPIO.output(self.defined['powerKey'], GPIO.HIGH)
         time.sleep(3)
         GPIO.output(self.defined['powerKey'], GPIO.LOW)
-        time.sleep(18)
+        
+        self.stage_timer.wait_for('powerOff', lambda: not self._is_responding())
         
         self.power_status = "offline"
+        self.state = 'poweredOff'
         
         print('SIM7600 has been powered off')
         
@@ -439,90 +550,139 @@ class Sim7600():
                 
         print('Starting GPS session...')
         
-        receive_null = True
-        answer = 0
-        receive_buffer = ''
-        self._send_at_command('AT+CGPS=1,1', 'OK', 1)
-        time.sleep(2)
+        self._send_at_command('AT+CGPS=1,1')
+        self.gps_session = True
         
-        # If the GPS does not triangulate position in 100 tries, use default values
-        default_counter = 0
+        # The radiometer does not move, so a recent fix is used without waiting for the GPS
+        fix = self.fix_store.load()
         
-        while receive_null:
-            if default_counter < self.gps_retries:
-                default_counter += 1
-                time.sleep(2)
-                print("Attempt : {}".format(default_counter))
-                
-                answer, receive_buffer = self._send_at_command('AT+CGPSINFO', '+CGPSINFO: ', 1)
-                
-                if answer == 1:
-                    answer = 0
-                else:
-                    print('error %d' %answer)
-                    receive_buffer = ''
-                    self._send_at_command('AT+CGPS=0', 'OK', 1)
-                    return False
-                    
-                time.sleep(1.5)
-                            
-                if '+CGPSINFO' in receive_buffer and ',,,,,,,,' not in receive_buffer:
-                    gpgga_array = receive_buffer[receive_buffer.index(':') + 1:].split(',')
-                    
-                    self.coordinates = {
-                        'latitude': {
-                            'degrees': gpgga_array[0][:gpgga_array[0].find('.') - 2],
-                            'minutes': gpgga_array[0][3:gpgga_array[0].find('.')],
-                            'seconds': float(gpgga_array[0][gpgga_array[0].find('.'):]) * 60,
-                            'direction': gpgga_array[1]
-                        },
-                        'longitude': {
-                            'degrees': gpgga_array[2][:gpgga_array[2].find('.') - 2],
-                            'minutes': gpgga_array[2][3:gpgga_array[2].find('.')],
-                            'seconds': float(gpgga_array[2][gpgga_array[2].find('.'):]) * 60,
-                            'direction': gpgga_array[3]
-                        }
-                    }
-                    
-                    receive_null = False
-                    
-            else:
-                self.coordinates = self.args['preferences']['coordinates']
-                
-                receive_null = False
+        if fix is not None:
+            print("Using the position stored at {} ({})".format(fix['timestamp'], fix['source']))
+        else:
+            # If the GPS does not triangulate position before the stage times out, use default values
+            fix = self.stage_timer.wait_for('gpsFix', self.poll_gps_fix)
+            
+            if fix:
+                self.fix_store.save(fix)
+                self.last_fix_saved = time.monotonic()
+        
+        if fix:
+            self.coordinates = gps.coordinates_from_decimal(fix['latitude'], fix['longitude'])
+        else:
+            print("No GPS fix, using the configured coordinates")
+            self.coordinates = self.args['preferences']['coordinates']
+        
+        # Keep refining the position in the background while the module is on
+        self.start_gps_stream()
         
         return self.coordinates
+    
+    
+    # Coordinates of the stored fix, read without using the module.  Returns None if there is
+    # no recent fix.
+    def stored_position(self):
+        
+        fix = self.fix_store.load()
+        
+        if fix is None:
+            return None
+        
+        return gps.coordinates_from_decimal(fix['latitude'], fix['longitude'])
+        
+    
+    # Ask the module for its position, returns a fix or None if it has no fix yet
+    def poll_gps_fix(self):
+        
+        result = self.at_channel.send('AT+CGPSINFO', 2.0)
+        line = result.find('+CGPSINFO:')
+        
+        if not result.ok or line is None:
+            return None
+        
+        return gps.parse_cgpsinfo(line)
+        
+    
+    def start_gps_stream(self):
+        
+        if self.nmea_stream is None:
+            self.nmea_stream = gps.NmeaStream.from_preferences(self.args['preferences'], self.refine_position)
+        
+        self.nmea_stream.start()
+        
+    
+    def stop_gps_stream(self):
+        
+        if self.nmea_stream is not None:
+            self.nmea_stream.stop()
         
+    
+    # The GPS session and the NMEA port end when the module powers off or restarts, so they are
+    # started again once it is back if the position was read before
+    def resume_gps(self):
+        
+        if not self.gps_session:
+            return
+        
+        print('Restarting GPS session...')
+        
+        self._send_at_command('AT+CGPS=1,1')
+        self.start_gps_stream()
+        
+    
+    # Called by the NMEA stream with the running mean of the fixes, the new position is used in
+    # the heading of the next day file
+    def refine_position(self, fix):
         
-    def _send_at_command(self, command, return_value, timeout):
+        self.coordinates = gps.coordinates_from_decimal(fix['latitude'], fix['longitude'])
+        self.args['coordinates'] = self.coordinates
+        
+        if time.monotonic() - self.last_fix_saved >= self.fix_save_interval:
+            self.fix_store.save(fix)
+            self.last_fix_saved = time.monotonic()
+        
+        
+    # Send an AT command and return the reply as soon as it is complete, timeout is the longest
+    # time to wait for the reply
+    def _send_at_command(self, command, return_value='OK', timeout=5.0):
         
         self._print_debug_info()
         
-        receive_buffer = ''
-        self.serial0.write((command+'\r\n').encode())
-        time.sleep(timeout)
+        result = self.at_channel.send(command, timeout)
         
-        if self.serial0.inWaiting():
-            time.sleep(0.01)
-            receive_buffer = self.serial0.read(self.serial0.inWaiting())
-            
-        if receive_buffer != '':
-            if return_value not in receive_buffer.decode():
-                print(command + ' ERROR')
-                print(command + ' back:\t' + receive_buffer.decode())
-            else:
-                decoded_buffer = receive_buffer.decode()
-                print(decoded_buffer)
-                
-                if return_value == '+CGPSINFO: ':
-                    return 1, decoded_buffer
-                else:
-                    return 1
+        if result.status == 'TIMEOUT':
+            print('{} : no reply from the module after {} s'.format(command, timeout))
+        elif not result.ok or (return_value != 'OK' and result.find(return_value.strip()) is None):
+            print(command + ' ERROR')
+            print(command + ' back:\t' + result.text)
         else:
-            print('GPS is not ready')
-            return 0
+            print(result.text)
+        
+        return result
             
             
+    # Does the module answer a bare AT command within a short time
+    def _is_responding(self, timeout=0.5):
+        
+        return self.at_channel.send('AT', timeout).ok
+    
+    
+    # Contents of a sysfs attribute, or None if it does not exist
+    def _read_sys_file(self, filepath):
+        
+        try:
+            with open(filepath) as sys_file:
+                return sys_file.read().strip()
+        except IOError:
+            return None
+    
+    
+    # Print the time spent in each stage of the modem and the latency of the AT commands
+    def report(self):
+        
+        self.stage_timer.report()
+        self.at_channel.report()
+    
+    
     def _shell_process(self, command_string):
         
         shell_process = subprocess.Popen(
@@ -548,6 +708,9 @@ class Sim7600():
         
 # Destructor
     def __del__(self):
+        self.stop_gps_stream()
+        self.at_channel.stop()
+        
         if self.serial0 != None:
             self.serial0.close()
             GPIO.cleanup()
@@ -0,0 +1,138 @@
+###
+#
+#
+#
+# Program Description : Persistent record of the files that have been uploaded and confirmed
+#                           on the server.  A file is only confirmed once the hash of the remote
+#                           copy matches the hash computed locally.  The active day file is
+#                           tracked by the offset sent so far by the intraday uploads.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : upload_manifest.py
+#
+###
+
+# Imports
+from datetime import datetime, timezone
+
+import os
+import json
+import hashlib
+
+# Size of the blocks that are read when a file is hashed
+CHUNK_SIZE = 64 * 1024
+
+
+# SHA-256 of a local file
+def sha256_file(file_path):
+
+    digest = hashlib.sha256()
+
+    with open(file_path, 'rb') as filehandle:
+        for chunk in iter(lambda: filehandle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class UploadManifest():
+    # Constructor
+    def __init__(self, manifest_path):
+
+        self.manifest_path = manifest_path
+        self.entries = {}
+
+        self.load()
+
+
+    # Create the manifest in the 'state' directory on the storage device
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        return cls(os.path.join(preferences['savePath'], 'state', 'upload_manifest.json'))
+
+
+    def load(self):
+
+        try:
+            with open(self.manifest_path) as json_file:
+                self.entries = json.load(json_file)
+        except (IOError, ValueError):
+            self.entries = {}
+
+
+    # Write the manifest to a temporary file and rename it, so a power failure never leaves
+    # a partially written manifest
+    def save(self):
+
+        temporary_path = self.manifest_path + '.tmp'
+
+        with open(temporary_path, 'w') as json_file:
+            json.dump(self.entries, json_file, indent=4, sort_keys=True)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+
+        os.replace(temporary_path, self.manifest_path)
+
+
+    def get(self, source_name):
+
+        return self.entries.get(source_name)
+
+
+    # Has this exact file content already been confirmed on the server
+    def is_confirmed(self, source_name, sha256):
+
+        entry = self.entries.get(source_name)
+
+        return entry is not None and entry.get('sha256') == sha256
+
+
+    # Has any content of this file been confirmed on the server.  Used for files whose
+    # uploaded package is not the file itself, like the compressed uploads.
+    def has_confirmed(self, source_name):
+
+        entry = self.entries.get(source_name)
+
+        return entry is not None and 'confirmed' in entry and entry.get('sha256') is not None
+
+
+    # Record how much of the active day file has been sent by the intraday uploads
+    def record_increment(self, source_name, offset, remote_path):
+
+        self.entries[source_name] = {
+            'offset': offset,
+            'remotePath': remote_path,
+            'updated': datetime.now(timezone.utc).isoformat()
+        }
+
+        self.save()
+
+
+    # Remote path of the copy built up by the intraday uploads, or None if there is none
+    def increment_path(self, source_name):
+
+        entry = self.entries.get(source_name)
+
+        if entry is not None and 'offset' in entry:
+            return entry['remotePath']
+
+        return None
+
+
+    # Record a file whose remote copy was verified
+    def confirm(self, source_name, package_name, size, sha256, remote_path):
+
+        self.entries[source_name] = {
+            'package': package_name,
+            'size': size,
+            'sha256': sha256,
+            'remotePath': remote_path,
+            'confirmed': datetime.now(timezone.utc).isoformat()
+        }
+
+        self.save()
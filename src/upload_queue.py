@@ -0,0 +1,262 @@
+###
+#
+#
+#
+# Program Description : Persistent queue of the files that are waiting to be uploaded.  It is a
+#                           SQLite database on the storage device with one job per file, holding
+#                           its state, priority, number of attempts and the time of the next
+#                           attempt.  Failed uploads are retried with an exponential backoff.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : upload_queue.py
+#
+###
+
+# Imports
+import os
+import time
+import sqlite3
+import threading
+
+# Job states
+PENDING = 'pending'
+ACTIVE = 'active'
+DONE = 'done'
+MISSING = 'missing'
+
+# Jobs run in order of priority, lowest first, and then in the order they became due
+PRIORITY_TEST = 0
+PRIORITY_SUMMARY = 1
+PRIORITY_DATA = 2
+PRIORITY_BINARY = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    source_name     TEXT PRIMARY KEY,
+    path            TEXT NOT NULL,
+    priority        INTEGER NOT NULL,
+    state           TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt    REAL NOT NULL,
+    last_error      TEXT,
+    created         REAL NOT NULL,
+    updated         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, priority, next_attempt);
+"""
+
+
+# Priority of a file from its name, the connectivity test goes first and the binary copies last
+def priority_of(source_name):
+
+    if source_name == "sample_test.csv":
+        return PRIORITY_TEST
+
+    if "_summary" in source_name:
+        return PRIORITY_SUMMARY
+
+    if source_name.endswith(".csv") or source_name.endswith(".csv.gz"):
+        return PRIORITY_DATA
+
+    return PRIORITY_BINARY
+
+
+class UploadJob():
+    # Constructor
+    def __init__(self, source_name, path, priority, attempts):
+
+        self.source_name = source_name
+        self.path = path
+        self.priority = priority
+        self.attempts = attempts
+
+
+class UploadQueue():
+    # Constructor
+    def __init__(self, database_path, retry_delay=60, max_retry_delay=21600):
+
+        self.database_path = database_path
+
+        # The delay before the first retry, it doubles with every failed attempt up to the maximum
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # The queue is filled by the sample writer and drained by the network worker
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.executescript(SCHEMA)
+
+        self.recover()
+
+
+    # Create the queue in the 'state' directory on the storage device
+    @classmethod
+    def from_preferences(cls, preferences):
+
+        settings = preferences.get('uploadQueue', {})
+
+        return cls(
+            os.path.join(preferences['savePath'], 'state', 'upload_queue.db'),
+            retry_delay = settings.get('retryDelay', 60),
+            max_retry_delay = settings.get('maxRetryDelay', 21600)
+        )
+
+
+    # Jobs that were being uploaded when the program stopped are pending again
+    def recover(self):
+
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET state = ?, updated = ? WHERE state = ?",
+                (PENDING, time.time(), ACTIVE)
+            )
+
+
+    # Add a file to the queue.  A file that is already waiting keeps its attempts and backoff,
+    # a file that was uploaded before and is queued again starts over.
+    def enqueue(self, path, priority=None):
+
+        source_name = os.path.basename(path)
+
+        if priority is None:
+            priority = priority_of(source_name)
+
+        now = time.time()
+
+        with self.lock:
+            self.connection.execute(
+                """
+                INSERT INTO jobs (source_name, path, priority, state, attempts, next_attempt, created, updated)
+                VALUES (?, ?, ?, ?, 0, ?, ?, ?)
+                ON CONFLICT (source_name) DO UPDATE SET
+                    path = excluded.path,
+                    priority = excluded.priority,
+                    attempts = CASE WHEN state IN (?, ?) THEN 0 ELSE attempts END,
+                    next_attempt = CASE WHEN state IN (?, ?) THEN excluded.next_attempt ELSE next_attempt END,
+                    state = CASE WHEN state IN (?, ?) THEN excluded.state ELSE state END,
+                    updated = excluded.updated
+                """,
+                (source_name, path, priority, PENDING, now, now, now, DONE, MISSING, DONE, MISSING, DONE, MISSING)
+            )
+
+
+    # Number of jobs that are due now
+    def due(self):
+
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ? AND next_attempt <= ?",
+                (PENDING, time.time())
+            ).fetchone()[0]
+
+
+    # Take the next due job and mark it active, or None if no job is due
+    def next_job(self):
+
+        with self.lock:
+            row = self.connection.execute(
+                """
+                SELECT source_name, path, priority, attempts FROM jobs
+                WHERE state = ? AND next_attempt <= ?
+                ORDER BY priority, next_attempt
+                LIMIT 1
+                """,
+                (PENDING, time.time())
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self.connection.execute(
+                "UPDATE jobs SET state = ?, updated = ? WHERE source_name = ?",
+                (ACTIVE, time.time(), row[0])
+            )
+
+        return UploadJob(*row)
+
+
+    # Mark a job as done, or as missing when its file no longer exists
+    def complete(self, job, state=DONE):
+
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET state = ?, last_error = NULL, updated = ? WHERE source_name = ?",
+                (state, time.time(), job.source_name)
+            )
+
+
+    # Delay before the attempt after the given number of failed attempts
+    def backoff(self, attempts):
+
+        return min(self.retry_delay * 2 ** max(attempts - 1, 0), self.max_retry_delay)
+
+
+    # Record a failed attempt, the job is retried after the backoff
+    def fail(self, job, error):
+
+        attempts = job.attempts + 1
+        now = time.time()
+
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, next_attempt = ?, last_error = ?, updated = ? WHERE source_name = ?",
+                (PENDING, attempts, now + self.backoff(attempts), str(error), now, job.source_name)
+            )
+
+        return attempts
+
+
+    # Record a failed attempt for every due job, used when the link could not be brought up
+    def defer_due(self, error):
+
+        deferred = 0
+
+        while True:
+            job = self.next_job()
+
+            if job is None:
+                break
+
+            self.fail(job, error)
+            deferred += 1
+
+        return deferred
+
+
+    # Number of jobs in each state
+    def counts(self):
+
+        with self.lock:
+            return dict(self.connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+
+    # Print the number of jobs in each state and the next retry
+    def report(self):
+
+        counts = self.counts()
+
+        with self.lock:
+            next_attempt = self.connection.execute(
+                "SELECT MIN(next_attempt) FROM jobs WHERE state = ?",
+                (PENDING,)
+            ).fetchone()[0]
+
+        print("Upload queue : {} pending, {} done, {} missing{}".format(
+                counts.get(PENDING, 0),
+                counts.get(DONE, 0),
+                counts.get(MISSING, 0),
+                "" if next_attempt is None else ", next attempt in {:.0f} s".format(max(next_attempt - time.time(), 0))
+            )
+        )
+
+
+    def close(self):
+
+        with self.lock:
+            self.connection.close()
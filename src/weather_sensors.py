@@ -8,30 +8,31 @@
 # Authors             : Benjamin Kleynhans
 #
 # Last Modified By    : Benjamin Kleynhans
-# Last Modified Date  : September 24, 2020
+# Last Modified Date  : October 18, 2026
 # Filename            : weather_sensors.py
 #
 ###
 
 # System imports
-import sys, os, pdb
-import threading, time
-import piplates.DAQC2plate as DAQC2
+import sys
+
+# Project imports
+from src.pulse_counter import PulseCounter
 
 class WeatherSensors:
     # Constructor
-    def __init__(self, args, start=False):
+    def __init__(self, args, adc, start=False):
 
         self.args = args
         
-        self.initialize_variables()
+        # The ADC backend serializes access to the plates, so the gauges can be
+        # sampled in a separate thread
+        self.adc = adc
         
-        # Threading disable due to read limitation of PiPlates board,
-        # (you can only read one plate at a time)
-        # ~ self.sensor_thread = threading.Thread(target=self.read_sensors)
+        self.initialize_variables()
         
-        # ~ if start:
-            # ~ self.start()
+        if start:
+            self.start()
 
 
     # Variable initialization was moved out of constructor to clean up code
@@ -42,19 +43,25 @@ class WeatherSensors:
         self.gauges = {
             "anemometer": {
                 "channel": "",
-                "recordedTick": False,
-                "previousTime": 0,
-                "numberTicks": 0
+                "constant": self.args['preferences']['anemometerConstant']
             },
             "rainGauge": {
                 "channel": "",
-                "recordedTick": False,
-                "previousTime": 0,
-                "numberTicks": 0
+                "constant": self.args['preferences']['rainConstant']
             }
         }
         
         self.get_sensor_channels()
+        
+        # The pulse counter samples the gauges at a fixed rate in its own thread
+        self.pulse_counter = PulseCounter.from_preferences(
+            self.args['preferences'],
+            self.adc.get_adc
+        )
+        
+        for gauge in self.gauges:
+            if self.gauges[gauge]['channel'] != "":
+                self.pulse_counter.add_channel(gauge, self.gauges[gauge]['channel'])
     
     
     # Get the Anemometer channel number from the json file
@@ -64,80 +71,82 @@ class WeatherSensors:
         
         # Find the index of the Anemometer
         for idx in heading_indices:
-            if self.args['preferences']['headerIndices'][idx] == "Anemometer(km/h)":
+            if self.args['preferences']['headerIndices'].get(idx) == "Anemometer(km/h)":
                 self.gauges['anemometer']['channel'] = idx
                 break
         
         # Find the index of the Rain Gauge
         for idx in heading_indices:
-            if self.args['preferences']['headerIndices'][idx] == "RainGauge(mm)":
+            if self.args['preferences']['headerIndices'].get(idx) == "RainGauge(mm)":
                 self.gauges['rainGauge']['channel'] = idx
                 break
         
     
     def read_sensors(self):
         
-        while self.active:
-            self.read_anemometer()
-            self.read_rain_gauge()
+        self.read_anemometer()
+        self.read_rain_gauge()
         
         
-    # Start reading the Anemometer
+    # Update the rain gauge value from the ticks counted in the last window, 1 tick = 0.2794mm
     def read_rain_gauge(self):
         
-        current_time = time.time()
-        elapsed_time = current_time - self.gauges['rainGauge']['previousTime']
+        self.args['rainGauge'] = self.read_gauge('rainGauge')
         
-        if elapsed_time >= 1:
-            self.args['rainGauge'] = (
-                self.gauges['rainGauge']['numberTicks'] * self.args['preferences']['rainConstant'])
-            self.gauges['rainGauge']['numberTicks'] = 0
-            self.gauges['rainGauge']['previousTime'] = current_time
-            
-        temp_val = DAQC2.getADC(
-                        int(self.gauges['rainGauge']['channel'][2]),
-                        int(self.gauges['rainGauge']['channel'][3])
-                    )
-                    
-        if temp_val > 4:
-            if not self.gauges['rainGauge']['recordedTick']:
-                self.gauges['rainGauge']['numberTicks'] += 1
-                self.gauges['rainGauge']['recordedTick'] = True
-        else:
-            self.gauges['rainGauge']['recordedTick'] = False
+        return self.args['rainGauge']
             
             
-    # Start reading the Anemometer
+    # Update the anemometer value from the ticks counted in the last window, 1 tick per second = 2.4km/h
     def read_anemometer(self):
         
-        current_time = time.time()
-        elapsed_time = current_time - self.gauges['anemometer']['previousTime']
+        self.args['anemometer'] = self.read_gauge('anemometer')
+        
+        return self.args['anemometer']
+    
+    
+    # Ticks in the current window multiplied by the gauge constant, no ADC reads are made
+    def read_gauge(self, gauge):
         
-        if elapsed_time >= 1:
-            self.args['anemometer'] = (
-                self.gauges['anemometer']['numberTicks'] * self.args['preferences']['anemometerConstant'])
-            self.gauges['anemometer']['numberTicks'] = 0
-            self.gauges['anemometer']['previousTime'] = current_time
+        if gauge not in self.pulse_counter.channels:
+            return 0
             
-        temp_val = DAQC2.getADC(
-                        int(self.gauges['anemometer']['channel'][2]),
-                        int(self.gauges['anemometer']['channel'][3])
-                    )
-                    
-        if temp_val > 4:
-            if not self.gauges['anemometer']['recordedTick']:
-                self.gauges['anemometer']['numberTicks'] += 1
-                self.gauges['anemometer']['recordedTick'] = True
+        if gauge == 'anemometer':
+            return self.pulse_counter.rate(gauge) * self.gauges[gauge]['constant']
         else:
-            self.gauges['anemometer']['recordedTick'] = False
+            return self.pulse_counter.count(gauge) * self.gauges[gauge]['constant']
+    
+    
+    # Estimated number of ticks that were lost on each gauge
+    def get_missed_edges(self):
+        
+        missed_edges = {}
+        
+        for gauge in self.pulse_counter.channels:
+            missed_edges[gauge] = self.pulse_counter.missed_edges(gauge)
+            
+        return missed_edges
+    
+    
+    # Print the pulse counter statistics
+    def report(self):
+        
+        print("Pulse counter : {} samples, {} late, {} skipped, estimated missed ticks {}".format(
+                self.pulse_counter.samples,
+                self.pulse_counter.late_samples,
+                self.pulse_counter.skipped_samples,
+                self.get_missed_edges()
+            )
+        )
 
 
-    # Start monitoring the Anemometer
+    # Start monitoring the Anemometer and Rain Gauge
     def start(self):
-        self.sensor_thread.start()
+        self.active = True
+        self.pulse_counter.start()
         
         
-    # Stop monitoring the Anemometer
+    # Stop monitoring the Anemometer and Rain Gauge
     def stop(self):
         self.active = False
+        self.pulse_counter.stop()
         sys.stdout.flush()
@@ -0,0 +1,220 @@
+###
+#
+#
+#
+# Program Description : Background threads that keep slow work away from the acquisition loop.
+#                           The SampleWriter takes the samples from a bounded queue and stores
+#                           them, and the NetworkWorker runs the modem and upload jobs one at a
+#                           time, so the sampling cadence never waits for the disk or the network.
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : workers.py
+#
+###
+
+# Imports
+import sys
+import queue
+import threading
+import traceback
+
+# Placed on a queue to stop its thread once the items before it have been handled
+STOP = object()
+
+
+class SampleWriter():
+    # Constructor
+    def __init__(self, write, capacity=600):
+
+        # Called on the writer thread with the timestamp and values of every sample
+        self.write = write
+
+        # Samples that can wait to be written before new samples are dropped.  The queue itself
+        # is not bounded, so the calls and the stop marker are never refused.
+        self.capacity = capacity
+        self.queue = queue.Queue()
+
+        self.thread = None
+
+        # Statistics
+        self.written = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+
+    # Create a writer from the 'scheduler' section of the preferences
+    @classmethod
+    def from_preferences(cls, preferences, write):
+
+        settings = preferences.get('scheduler', {})
+
+        return cls(write, capacity = settings.get('queueSize', 600))
+
+
+    def start(self):
+
+        if self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self.run, name='SampleWriter', daemon=True)
+        self.thread.start()
+
+
+    # Queue a sample, called from the acquisition loop.  It never blocks, a sample that does not
+    # fit is dropped and counted.
+    def put(self, timestamp, values):
+
+        depth = self.queue.qsize()
+
+        if depth >= self.capacity:
+            self.dropped += 1
+            return False
+
+        if depth >= self.max_depth:
+            self.max_depth = depth + 1
+
+        self.queue.put_nowait((timestamp, values))
+
+        return True
+
+
+    # Run a function on the writer thread after the samples queued before it have been written
+    def call(self, function):
+
+        self.queue.put_nowait(function)
+
+
+    def run(self):
+
+        while True:
+            item = self.queue.get()
+
+            if item is STOP:
+                break
+
+            try:
+                if callable(item):
+                    item()
+                else:
+                    self.write(*item)
+                    self.written += 1
+            except Exception:
+                print("\n   !!! An Exception Occurred In The Sample Writer !!!")
+                traceback.print_exc(file=sys.stdout)
+
+
+    # Write the samples that are still queued and stop the thread
+    def stop(self, timeout=None):
+
+        if self.thread is None:
+            return
+
+        self.queue.put_nowait(STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+
+    # Print the queue statistics
+    def report(self):
+
+        print("Sample writer : {} written, {} dropped, {} queued, maximum queue depth {} of {}".format(
+                self.written,
+                self.dropped,
+                self.queue.qsize(),
+                self.max_depth,
+                self.capacity
+            )
+        )
+
+
+class NetworkWorker():
+    # Constructor
+    def __init__(self):
+
+        self.queue = queue.Queue()
+
+        # Names of the jobs that are queued and have not started yet
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+
+        self.thread = None
+
+        # Statistics
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+
+
+    def start(self):
+
+        if self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self.run, name='NetworkWorker', daemon=True)
+        self.thread.start()
+
+
+    # Queue a job.  A job with the same name that has not started yet does the same work, so
+    # the new one is not queued.  Returns True if the job was queued.
+    def submit(self, name, function):
+
+        with self.pending_lock:
+            if name in self.pending:
+                self.coalesced += 1
+                return False
+
+            self.pending.add(name)
+
+        self.queue.put_nowait((name, function))
+
+        return True
+
+
+    def run(self):
+
+        while True:
+            item = self.queue.get()
+
+            if item is STOP:
+                break
+
+            name, function = item
+
+            with self.pending_lock:
+                self.pending.discard(name)
+
+            try:
+                function()
+                self.completed += 1
+            except Exception:
+                self.failed += 1
+
+                print("\n   !!! An Exception Occurred In Network Job '{}' !!!".format(name))
+                traceback.print_exc(file=sys.stdout)
+
+
+    # Stop after the queued jobs.  A job can wait minutes for the modem, so the wait is limited
+    # by the timeout and the thread is left to finish on its own.
+    def stop(self, timeout=None):
+
+        if self.thread is None:
+            return
+
+        self.queue.put_nowait(STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+
+    # Print the job statistics
+    def report(self):
+
+        print("Network worker : {} jobs completed, {} failed, {} merged with a queued job".format(
+                self.completed,
+                self.failed,
+                self.coalesced
+            )
+        )
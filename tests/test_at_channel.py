@@ -0,0 +1,116 @@
+###
+#
+#
+#
+# Program Description : Tests of the AT command channel against a simulated serial port
+# Created By          : Benjamin Kleynhans
+# Creation Date       : October 18, 2026
+# Authors             : Benjamin Kleynhans
+#
+# Last Modified By    : Benjamin Kleynhans
+# Last Modified Date  : October 18, 2026
+# Filename            : test_at_channel.py
+#
+###
+
+# System imports
+import os, sys
+import time
+import queue
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Project imports
+from src.at_channel import AtChannel, STATUS_OK, STATUS_TIMEOUT
+
+
+# Serial port of a module that echoes every command and answers it after a delay.  Commands
+# are answered in the order they are received, like the Sim7600.
+class FakeModule():
+    # Constructor
+    def __init__(self, replies):
+
+        # Command : (delay in seconds, reply lines)
+        self.replies = replies
+
+        self.timeout = None
+        self.received = queue.Queue()
+
+        # Time at which the module has answered every command it received
+        self.busy_until = time.monotonic()
+
+
+    @property
+    def in_waiting(self):
+
+        return self.received.qsize()
+
+
+    def read(self, size):
+
+        try:
+            return self.received.get(timeout=self.timeout)
+        except queue.Empty:
+            return b''
+
+
+    def write(self, data):
+
+        command = data.decode().strip()
+        delay, lines = self.replies[command]
+
+        self.received.put((command + '\r\n').encode())
+
+        self.busy_until = max(self.busy_until, time.monotonic()) + delay
+
+        answer = ''.join(line + '\r\n' for line in lines).encode()
+        threading.Timer(self.busy_until - time.monotonic(), self.received.put, (answer,)).start()
+
+        return len(data)
+
+
+class AtChannelTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.module = FakeModule({
+            'AT+SLOW': (0.3, ['+SLOW: 1', 'OK']),
+            'AT+FAST': (0.0, ['+FAST: 2', 'OK'])
+        })
+
+        self.channel = AtChannel(self.module)
+        self.channel.start()
+
+
+    def tearDown(self):
+
+        self.channel.stop()
+
+
+    def test_reply(self):
+
+        result = self.channel.send('AT+FAST', 1.0)
+
+        self.assertEqual(result.status, STATUS_OK)
+        self.assertEqual(result.lines, ['+FAST: 2'])
+
+
+    # The late reply of a command that timed out must not complete the next command
+    def test_late_reply_after_timeout(self):
+
+        slow = self.channel.send('AT+SLOW', 0.1)
+        fast = self.channel.send('AT+FAST', 1.0)
+
+        self.assertEqual(slow.status, STATUS_TIMEOUT)
+        self.assertEqual(fast.status, STATUS_OK)
+        self.assertEqual(fast.lines, ['+FAST: 2'])
+
+        # The dropped reply is not taken for an unsolicited result code
+        time.sleep(0.1)
+        self.assertIsNone(self.channel.get_urc())
+
+
+if __name__ == '__main__':
+    unittest.main()